@@ -5,26 +5,121 @@ This module provides API endpoints to access prediction services.
 """
 
 import os
+import threading
+from datetime import datetime
 from flask import Flask, request, jsonify, send_file
-from prediction_service import get_prediction_service
+from training_jobs import get_training_queue
 
 app = Flask(__name__)
 
+# Startup state reported by /ready; the prediction stack (pandas, Prophet,
+# scikit-learn, matplotlib) is imported on first use or by the preload
+_startup = {
+    'started_at': datetime.now().isoformat(),
+    'preload': False,
+    'ready': False,
+    'ready_at': None,
+    'error': None,
+    'models': {}
+}
+
+def get_prediction_service():
+    """Get the prediction service instance, importing the prediction stack on first use."""
+    from prediction_service import get_prediction_service as get_service
+    return get_service()
+
+def preload_models():
+    """Import the prediction stack and load the trained models into the registry."""
+    try:
+        prediction_service = get_prediction_service()
+        for name in prediction_service.models.versions():
+            prediction_service.models.get(name)
+        _startup['models'] = prediction_service.models.versions()
+        _startup['ready_at'] = datetime.now().isoformat()
+        _startup['ready'] = True
+    except Exception as e:
+        print(f"Error preloading models: {e}")
+        _startup['error'] = str(e)
+
+@app.route('/health', methods=['GET'])
+def health():
+    """API endpoint reporting that the server is up (liveness)."""
+    return jsonify({"status": "ok"})
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """API endpoint reporting whether the models are loaded (readiness)."""
+    # Without a preload the stack is loaded by the first request instead
+    is_ready = _startup['ready'] or not _startup['preload']
+    status = {**_startup, "ready": is_ready}
+    if _startup['ready']:
+        # Current versions, models may have been retrained since the preload
+        status['models'] = get_prediction_service().models.versions()
+    return jsonify(status), (200 if is_ready else 503)
+
 @app.route('/train', methods=['POST'])
 def train_models():
     """API endpoint to train the prediction models."""
     try:
-        # Get days from request, default to 90 days
+        # Get days from request, default to 90 days, whether to tune first
+        # and whether to retrain incrementally from the saved models
         data = request.json or {}
         days = data.get('days', 90)
+        tune = bool(data.get('tune', False))
+        incremental = bool(data.get('incremental', False))
+        
+        # Queue the training job, poll /jobs/<job_id> for its outcome
+        job, deduplicated = get_training_queue().submit(days=days, tune=tune, incremental=incremental)
+        
+        return jsonify({
+            "success": True,
+            "job_id": job['id'],
+            "status": job['status'],
+            "deduplicated": deduplicated
+        }), 202
+    except Exception as e:
+        app.logger.error(f"Error training models: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """API endpoint to list the training jobs."""
+    return jsonify({"jobs": get_training_queue().jobs()})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """API endpoint to get the status, timings and metrics of a training job."""
+    job = get_training_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """API endpoint to cancel a pending training job."""
+    job = get_training_queue().cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job['status'] not in ('pending', 'cancelled'):
+        return jsonify({"error": f"Job is already {job['status']}", **job}), 409
+    return jsonify(job)
+
+@app.route('/backtest', methods=['POST'])
+def backtest_models():
+    """API endpoint to backtest the prediction models and refresh their metrics."""
+    try:
+        # Get history days and number of folds from request
+        data = request.json or {}
+        days = data.get('days', 365)
+        folds = data.get('folds', 3)
         
-        # Train models
+        # Backtest models
         prediction_service = get_prediction_service()
-        result = prediction_service.train_models(days=days)
+        result = prediction_service.backtest_models(days=days, folds=folds)
         
         return jsonify(result)
     except Exception as e:
-        app.logger.error(f"Error training models: {str(e)}")
+        app.logger.error(f"Error backtesting models: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/predict-stock-usage', methods=['GET'])
@@ -33,16 +128,35 @@ def predict_stock_usage():
     try:
         # Get prediction days from query parameters, default to 30 days
         days = request.args.get('days', 30, type=int)
+        # Optional number of uncertainty samples, 0 skips the interval simulation
+        uncertainty_samples = request.args.get('uncertainty_samples', type=int)
         
         # Predict stock usage
         prediction_service = get_prediction_service()
-        result = prediction_service.predict_stock_usage(days=days)
+        result = prediction_service.predict_stock_usage(days=days, uncertainty_samples=uncertainty_samples)
         
         return jsonify(result)
     except Exception as e:
         app.logger.error(f"Error predicting stock usage: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/predict-series-usage', methods=['GET'])
+def predict_series_usage():
+    """API endpoint to predict the usage of every series (e.g. per action)."""
+    try:
+        # Get prediction days and series key from query parameters
+        days = request.args.get('days', 14, type=int)
+        key = request.args.get('key', 'action')
+        
+        # Predict the usage of every series
+        prediction_service = get_prediction_service()
+        result = prediction_service.predict_series_usage(days=days, key=key)
+        
+        return jsonify(result)
+    except Exception as e:
+        app.logger.error(f"Error predicting series usage: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/analyze-patterns', methods=['GET'])
 def analyze_patterns():
     """API endpoint to analyze patterns in stock usage and orders."""
@@ -72,6 +186,25 @@ def get_plot(filename):
         app.logger.error(f"Error getting plot: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-def start_api(host='0.0.0.0', port=5000, debug=False):
-    """Start the API server."""
+def start_api(host='0.0.0.0', port=5000, debug=False, preload=None):
+    """
+    Start the API server.
+    
+    Args:
+        host: Host to listen on
+        port: Port to listen on
+        debug: Whether to run in debug mode
+        preload: Whether to load the models in the background while the server
+            starts serving (default AI_PRELOAD_MODELS or on)
+    """
+    if preload is None:
+        preload = os.environ.get('AI_PRELOAD_MODELS', '1') not in ('0', 'false', 'no')
+    # In debug mode only the reloader child serves requests
+    serving = not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+    if preload and serving:
+        _startup['preload'] = True
+        threading.Thread(target=preload_models, name='model-preload', daemon=True).start()
+    if serving:
+        # This process runs the queued training jobs
+        get_training_queue().start_dispatcher()
     app.run(host=host, port=port, debug=debug)
\ No newline at end of file
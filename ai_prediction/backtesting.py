@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Backtesting module for the AI prediction system.
+This module evaluates the predictors with rolling-origin backtests run in
+parallel worker processes and writes the results to model_metrics.json.
+"""
+
+import os
+import json
+import time
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from models.prophet_predictor import ProphetPredictor
+from models.ml_predictor import MLPredictor
+
+# Predictors evaluated by default: name -> (display name, model type, class);
+# predictors with an 'estimator' property are named after their estimator
+BACKTEST_MODELS = {
+    'prophet': ('Prophet', 'Series Temporales', ProphetPredictor),
+    'ml': (None, 'Machine Learning', MLPredictor)
+}
+
+# Forecast horizons (days) scored for every fold, by display name
+DEFAULT_HORIZONS = {'Diario': 1, 'Semanal': 7, 'Mensual': 30}
+
+# Days of history every fold trains on at least
+MIN_TRAIN_DAYS = 56
+
+METRICS_PATH = os.path.join(os.path.dirname(__file__), 'outputs', 'data', 'model_metrics.json')
+
+# Shared daily series attached by each worker process, and its fold frames
+_shared_block = None
+_shared_series = None
+_fold_frames = {}
+
+def default_workers():
+    """Get the number of worker processes (AI_BACKTEST_WORKERS or the CPU count)."""
+    return max(1, int(os.environ.get('AI_BACKTEST_WORKERS', 0) or os.cpu_count() or 1))
+
+def daily_series(daily_usage_df):
+    """
+    Get the daily usage as a series with one value per consecutive day.
+    
+    Args:
+        daily_usage_df: DataFrame with 'date' and 'usage' columns
+        
+    Returns:
+        Series of daily usage indexed by date, missing days count as no usage
+    """
+    dates = pd.DatetimeIndex(daily_usage_df['date']).normalize()
+    series = pd.Series(daily_usage_df['usage'].to_numpy(dtype=np.float64), index=dates)
+    return series.groupby(level=0).sum().asfreq('D', fill_value=0.0)
+
+def rolling_origins(n_days, folds=3, horizon=30, step=None, min_train_days=MIN_TRAIN_DAYS):
+    """
+    Get the forecast origins of a rolling-origin backtest.
+    
+    The last origin leaves exactly one horizon of days to score; earlier
+    origins move back step days each, as long as min_train_days remain.
+    
+    Args:
+        n_days: Number of days in the series
+        folds: Maximum number of folds
+        horizon: Days forecast from every origin
+        step: Days between origins (default half the horizon)
+        min_train_days: Minimum days of history before an origin
+        
+    Returns:
+        List of origins (index of the first forecast day), oldest first
+    """
+    step = step or max(horizon // 2, 1)
+    last_origin = n_days - horizon
+    origins = [last_origin - fold * step for fold in range(folds)]
+    return sorted(origin for origin in origins if origin >= min_train_days)
+
+def _attach_series(block_name, n_days):
+    """Attach a worker process to the shared daily series."""
+    global _shared_block, _shared_series
+    _fold_frames.clear()
+    _shared_block = shared_memory.SharedMemory(name=block_name)
+    # Row 0 holds the day numbers, row 1 the daily usage
+    _shared_series = np.ndarray((2, n_days), dtype=np.float64, buffer=_shared_block.buf)
+
+def _fold_frame(origin):
+    """Get the training frame of the days before an origin, built once per worker."""
+    if origin not in _fold_frames:
+        day_numbers, usage = _shared_series
+        # The fold is a prefix of the shared series, nothing is pickled per task
+        _fold_frames[origin] = pd.DataFrame({
+            'ds': pd.to_datetime(day_numbers[:origin].astype(np.int64), unit='D'),
+            'y': usage[:origin]
+        })
+    return _fold_frames[origin]
+
+def _run_fold(model_name, origin, horizon, params=None):
+    """
+    Train one model on the days before an origin and forecast the next days.
+    
+    Args:
+        model_name: Key of BACKTEST_MODELS
+        origin: Index of the first forecast day in the shared series
+        horizon: Number of days to forecast
+        params: Optional hyperparameters of the predictor
+        
+    Returns:
+        Dictionary with the forecast and the wall-clock training and prediction times
+    """
+    day_numbers = _shared_series[0]
+    train_df = _fold_frame(origin)
+    
+    predictor = BACKTEST_MODELS[model_name][2](params=params)
+    started = time.perf_counter()
+    if model_name == 'ml':
+        predictor.train(train_df, holdout_fraction=0, save=False, intervals=False)
+    else:
+        predictor.train(train_df, save=False)
+    training_time = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    if model_name == 'ml':
+        start_date = pd.Timestamp(int(day_numbers[origin]), unit='D')
+        forecast = predictor.predict(start_date, days=horizon)
+    else:
+        forecast = predictor.predict(days=horizon).tail(horizon)
+    prediction_time = time.perf_counter() - started
+    
+    result = {
+        'model': model_name,
+        'name': getattr(predictor, 'estimator', None) or BACKTEST_MODELS[model_name][0],
+        'origin': origin,
+        'params': predictor.params,
+        'yhat': np.maximum(forecast['yhat'].to_numpy(dtype=np.float64), 0),
+        'training_time': training_time,
+        'prediction_time': prediction_time,
+        'feature_importance': None
+    }
+    if hasattr(predictor.model, 'feature_importances_'):
+        result['feature_importance'] = dict(zip(predictor.feature_columns,
+                                                predictor.model.feature_importances_.tolist()))
+    return result
+
+def _error_metrics(actual, predicted):
+    """
+    Compute forecast error metrics.
+    
+    Args:
+        actual: NumPy array of observed values
+        predicted: NumPy array of forecast values
+        
+    Returns:
+        Dictionary with MAE, MSE, RMSE and MAPE (in %, over days with usage)
+    """
+    errors = predicted - actual
+    mse = float(np.mean(errors ** 2))
+    nonzero = actual != 0
+    mape = float(np.mean(np.abs(errors[nonzero] / actual[nonzero])) * 100) if nonzero.any() else None
+    return {
+        'mae': float(np.mean(np.abs(errors))),
+        'mse': mse,
+        'rmse': float(np.sqrt(mse)),
+        'mape': mape
+    }
+
+class FoldRunner:
+    """
+    Runs fold tasks over a daily series shared with a pool of worker processes.
+    
+    The series is copied once into a shared memory block that every worker
+    attaches to when it starts, so tasks only send the fold origin and the
+    model settings; each worker builds the training frame of an origin once
+    and reuses it for every model trained on that fold. The pool lives as
+    long as the runner, so successive batches of tasks reuse the workers.
+    Workers are spawned rather than forked, so they start clean even when
+    the runner is used from a threaded server process.
+    """
+    
+    def __init__(self, series, workers=None):
+        """
+        Initialize the fold runner.
+        
+        Args:
+            series: Daily usage series, one value per consecutive day
+            workers: Optional number of worker processes (default default_workers());
+                1 runs every task in this process
+        """
+        self.series = series
+        self.workers = max(1, int(workers or default_workers()))
+        self._block = None
+        self._executor = None
+    
+    def __enter__(self):
+        """Copy the series to shared memory and start the workers."""
+        n_days = len(self.series)
+        self._block = shared_memory.SharedMemory(create=True, size=2 * n_days * 8)
+        shared = np.ndarray((2, n_days), dtype=np.float64, buffer=self._block.buf)
+        shared[0] = self.series.index.values.astype('datetime64[D]').astype(np.int64)
+        shared[1] = self.series.values
+        # Views must be released before the block can be closed
+        del shared
+        
+        if self.workers == 1:
+            _attach_series(self._block.name, n_days)
+        else:
+            # Spawned, not forked: the caller may be a threaded server process
+            # (locks held by other threads, pooled database connections)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_attach_series,
+                                                 initargs=(self._block.name, n_days),
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self
+    
+    def run(self, tasks):
+        """
+        Run fold tasks.
+        
+        Args:
+            tasks: List of (model_name, origin, horizon, params) tuples
+            
+        Returns:
+            List of _run_fold results, in task order
+        """
+        if self._executor is None:
+            return [_run_fold(*task) for task in tasks]
+        futures = [self._executor.submit(_run_fold, *task) for task in tasks]
+        return [future.result() for future in futures]
+    
+    def __exit__(self, *exc_info):
+        """Stop the workers and release the shared memory."""
+        global _shared_block, _shared_series
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if _shared_block is not None:
+            _fold_frames.clear()
+            _shared_series = None
+            _shared_block.close()
+            _shared_block = None
+        self._block.close()
+        self._block.unlink()
+        self._block = None
+        return False
+
+def run_backtest(daily_usage_df, models=None, folds=3, horizons=None, step=None, workers=None, params=None):
+    """
+    Run a rolling-origin backtest of every model over every fold and horizon.
+    
+    The daily series is preprocessed once and placed in shared memory; each
+    (model, fold) task trains on the days before its origin, forecasts the
+    longest horizon and is scored on every horizon from that one forecast.
+    Tasks run in a process pool, so folds and models train in parallel.
+    
+    Args:
+        daily_usage_df: DataFrame with 'date' and 'usage' columns
+        models: Optional list of BACKTEST_MODELS keys (default all)
+        folds: Maximum number of rolling origins
+        horizons: Optional dictionary of horizon name -> days (default DEFAULT_HORIZONS)
+        step: Optional days between origins (default half the longest horizon)
+        workers: Optional number of worker processes (default AI_BACKTEST_WORKERS
+            or the CPU count); 1 runs every task in this process
+        params: Optional dictionary of model name -> hyperparameters (default
+            each predictor's defaults)
+            
+    Returns:
+        Dictionary with per-model metrics per horizon and per fold
+    """
+    models = list(models or BACKTEST_MODELS)
+    horizons = dict(horizons or DEFAULT_HORIZONS)
+    max_horizon = max(horizons.values())
+    
+    series = daily_series(daily_usage_df)
+    n_days = len(series)
+    
+    origins = rolling_origins(n_days, folds=folds, horizon=max_horizon, step=step)
+    if not origins:
+        raise ValueError(f"At least {MIN_TRAIN_DAYS + max_horizon} days of usage are needed for a backtest, got {n_days}")
+    
+    params = params or {}
+    tasks = [
+        (model_name, origin, max_horizon, params.get(model_name))
+        for model_name in models for origin in origins
+    ]
+    workers = min(int(workers or default_workers()), len(tasks))
+    
+    started = time.perf_counter()
+    with FoldRunner(series, workers=workers) as runner:
+        results = runner.run(tasks)
+    
+    # Score every forecast against the observed days after its origin
+    usage = series.values
+    report = {}
+    for model_name in models:
+        model_results = [result for result in results if result['model'] == model_name]
+        fold_metrics = []
+        for fold, result in enumerate(model_results, start=1):
+            actual = usage[result['origin']:result['origin'] + max_horizon]
+            fold_metrics.append({
+                'fold': fold,
+                'cutoff': series.index[result['origin'] - 1].strftime('%Y-%m-%d'),
+                **_error_metrics(actual, result['yhat'])
+            })
+        
+        # Errors pooled over the folds for the first days of each horizon
+        horizon_metrics = {}
+        for name, days in horizons.items():
+            actual = np.concatenate([usage[r['origin']:r['origin'] + days] for r in model_results])
+            predicted = np.concatenate([r['yhat'][:days] for r in model_results])
+            horizon_metrics[name] = {'days': days, **_error_metrics(actual, predicted)}
+        
+        actual = np.concatenate([usage[r['origin']:r['origin'] + max_horizon] for r in model_results])
+        predicted = np.concatenate([r['yhat'] for r in model_results])
+        report[model_name] = {
+            'name': model_results[-1]['name'],
+            'metrics': _error_metrics(actual, predicted),
+            'training_time': float(np.mean([r['training_time'] for r in model_results])),
+            'prediction_time': float(np.mean([r['prediction_time'] for r in model_results])),
+            'params': model_results[-1]['params'],
+            'folds': fold_metrics,
+            'horizons': horizon_metrics,
+            # Importances of the model trained on the most recent fold
+            'feature_importance': model_results[-1]['feature_importance']
+        }
+    
+    return {
+        'evaluated_at': datetime.now().isoformat(timespec='seconds'),
+        'data_points': n_days,
+        'folds': len(origins),
+        'horizons': horizons,
+        'workers': workers,
+        'wall_time': time.perf_counter() - started,
+        'models': report
+    }
+
+def model_label(model_name, params=None):
+    """
+    Get the display name of a model.
+    
+    Args:
+        model_name: Key of BACKTEST_MODELS
+        params: Optional hyperparameters of the predictor
+        
+    Returns:
+        The name of the predictor's estimator, or the BACKTEST_MODELS display name
+    """
+    display_name, _, predictor_class = BACKTEST_MODELS[model_name]
+    return getattr(predictor_class(params=params), 'estimator', None) or display_name
+
+def find_model_entry(entries, model_name):
+    """
+    Find the entry of a model in the model metrics file.
+    
+    Entries are matched by their 'model' key; entries written before it was
+    stored are matched by the display name of the default hyperparameters.
+    
+    Args:
+        entries: List of model entries of the model metrics file
+        model_name: Key of BACKTEST_MODELS
+        
+    Returns:
+        The entry, or None if the model has none
+    """
+    for entry in entries:
+        if entry.get('model') == model_name:
+            return entry
+    default_name = model_label(model_name)
+    for entry in entries:
+        if 'model' not in entry and entry.get('name') == default_name:
+            return entry
+    return None
+
+def _round(value, digits=4):
+    """Round a metric for the JSON file, keeping missing values."""
+    return None if value is None else round(value, digits)
+
+def write_model_metrics(backtest, path=None):
+    """
+    Write backtest results into the model metrics file read by the dashboard.
+    
+    The trained model entries and horizon comparisons are replaced by the
+    backtest results; entries the backtest does not produce (tuning history,
+    other dashboard sections) are kept.
+    
+    Args:
+        backtest: Result of run_backtest()
+        path: Optional path of the metrics file (default outputs/data/model_metrics.json)
+        
+    Returns:
+        Path to the written file
+    """
+    path = path or METRICS_PATH
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            document = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        document = {}
+    
+    training = document.setdefault('model_training', {})
+    previous = training.get('models', [])
+    
+    model_entries = []
+    for model_name, result in backtest['models'].items():
+        model_type = BACKTEST_MODELS[model_name][1]
+        entry = find_model_entry(previous, model_name) or {}
+        metrics = {key: _round(value) for key, value in result['metrics'].items()}
+        metrics.update({
+            'training_time': _round(result['training_time'], 3),
+            'prediction_time': _round(result['prediction_time'], 3),
+            'cross_validation_scores': [
+                {key: (_round(value) if isinstance(value, float) else value) for key, value in fold.items()}
+                for fold in result['folds']
+            ],
+            'training_parameters': result['params']
+        })
+        
+        feature_importance = None
+        if result['feature_importance']:
+            ranked = sorted(result['feature_importance'].items(), key=lambda item: item[1], reverse=True)
+            feature_importance = [
+                {'feature': feature, 'importance': _round(importance)} for feature, importance in ranked[:10]
+            ]
+        
+        model_entries.append({
+            'model': model_name,
+            'name': result['name'],
+            'type': model_type,
+            'metrics': metrics,
+            'feature_importance': feature_importance,
+            'hyperparameter_tuning': entry.get('hyperparameter_tuning', [])
+        })
+    
+    training['last_trained'] = backtest['evaluated_at']
+    training['models'] = model_entries
+    training['backtest'] = {
+        'method': 'rolling_origin',
+        'data_points': backtest['data_points'],
+        'folds': backtest['folds'],
+        'horizons': backtest['horizons'],
+        'workers': backtest['workers'],
+        'wall_time': _round(backtest['wall_time'], 3)
+    }
+    
+    document.setdefault('model_comparisons', {})['time_horizons'] = [
+        {
+            'horizon': horizon,
+            'days': days,
+            'models': [
+                {
+                    'name': result['name'],
+                    'mae': _round(result['horizons'][horizon]['mae']),
+                    'rmse': _round(result['horizons'][horizon]['rmse']),
+                    'mape': _round(result['horizons'][horizon]['mape']),
+                    'training_time': _round(result['training_time'], 3)
+                }
+                for model_name, result in backtest['models'].items()
+            ]
+        }
+        for horizon, days in backtest['horizons'].items()
+    ]
+    
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2, ensure_ascii=False)
+    
+    return path
\ No newline at end of file
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Data cache module for the AI prediction system.
+This module keeps a local, month-partitioned copy of the history tables
+(stockHistory and orders) and syncs it incrementally from the database.
+"""
+
+import os
+import re
+import json
+import glob
+import time
+import fcntl
+import importlib.util
+from contextlib import contextmanager
+import pandas as pd
+from data_source import window_start, apply_schema
+from models.artifacts import atomic_write
+
+# Partition files are named after their month, or 'undated' for rows without createdAt
+PARTITION_PATTERN = re.compile(r'\d{4}-\d{2}|undated')
+
+# Trailing days of history re-read from the source to pick up soft deletes,
+# edits and rows committed late below the id watermark
+RESYNC_DAYS = int(os.environ.get('AI_CACHE_RESYNC_DAYS', 35))
+
+# Seconds between two re-reads of the trailing window
+RESYNC_INTERVAL = float(os.environ.get('AI_CACHE_RESYNC_INTERVAL', 300))
+
+class LocalDataCache:
+    """
+    Local columnar cache in front of a data source.
+    
+    Each table keeps an id watermark: every read first fetches only the rows
+    past the watermark, appends them to the partition of their month and then
+    serves the requested window from disk. Rows are not immutable, though:
+    they can be soft-deleted, orders change status after insert, and a row
+    with a lower id can commit after a higher one. So at most every
+    RESYNC_INTERVAL seconds the last RESYNC_DAYS days are re-read from the
+    source and replace that part of the cache. Older history is assumed
+    settled; a full resync (delete the watermark) reconciles it. The mutable
+    "stock" table is always read from the source.
+    
+    The cache directory is shared by every server and training process, so
+    each table has a file lock: syncs hold it exclusively and reads shared,
+    and a sync never rewrites or deletes partitions being read.
+    """
+    
+    # Cached tables and the source methods used to fetch them (rows, bulk COPY)
+    TABLES = {
+        'stockHistory': ('get_stock_history', 'bulk_stock_history'),
+        'orders': ('get_orders', 'bulk_orders')
+    }
+    
+    def __init__(self, source, cache_dir=None):
+        """
+        Initialize the data cache.
+        
+        Args:
+            source: Data source providing the get_* fetch methods
+            cache_dir: Optional cache directory (default outputs/cache)
+        """
+        self.source = source
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(__file__), 'outputs', 'cache')
+        # Parquet needs pyarrow; fall back to pickled partitions without it
+        self.file_format = 'parquet' if importlib.util.find_spec('pyarrow') else 'pickle'
+        
+        for table in self.TABLES:
+            os.makedirs(self._table_dir(table), exist_ok=True)
+    
+    def _table_dir(self, table):
+        """Get the cache directory of a table."""
+        return os.path.join(self.cache_dir, table)
+    
+    @contextmanager
+    def _locked(self, table, exclusive=True):
+        """
+        Hold the lock of a table, shared by every process using the cache.
+        
+        Args:
+            table: Cached table name
+            exclusive: Whether to lock for writing (default) or for reading
+        """
+        with open(os.path.join(self._table_dir(table), '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                # Explicit unlock: a forked child may still hold a copy of the descriptor
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _watermark_path(self, table):
+        """Get the watermark file of a table."""
+        return os.path.join(self._table_dir(table), '_watermark.json')
+    
+    def _partition_path(self, table, partition):
+        """Get the file of a monthly partition."""
+        return os.path.join(self._table_dir(table), f"{partition}.{self.file_format}")
+    
+    def _partition_paths(self, table):
+        """
+        List the partition files of a table, skipping files still being written.
+        
+        Args:
+            table: Cached table name
+            
+        Returns:
+            Dictionary mapping partition names to their files
+        """
+        paths = {}
+        for path in glob.glob(os.path.join(self._table_dir(table), f"*.{self.file_format}")):
+            name = os.path.basename(path)[:-len(self.file_format) - 1]
+            if PARTITION_PATTERN.fullmatch(name):
+                paths[name] = path
+        return paths
+    
+    def _read_partition(self, path, table, columns=None):
+        """Read a partition file, typed with the table schema."""
+        if self.file_format == 'parquet':
+            # Parquet is columnar, unused columns are never read
+            df = pd.read_parquet(path, columns=columns)
+        else:
+            df = pd.read_pickle(path)
+            if columns:
+                df = df[list(columns)]
+        return apply_schema(df, table)
+    
+    def _write_partition(self, df, path):
+        """Write a partition file atomically."""
+        if self.file_format == 'parquet':
+            atomic_write(path, lambda temporary_path: df.to_parquet(temporary_path, index=False))
+        else:
+            atomic_write(path, df.to_pickle)
+    
+    def get_watermark(self, table):
+        """
+        Get the stored watermark of a table.
+        
+        Args:
+            table: Cached table name
+            
+        Returns:
+            Dictionary with last_id, last_created_at and rows
+        """
+        path = self._watermark_path(table)
+        if os.path.exists(path):
+            with open(path) as f:
+                watermark = json.load(f)
+            if watermark.get('format') == self.file_format:
+                return watermark
+        return {'last_id': None, 'last_created_at': None, 'rows': 0, 'resynced_at': None,
+                'format': self.file_format}
+    
+    def _save_watermark(self, table, watermark):
+        """Persist the watermark of a table atomically."""
+        def write(temporary_path):
+            with open(temporary_path, 'w') as f:
+                json.dump(watermark, f, indent=2)
+        
+        atomic_write(self._watermark_path(table), write)
+    
+    def _partitions(self, rows):
+        """Group rows by the monthly partition of their createdAt."""
+        rows = rows.copy()
+        rows['createdAt'] = pd.to_datetime(rows['createdAt'])
+        return rows, rows['createdAt'].dt.strftime('%Y-%m').fillna('undated')
+    
+    def _append(self, table, new_rows):
+        """Append rows to the partitions of their months, replacing cached copies of the same ids."""
+        new_rows, partitions = self._partitions(new_rows)
+        for partition, rows in new_rows.groupby(partitions):
+            path = self._partition_path(table, partition)
+            if os.path.exists(path):
+                rows = pd.concat([self._read_partition(path, table), rows], ignore_index=True)
+                # Another process may have synced the same rows already
+                rows = rows.drop_duplicates(subset='id', keep='last')
+            self._write_partition(rows.reset_index(drop=True), path)
+        return new_rows
+    
+    def _resync_window(self, table, days):
+        """
+        Replace the cached rows of the last days with the live rows of the source.
+        
+        Rows soft-deleted since they were cached disappear, edited rows are
+        replaced and rows committed late below the watermark are added.
+        
+        Args:
+            table: Cached table name
+            days: Number of trailing days to re-read
+            
+        Returns:
+            Tuple of (live rows of the window, change in the number of cached rows)
+        """
+        start = pd.Timestamp(window_start(days))
+        live_rows, partitions = self._partitions(getattr(self.source, self.TABLES[table][0])(days=days))
+        live_partitions = dict(tuple(live_rows.groupby(partitions)))
+        
+        # Every partition overlapping the window, cached or not
+        names = set(live_partitions)
+        names.update(name for name in self._partition_paths(table)
+                     if name != 'undated' and name >= start.strftime('%Y-%m'))
+        
+        delta = 0
+        for name in names:
+            path = self._partition_path(table, name)
+            rows = live_partitions.get(name, live_rows.iloc[:0])
+            if os.path.exists(path):
+                cached = self._read_partition(path, table)
+                delta -= len(cached)
+                rows = pd.concat([cached[pd.to_datetime(cached['createdAt']) < start], rows], ignore_index=True)
+            delta += len(rows)
+            if rows.empty:
+                if os.path.exists(path):
+                    os.remove(path)
+            else:
+                self._write_partition(rows.reset_index(drop=True), path)
+        return live_rows, delta
+    
+    def sync(self, table):
+        """
+        Fetch the rows past the watermark of a table and append them to the cache,
+        re-reading the trailing window when it is due.
+        
+        Args:
+            table: Cached table name
+            
+        Returns:
+            Number of new rows
+        """
+        with self._locked(table):
+            watermark = self.get_watermark(table)
+            fetch_method, bulk_method = self.TABLES[table]
+            full = watermark['last_id'] is None
+            if full:
+                # A missing or stale watermark means a full resync
+                for path in glob.glob(os.path.join(self._table_dir(table), '*.*')):
+                    if not path.endswith('.json'):
+                        os.remove(path)
+                
+                # The initial backfill is the one large fetch, bulk-load it when possible
+                if hasattr(self.source, bulk_method):
+                    fetch_method = bulk_method
+            
+            fetch = getattr(self.source, fetch_method)
+            new_rows = fetch(since_id=watermark['last_id'])
+            fetched = [new_rows]
+            if not new_rows.empty:
+                self._append(table, new_rows)
+                watermark['rows'] += len(new_rows)
+            
+            now = time.time()
+            if full:
+                watermark['resynced_at'] = now
+            elif now - (watermark.get('resynced_at') or 0) >= RESYNC_INTERVAL:
+                window_rows, delta = self._resync_window(table, RESYNC_DAYS)
+                fetched.append(window_rows)
+                watermark['rows'] += delta
+                watermark['resynced_at'] = now
+            elif new_rows.empty:
+                return 0
+            
+            # The watermark only moves forward, past the rows of both fetches
+            for rows in fetched:
+                if rows.empty:
+                    continue
+                last_id = int(rows['id'].max())
+                last_created_at = pd.to_datetime(rows['createdAt']).max()
+                watermark['last_id'] = max(last_id, watermark['last_id'] or last_id)
+                if pd.notna(last_created_at):
+                    watermark['last_created_at'] = max(last_created_at.isoformat(), watermark['last_created_at'] or '')
+            self._save_watermark(table, watermark)
+            
+            return len(new_rows)
+    
+    def _iter_partitions(self, table, days=None, columns=None):
+        """
+        Read a window of a cached table from disk, one partition at a time.
+        
+        Args:
+            table: Cached table name
+            days: Optional number of days to read data for (from today)
+            columns: Optional subset of columns to read (default all)
+            
+        Yields:
+            Pandas DataFrames with the rows of one monthly partition
+        """
+        start = None
+        if days:
+            start = pd.Timestamp(window_start(days))
+            # Partitions are named YYYY-MM, skip whole months before the window
+            first_partition = start.strftime('%Y-%m')
+        
+        # The window filter needs createdAt even when the caller does not
+        read_columns = columns
+        if columns and start is not None and 'createdAt' not in columns:
+            read_columns = list(columns) + ['createdAt']
+        
+        with self._locked(table, exclusive=False):
+            paths = [path for _, path in sorted(self._partition_paths(table).items())]
+            if start is not None:
+                paths = [p for p in paths if os.path.basename(p)[:7] >= first_partition]
+            
+            for path in paths:
+                df = self._read_partition(path, table, read_columns)
+                if start is not None:
+                    df = df[df['createdAt'] >= start]
+                if read_columns is not columns:
+                    df = df[list(columns)]
+                if not df.empty:
+                    yield df
+    
+    def _read(self, table, days=None, columns=None):
+        """
+        Read a window of a cached table from disk.
+        
+        Args:
+            table: Cached table name
+            days: Optional number of days to read data for (from today)
+            columns: Optional subset of columns to read (default all)
+            
+        Returns:
+            Pandas DataFrame sorted by createdAt (when read), newest first
+        """
+        partitions = list(self._iter_partitions(table, days, columns))
+        if not partitions:
+            return pd.DataFrame(columns=columns)
+        
+        df = apply_schema(pd.concat(partitions, ignore_index=True), table)
+        if 'createdAt' in df.columns:
+            df = df.sort_values('createdAt', ascending=False).reset_index(drop=True)
+        return df
+    
+    def get_stock_history(self, days=None, columns=None):
+        """
+        Get stock history data, syncing new rows first.
+        
+        Args:
+            days: Optional number of days to fetch data for (from today)
+            columns: Optional subset of columns to read (default all)
+            
+        Returns:
+            Pandas DataFrame with stock history data
+        """
+        self.sync('stockHistory')
+        return self._read('stockHistory', days, columns)
+    
+    def get_orders(self, days=None, columns=None):
+        """
+        Get orders data, syncing new rows first.
+        
+        Args:
+            days: Optional number of days to fetch data for (from today)
+            columns: Optional subset of columns to read (default all)
+            
+        Returns:
+            Pandas DataFrame with orders data
+        """
+        self.sync('orders')
+        return self._read('orders', days, columns)
+    
+    def iter_stock_history(self, days=None, itersize=None, columns=None):
+        """
+        Stream stock history data from disk, syncing new rows first.
+        
+        Args:
+            days: Optional number of days to fetch data for (from today)
+            itersize: Unused, chunks are the monthly partitions
+            columns: Optional subset of columns to read (default all)
+            
+        Yields:
+            Pandas DataFrames with stock history data
+        """
+        self.sync('stockHistory')
+        yield from self._iter_partitions('stockHistory', days, columns)
+    
+    def iter_orders(self, days=None, itersize=None, columns=None):
+        """
+        Stream orders data from disk, syncing new rows first.
+        
+        Args:
+            days: Optional number of days to fetch data for (from today)
+            itersize: Unused, chunks are the monthly partitions
+            columns: Optional subset of columns to read (default all)
+            
+        Yields:
+            Pandas DataFrames with orders data
+        """
+        self.sync('orders')
+        yield from self._iter_partitions('orders', days, columns)
+    
+    def get_daily_stock(self, days=None, columns=None):
+        """
+        Get daily stock data straight from the source (the table is mutable).
+        
+        Args:
+            days: Optional number of days to fetch data for (from today)
+            columns: Optional subset of columns to fetch (default all)
+            
+        Returns:
+            Pandas DataFrame with daily stock data
+        """
+        return self.source.get_daily_stock(days=days, columns=columns)
\ No newline at end of file
@@ -7,29 +7,216 @@ This module processes the data fetched from the database for analysis and predic
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from statistics import NormalDist
+
+# Calendar cells counted by the distribution engine: hour x weekday x month
+CALENDAR_SHAPE = (24, 7, 12)
+CALENDAR_CELLS = 24 * 7 * 12
+
+HOUR_LABELS = list(range(24))
+
+DAY_NAMES = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+MONTH_NAMES = [
+    'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+    'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'
+]
+
+def is_daily_aggregate(df):
+    """Check whether a frame holds daily usage sums instead of raw stock history rows."""
+    return 'action' not in df.columns and {'date', 'quantity'}.issubset(df.columns)
+
+def is_calendar_aggregate(df):
+    """Check whether a frame holds calendar counts instead of raw rows."""
+    return 'createdAt' not in df.columns and 'count' in df.columns
+
+def reduce_daily_usage(stock_history_chunks):
+    """
+    Reduce a stream of stock history chunks to daily usage sums.
+    
+    Each chunk is collapsed to one row per day before the next one is read,
+    so memory stays bounded by the number of days rather than rows.
+    
+    Args:
+        stock_history_chunks: Iterable of DataFrames with stock history data
+        
+    Returns:
+        DataFrame with 'date' and 'quantity' columns, one row per day
+    """
+    partial_sums = []
+    for chunk in stock_history_chunks:
+        usage_df = chunk[chunk['action'].isin(['sell', 'remove'])]
+        if usage_df.empty:
+            continue
+        dates = pd.to_datetime(usage_df['createdAt']).dt.floor('D')
+        partial_sums.append(usage_df.groupby(dates)['quantity'].sum())
+    
+    if not partial_sums:
+        return pd.DataFrame({'date': pd.to_datetime([]), 'quantity': pd.Series(dtype=float)})
+    
+    daily_sums = pd.concat(partial_sums).groupby(level=0).sum()
+    return daily_sums.rename_axis('date').reset_index(name='quantity')
+
+def _calendar_codes(created_at):
+    """
+    Encode timestamps as hour/weekday/month cell indices with integer arithmetic.
+    
+    Args:
+        created_at: Series or array of timestamps
+        
+    Returns:
+        NumPy array of flat indices into CALENDAR_SHAPE
+    """
+    timestamps = pd.DatetimeIndex(pd.to_datetime(created_at))
+    if timestamps.tz is not None:
+        # Keep the wall-clock time of the stored timezone
+        timestamps = timestamps.tz_localize(None)
+    values = timestamps.values
+    values = values[~np.isnat(values)]
+    
+    hours = values.astype('datetime64[h]').astype(np.int64)
+    hour = hours % 24
+    # 1970-01-01 was a Thursday (weekday 3)
+    weekday = (hours // 24 + 3) % 7
+    month = values.astype('datetime64[M]').astype(np.int64) % 12
+    return (hour * 7 + weekday) * 12 + month
+
+def calendar_counts(data):
+    """
+    Count rows per hour, weekday and month in a single pass.
+    
+    Args:
+        data: Raw rows with a 'createdAt' column, an iterable of such chunks,
+            or calendar counts with 'hour', 'weekday', 'month' and 'count' columns
+        
+    Returns:
+        NumPy int64 array of shape (24, 7, 12) indexed by hour, weekday
+        (0 = Monday) and month (0 = January)
+    """
+    if isinstance(data, pd.DataFrame):
+        data = [data]
+    
+    counts = np.zeros(CALENDAR_CELLS, dtype=np.int64)
+    for chunk in data:
+        if chunk.empty:
+            continue
+        if is_calendar_aggregate(chunk):
+            codes = np.ravel_multi_index((
+                chunk['hour'].to_numpy(dtype=np.int64),
+                chunk['weekday'].to_numpy(dtype=np.int64),
+                chunk['month'].to_numpy(dtype=np.int64) - 1
+            ), CALENDAR_SHAPE)
+            weights = chunk['count'].to_numpy(dtype=np.float64)
+        else:
+            codes = _calendar_codes(chunk['createdAt'])
+            weights = None
+        counts += np.bincount(codes, weights=weights, minlength=CALENDAR_CELLS).astype(np.int64)
+    
+    return counts.reshape(CALENDAR_SHAPE)
+
+def reduce_calendar_counts(chunks):
+    """
+    Reduce a stream of order or stock history chunks to calendar counts.
+    
+    Args:
+        chunks: Iterable of DataFrames with a 'createdAt' column
+        
+    Returns:
+        DataFrame with 'hour', 'weekday' (0 = Monday), 'month' and 'count' columns
+    """
+    counts = calendar_counts(chunks)
+    hour, weekday, month = np.nonzero(counts)
+    return pd.DataFrame({
+        'hour': hour,
+        'weekday': weekday,
+        'month': month + 1,
+        'count': counts[hour, weekday, month]
+    })
+
+def _distribution(counts, labels):
+    """Get the counts and percentages of the non-empty cells of a 1-D count array."""
+    present = np.flatnonzero(counts)
+    if len(present) == 0:
+        return {}, {}
+    
+    values = counts[present]
+    percentages = np.round(values / values.sum() * 100, 1)
+    return (
+        {labels[i]: int(value) for i, value in zip(present, values)},
+        {labels[i]: float(pct) for i, pct in zip(present, percentages)}
+    )
+
+def calculate_calendar_distributions(orders_df, stock_history_df):
+    """
+    Calculate the hourly, weekly and monthly distributions of orders and stock
+    operations from one joint count per table.
+    
+    The inputs are never modified: timestamps are encoded to integer cells and
+    counted with a single bincount, and every distribution is a marginal sum.
+    
+    Args:
+        orders_df: Orders data (raw rows, streamed chunks or calendar counts)
+        stock_history_df: Stock history data (raw rows, streamed chunks or calendar counts)
+        
+    Returns:
+        Dictionary with 'hourly', 'weekly' and 'monthly' distribution data
+    """
+    order_counts = calendar_counts(orders_df)
+    stock_counts = calendar_counts(stock_history_df)
+    
+    # Axes summed out to get each marginal: (hour, weekday, month)
+    periods = {
+        'hourly': ((1, 2), HOUR_LABELS),
+        'weekly': ((0, 2), DAY_NAMES),
+        'monthly': ((0, 1), MONTH_NAMES)
+    }
+    
+    distributions = {}
+    for period, (axes, labels) in periods.items():
+        orders, orders_pct = _distribution(order_counts.sum(axis=axes), labels)
+        stock_ops, stock_ops_pct = _distribution(stock_counts.sum(axis=axes), labels)
+        distributions[period] = {
+            f'{period}_orders': orders,
+            f'{period}_orders_pct': orders_pct,
+            f'{period}_stock_ops': stock_ops,
+            f'{period}_stock_ops_pct': stock_ops_pct
+        }
+    
+    return distributions
 
 def calculate_daily_usage(stock_history_df):
     """
     Calculate the daily usage of stock from stock history data.
     
     Args:
-        stock_history_df: DataFrame with stock history data
+        stock_history_df: DataFrame with stock history data, an iterable of such
+            DataFrames (streamed chunks), or daily sums with 'date' and
+            'quantity' columns already aggregated in the database
         
     Returns:
         DataFrame with daily usage data
     """
-    # Filter only actions that reduce stock (sell, remove)
-    usage_df = stock_history_df[stock_history_df['action'].isin(['sell', 'remove'])]
-    
-    # Convert createdAt to datetime if it's not already
-    if usage_df['createdAt'].dtype != 'datetime64[ns]':
-        usage_df['createdAt'] = pd.to_datetime(usage_df['createdAt'])
+    if not isinstance(stock_history_df, pd.DataFrame):
+        stock_history_df = reduce_daily_usage(stock_history_df)
     
-    # Add date column (without time)
-    usage_df['date'] = usage_df['createdAt'].dt.date
+    if is_daily_aggregate(stock_history_df):
+        daily_usage = stock_history_df[['date', 'quantity']].copy()
+    else:
+        # Filter only actions that reduce stock (sell, remove)
+        usage_df = stock_history_df[stock_history_df['action'].isin(['sell', 'remove'])].copy()
+        
+        # Convert createdAt to datetime if it's not already
+        if usage_df['createdAt'].dtype != 'datetime64[ns]':
+            usage_df['createdAt'] = pd.to_datetime(usage_df['createdAt'])
+        
+        # Add date column (without time)
+        usage_df['date'] = usage_df['createdAt'].dt.date
+        
+        # Group by date and sum the quantities
+        daily_usage = usage_df.groupby('date')['quantity'].sum().reset_index()
     
-    # Group by date and sum the quantities
-    daily_usage = usage_df.groupby('date')['quantity'].sum().reset_index()
+    if daily_usage.empty:
+        return pd.DataFrame({'date': pd.to_datetime([]), 'usage': pd.Series(dtype=float)})
     
     # Convert date to datetime for compatibility with Prophet
     daily_usage['date'] = pd.to_datetime(daily_usage['date'])
@@ -46,6 +233,56 @@ def calculate_daily_usage(stock_history_df):
     
     return daily_usage[['date', 'usage']]
 
+def reduce_usage_matrix(stock_history_chunks, key='action'):
+    """
+    Reduce a stream of stock history chunks to daily usage sums per series.
+    
+    Args:
+        stock_history_chunks: Iterable of DataFrames with stock history data
+        key: Column identifying the series
+        
+    Returns:
+        Series of usage sums indexed by (date, key)
+    """
+    partial_sums = []
+    for chunk in stock_history_chunks:
+        usage_df = chunk[chunk['action'].isin(['sell', 'remove'])]
+        if usage_df.empty:
+            continue
+        dates = pd.to_datetime(usage_df['createdAt']).dt.floor('D').rename('date')
+        partial_sums.append(usage_df.groupby([dates, usage_df[key]], observed=True)['quantity'].sum())
+    
+    if not partial_sums:
+        return pd.Series(dtype=float, index=pd.MultiIndex.from_arrays([[], []], names=['date', key]))
+    
+    return pd.concat(partial_sums).groupby(level=[0, 1]).sum()
+
+def calculate_usage_matrix(stock_history_df, key='action'):
+    """
+    Calculate the daily usage of many series at once, as a wide matrix.
+    
+    Every row is assigned to its (date, series) cell by one groupby, so the
+    cost grows with the number of rows rather than the number of series.
+    
+    Args:
+        stock_history_df: DataFrame with stock history data or an iterable of
+            such DataFrames (streamed chunks)
+        key: Column identifying the series (e.g. 'action')
+        
+    Returns:
+        DataFrame indexed by date (gap-filled) with one column of usage per series
+    """
+    if isinstance(stock_history_df, pd.DataFrame):
+        stock_history_df = [stock_history_df]
+    
+    daily_sums = reduce_usage_matrix(stock_history_df, key=key)
+    if daily_sums.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='date'), dtype=float)
+    
+    matrix = daily_sums.unstack(key, fill_value=0.0)
+    date_range = pd.date_range(start=matrix.index.min(), end=matrix.index.max(), name='date')
+    return matrix.reindex(date_range, fill_value=0.0).astype(float)
+
 def prepare_time_series_data(daily_usage_df, date_column='date', value_column='usage'):
     """
     Prepare time series data for forecasting.
@@ -78,248 +315,39 @@ def calculate_hourly_distribution(orders_df, stock_history_df):
     Calculate the hourly distribution of orders and stock operations.
     
     Args:
-        orders_df: DataFrame with orders data
-        stock_history_df: DataFrame with stock history data
+        orders_df: Orders data (raw rows, streamed chunks or calendar counts)
+        stock_history_df: Stock history data (raw rows, streamed chunks or calendar counts)
         
     Returns:
         DataFrame with hourly distribution data
     """
-    # Process orders data
-    if orders_df.empty:
-        hourly_orders = {}
-        hourly_orders_pct = {}
-    else:
-        # Convert to datetime
-        if orders_df['createdAt'].dtype != 'datetime64[ns]':
-            orders_df['createdAt'] = pd.to_datetime(orders_df['createdAt'])
-        
-        # Get hour of day and count
-        orders_df['hour'] = orders_df['createdAt'].dt.hour
-        hourly_counts = orders_df.groupby('hour').size()
-        total_orders = hourly_counts.sum()
-        
-        # Calculate percentages
-        if total_orders > 0:
-            hourly_pct = (hourly_counts / total_orders * 100).round(1)
-        else:
-            hourly_pct = hourly_counts * 0
-            
-        hourly_orders = hourly_counts.to_dict()
-        hourly_orders_pct = hourly_pct.to_dict()
-    
-    # Process stock operations data
-    if stock_history_df.empty:
-        hourly_stock_ops = {}
-        hourly_stock_ops_pct = {}
-    else:
-        # Convert to datetime
-        if stock_history_df['createdAt'].dtype != 'datetime64[ns]':
-            stock_history_df['createdAt'] = pd.to_datetime(stock_history_df['createdAt'])
-        
-        # Get hour of day and count
-        stock_history_df['hour'] = stock_history_df['createdAt'].dt.hour
-        hourly_counts = stock_history_df.groupby('hour').size()
-        total_ops = hourly_counts.sum()
-        
-        # Calculate percentages
-        if total_ops > 0:
-            hourly_pct = (hourly_counts / total_ops * 100).round(1)
-        else:
-            hourly_pct = hourly_counts * 0
-            
-        hourly_stock_ops = hourly_counts.to_dict()
-        hourly_stock_ops_pct = hourly_pct.to_dict()
-    
-    return {
-        'hourly_orders': hourly_orders,
-        'hourly_orders_pct': hourly_orders_pct,
-        'hourly_stock_ops': hourly_stock_ops,
-        'hourly_stock_ops_pct': hourly_stock_ops_pct
-    }
+    return calculate_calendar_distributions(orders_df, stock_history_df)['hourly']
 
 def calculate_weekly_distribution(orders_df, stock_history_df):
     """
     Calculate the weekly distribution of orders and stock operations.
     
     Args:
-        orders_df: DataFrame with orders data
-        stock_history_df: DataFrame with stock history data
+        orders_df: Orders data (raw rows, streamed chunks or calendar counts)
+        stock_history_df: Stock history data (raw rows, streamed chunks or calendar counts)
         
     Returns:
         DataFrame with weekly distribution data
     """
-    # Days of week mapping
-    day_names = {
-        0: 'Lunes',
-        1: 'Martes',
-        2: 'Miércoles',
-        3: 'Jueves',
-        4: 'Viernes',
-        5: 'Sábado',
-        6: 'Domingo'
-    }
-    
-    # Process orders data
-    if orders_df.empty:
-        weekly_orders = {}
-        weekly_orders_pct = {}
-    else:
-        # Convert to datetime
-        if orders_df['createdAt'].dtype != 'datetime64[ns]':
-            orders_df['createdAt'] = pd.to_datetime(orders_df['createdAt'])
-        
-        # Get day of week and count
-        orders_df['weekday'] = orders_df['createdAt'].dt.weekday
-        orders_df['weekday_name'] = orders_df['weekday'].map(day_names)
-        weekly_counts = orders_df.groupby('weekday_name').size()
-        total_orders = weekly_counts.sum()
-        
-        # Calculate percentages
-        if total_orders > 0:
-            weekly_pct = (weekly_counts / total_orders * 100).round(1)
-        else:
-            weekly_pct = weekly_counts * 0
-            
-        weekly_orders = weekly_counts.to_dict()
-        weekly_orders_pct = weekly_pct.to_dict()
-    
-    # Process stock operations data
-    if stock_history_df.empty:
-        weekly_stock_ops = {}
-        weekly_stock_ops_pct = {}
-    else:
-        # Convert to datetime
-        if stock_history_df['createdAt'].dtype != 'datetime64[ns]':
-            stock_history_df['createdAt'] = pd.to_datetime(stock_history_df['createdAt'])
-        
-        # Get day of week and count
-        stock_history_df['weekday'] = stock_history_df['createdAt'].dt.weekday
-        stock_history_df['weekday_name'] = stock_history_df['weekday'].map(day_names)
-        weekly_counts = stock_history_df.groupby('weekday_name').size()
-        total_ops = weekly_counts.sum()
-        
-        # Calculate percentages
-        if total_ops > 0:
-            weekly_pct = (weekly_counts / total_ops * 100).round(1)
-        else:
-            weekly_pct = weekly_counts * 0
-            
-        weekly_stock_ops = weekly_counts.to_dict()
-        weekly_stock_ops_pct = weekly_pct.to_dict()
-    
-    return {
-        'weekly_orders': weekly_orders,
-        'weekly_orders_pct': weekly_orders_pct,
-        'weekly_stock_ops': weekly_stock_ops,
-        'weekly_stock_ops_pct': weekly_stock_ops_pct
-    }
+    return calculate_calendar_distributions(orders_df, stock_history_df)['weekly']
 
 def calculate_monthly_distribution(orders_df, stock_history_df):
     """
     Calculate the monthly distribution of orders and stock operations.
     
     Args:
-        orders_df: DataFrame with orders data
-        stock_history_df: DataFrame with stock history data
+        orders_df: Orders data (raw rows, streamed chunks or calendar counts)
+        stock_history_df: Stock history data (raw rows, streamed chunks or calendar counts)
         
     Returns:
         DataFrame with monthly distribution data
     """
-    # Month names
-    month_names = {
-        1: 'Enero',
-        2: 'Febrero',
-        3: 'Marzo',
-        4: 'Abril',
-        5: 'Mayo',
-        6: 'Junio',
-        7: 'Julio',
-        8: 'Agosto',
-        9: 'Septiembre',
-        10: 'Octubre',
-        11: 'Noviembre',
-        12: 'Diciembre'
-    }
-    
-    # Process orders data
-    if orders_df.empty:
-        monthly_orders = {}
-        monthly_orders_pct = {}
-    else:
-        # Convert to datetime
-        if orders_df['createdAt'].dtype != 'datetime64[ns]':
-            orders_df['createdAt'] = pd.to_datetime(orders_df['createdAt'])
-        
-        # Get month and count
-        orders_df['month'] = orders_df['createdAt'].dt.month
-        orders_df['month_name'] = orders_df['month'].map(month_names)
-        monthly_counts = orders_df.groupby('month_name').size()
-        total_orders = monthly_counts.sum()
-        
-        # Calculate percentages
-        if total_orders > 0:
-            monthly_pct = (monthly_counts / total_orders * 100).round(1)
-        else:
-            monthly_pct = monthly_counts * 0
-            
-        monthly_orders = monthly_counts.to_dict()
-        monthly_orders_pct = monthly_pct.to_dict()
-    
-    # Process stock operations data
-    if stock_history_df.empty:
-        monthly_stock_ops = {}
-        monthly_stock_ops_pct = {}
-    else:
-        # Convert to datetime
-        if stock_history_df['createdAt'].dtype != 'datetime64[ns]':
-            stock_history_df['createdAt'] = pd.to_datetime(stock_history_df['createdAt'])
-        
-        # Get month and count
-        stock_history_df['month'] = stock_history_df['createdAt'].dt.month
-        stock_history_df['month_name'] = stock_history_df['month'].map(month_names)
-        monthly_counts = stock_history_df.groupby('month_name').size()
-        total_ops = monthly_counts.sum()
-        
-        # Calculate percentages
-        if total_ops > 0:
-            monthly_pct = (monthly_counts / total_ops * 100).round(1)
-        else:
-            monthly_pct = monthly_counts * 0
-            
-        monthly_stock_ops = monthly_counts.to_dict()
-        monthly_stock_ops_pct = monthly_pct.to_dict()
-    
-    return {
-        'monthly_orders': monthly_orders,
-        'monthly_orders_pct': monthly_orders_pct,
-        'monthly_stock_ops': monthly_stock_ops,
-        'monthly_stock_ops_pct': monthly_stock_ops_pct
-    }
-
-def calculate_average_daily_usage(daily_usage_df, last_n_days=30):
-    """
-    Calculate the average daily usage over the last N days.
-    
-    Args:
-        daily_usage_df: DataFrame with daily usage data
-        last_n_days: Number of days to consider for the average
-        
-    Returns:
-        Average daily usage as a float
-    """
-    if daily_usage_df.empty:
-        return 0.0
-    
-    # Sort by date
-    daily_usage_df = daily_usage_df.sort_values('date', ascending=False)
-    
-    # Get last N days of data
-    recent_df = daily_usage_df.head(last_n_days)
-    
-    # Calculate average
-    avg_usage = recent_df['usage'].mean()
-    
-    return float(avg_usage) if not np.isnan(avg_usage) else 0.0
+    return calculate_calendar_distributions(orders_df, stock_history_df)['monthly']
 
 def predict_days_until_empty(current_stock, avg_daily_usage):
     """
@@ -336,4 +364,90 @@ def predict_days_until_empty(current_stock, avg_daily_usage):
         return float('inf')  # Infinite days if no usage
     
     days = current_stock / avg_daily_usage
-    return days
\ No newline at end of file
+    return days
+
+def simulate_stock_out(current_stock, forecast_df, simulations=5000, interval_width=0.8, seed=None):
+    """
+    Simulate usage trajectories from a forecast to get the stock-out day distribution.
+    
+    Daily usage is drawn from a split normal matching each day's 'yhat' and
+    its interval bounds, so asymmetric intervals (like the ML bounds) are
+    respected. All trajectories are simulated at once as one
+    (simulations x days) array.
+    
+    Args:
+        current_stock: Current unreserved stock (None or NaN without a stock record)
+        forecast_df: Future days only, with 'ds', 'yhat', 'yhat_lower' and 'yhat_upper' columns
+        simulations: Number of simulated trajectories
+        interval_width: Coverage of the forecast interval (Prophet's default is 0.8)
+        seed: Optional random seed
+        
+    Returns:
+        Dictionary with P10/P50/P90 days until empty (None beyond the horizon),
+        the probability of running out within the horizon and by each day,
+        and whether the stock is already out
+    """
+    horizon = len(forecast_df)
+    dates = pd.to_datetime(forecast_df['ds']).dt.strftime('%Y-%m-%d')
+    
+    # Nothing to simulate when there is no stock left (or no record of it)
+    if current_stock is None or not current_stock > 0:
+        return {
+            "simulations": 0,
+            "already_out": True,
+            "p10_days": 0.0,
+            "p50_days": 0.0,
+            "p90_days": 0.0,
+            "probability_within_horizon": 1.0 if horizon else 0.0,
+            "probability_by_day": [{"date": date, "probability": 1.0} for date in dates]
+        }
+    
+    if horizon == 0:
+        return {
+            "simulations": 0,
+            "already_out": False,
+            "p10_days": None,
+            "p50_days": None,
+            "p90_days": None,
+            "probability_within_horizon": 0.0,
+            "probability_by_day": []
+        }
+    
+    yhat = forecast_df['yhat'].to_numpy(dtype=np.float64)
+    z = NormalDist().inv_cdf(0.5 + interval_width / 2)
+    sigma_lower = np.maximum(yhat - forecast_df['yhat_lower'].to_numpy(dtype=np.float64), 0) / z
+    sigma_upper = np.maximum(forecast_df['yhat_upper'].to_numpy(dtype=np.float64) - yhat, 0) / z
+    
+    rng = np.random.default_rng(seed)
+    shocks = rng.standard_normal((simulations, horizon))
+    usage = yhat + shocks * np.where(shocks < 0, sigma_lower, sigma_upper)
+    np.maximum(usage, 0, out=usage)
+    
+    cumulative = np.cumsum(usage, axis=1)
+    empty = cumulative >= current_stock
+    ran_out = empty[:, -1]
+    
+    # Fractional stock-out day: whole days before plus the share of the last day needed
+    first_day = empty.argmax(axis=1)
+    rows = np.arange(simulations)
+    used_before = np.where(first_day > 0, cumulative[rows, first_day - 1], 0.0)
+    day_usage = usage[rows, first_day]
+    fraction = np.divide(current_stock - used_before, day_usage,
+                         out=np.ones(simulations), where=day_usage > 0)
+    days_until_empty = np.where(ran_out, first_day + np.clip(fraction, 0, 1), np.inf)
+    
+    p10, p50, p90 = np.quantile(days_until_empty, [0.1, 0.5, 0.9], method='inverted_cdf')
+    
+    return {
+        "simulations": simulations,
+        "already_out": False,
+        # 10% of the simulations run out before p10_days, half before p50_days
+        "p10_days": float(p10) if np.isfinite(p10) else None,
+        "p50_days": float(p50) if np.isfinite(p50) else None,
+        "p90_days": float(p90) if np.isfinite(p90) else None,
+        "probability_within_horizon": float(ran_out.mean()),
+        "probability_by_day": [
+            {"date": date, "probability": float(probability)}
+            for date, probability in zip(dates, empty.mean(axis=0))
+        ]
+    }
\ No newline at end of file
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+Data source module for the AI prediction system.
+This module defines the data-source interface used by the prediction service
+and the SQLite and Parquet-directory backends that stand in for PostgreSQL.
+"""
+
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from datetime import datetime, timedelta
+
+# Column types of every table read by the prediction system. Decimals become
+# floats, timestamps datetime64 and low-cardinality text categoricals, so the
+# frames are compact and every downstream sum or groupby runs vectorized.
+# Stock levels stay float64 because they are serialized in API responses.
+TABLE_SCHEMAS = {
+    'stockHistory': {
+        'id': 'int64',
+        'stockId': 'Int32',
+        'action': 'category',
+        'quantity': 'float64',
+        'newStock': 'float32',
+        'description': 'object',
+        'createdAt': 'datetime64[ns]',
+        'createdBy': 'category'
+    },
+    'stock': {
+        'id': 'int64',
+        'date': 'datetime64[ns]',
+        'initialStock': 'float64',
+        'currentStock': 'float64',
+        'reservedStock': 'float64',
+        'unreservedStock': 'float64',
+        'lastUpdated': 'datetime64[ns]'
+    },
+    'orders': {
+        'id': 'int64',
+        'customerName': 'object',
+        'quantity': 'float32',
+        'pickupTime': 'datetime64[ns]',
+        'status': 'category',
+        'totalAmount': 'float64',
+        'createdAt': 'datetime64[ns]',
+        'updatedAt': 'datetime64[ns]'
+    }
+}
+
+# Column types of the aggregated frames every backend returns
+AGGREGATE_SCHEMAS = {
+    'dailyUsage': {
+        'date': 'datetime64[ns]',
+        'quantity': 'float64'
+    },
+    'calendarCounts': {
+        'hour': 'int8',
+        'weekday': 'int8',
+        'month': 'int8',
+        'count': 'int64'
+    }
+}
+
+# Column each table is windowed and sorted by (newest first)
+TIME_COLUMNS = {
+    'stockHistory': 'createdAt',
+    'stock': 'date',
+    'orders': 'createdAt'
+}
+
+# Tables with a soft-delete flag
+SOFT_DELETE_TABLES = ('stockHistory', 'orders')
+
+# Rows per chunk when streaming large fetches
+DEFAULT_ITERSIZE = int(os.environ.get('DB_ITERSIZE', 10000))
+
+def window_start(days):
+    """Get the first date (as YYYY-MM-DD) of a window of N days back from today."""
+    return (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+def select_list(table, columns=None):
+    """
+    Build the quoted SELECT list of a table.
+    
+    Args:
+        table: Table name in TABLE_SCHEMAS
+        columns: Optional subset of columns (default all)
+        
+    Returns:
+        SQL column list as a string
+    """
+    return ", ".join(f'"{column}"' for column in schema_columns(table, columns))
+
+def schema_columns(table, columns=None):
+    """
+    Validate a column selection against a table schema.
+    
+    Args:
+        table: Table name in TABLE_SCHEMAS
+        columns: Optional subset of columns (default all)
+        
+    Returns:
+        List of column names
+    """
+    schema = TABLE_SCHEMAS[table]
+    columns = list(columns) if columns else list(schema)
+    unknown = [column for column in columns if column not in schema]
+    if unknown:
+        raise ValueError(f"Unknown columns for {table}: {unknown}")
+    return columns
+
+def apply_schema(df, table):
+    """
+    Cast the columns of a frame to the types of its table schema.
+    
+    Args:
+        df: DataFrame read from a table
+        table: Name in TABLE_SCHEMAS or AGGREGATE_SCHEMAS (None leaves the frame untouched)
+        
+    Returns:
+        The typed DataFrame
+    """
+    schema = TABLE_SCHEMAS.get(table) or AGGREGATE_SCHEMAS.get(table)
+    if not schema:
+        return df
+    
+    dtypes = {}
+    for column in df.columns:
+        dtype = schema.get(column)
+        if dtype is None or str(df[column].dtype) == dtype:
+            continue
+        if dtype == 'datetime64[ns]':
+            df[column] = pd.to_datetime(df[column]).astype(dtype)
+        else:
+            dtypes[column] = dtype
+    
+    return df.astype(dtypes) if dtypes else df
+
+class DataSource(ABC):
+    """
+    Abstract base class of the data-source backends.
+    
+    Backends implement _read_table; every fetch method of the prediction
+    service is derived from it here, and backends override the ones they
+    can run natively (SQL aggregation, streaming cursors, bulk export).
+    All of them return the same typed frames.
+    """
+    
+    def __init__(self, max_workers=None):
+        """
+        Initialize the data source.
+        
+        Args:
+            max_workers: Threads used by fetch_concurrently (default 4)
+        """
+        self.max_workers = max_workers or 4
+        self._executor = None
+        self._executor_lock = threading.Lock()
+    
+    @abstractmethod
+    def _read_table(self, table, days=None, since_id=None, columns=None):
+        """
+        Read the live rows of a table, newest first.
+        
+        Args:
+            table: Table name in TABLE_SCHEMAS
+            days: Optional number of days to fetch data for (from today)
+            since_id: Optional id watermark, only rows with a greater id are fetched
+            columns: Optional subset of columns to fetch (default all)
+            
+        Returns:
+            Pandas DataFrame typed with the table schema
+        """
+    
+    def _iter_table(self, table, days=None, itersize=None, columns=None):
+        """Stream a table in chunks (slices of a full read unless overridden)."""
+        itersize = itersize or DEFAULT_ITERSIZE
+        df = self._read_table(table, days=days, columns=columns)
+        for start in range(0, len(df), itersize):
+            yield df.iloc[start:start + itersize]
+    
+    def get_stock_history(self, days=None, since_id=None, columns=None):
+        """Fetch stock history data (see DatabaseConnector.get_stock_history)."""
+        return self._read_table('stockHistory', days, since_id, columns)
+    
+    def get_daily_stock(self, days=None, columns=None):
+        """Fetch daily stock data (see DatabaseConnector.get_daily_stock)."""
+        return self._read_table('stock', days, columns=columns)
+    
+    def get_orders(self, days=None, since_id=None, columns=None):
+        """Fetch orders data (see DatabaseConnector.get_orders)."""
+        return self._read_table('orders', days, since_id, columns)
+    
+    def iter_stock_history(self, days=None, itersize=None, columns=None):
+        """Stream stock history data in chunks."""
+        yield from self._iter_table('stockHistory', days, itersize, columns)
+    
+    def iter_orders(self, days=None, itersize=None, columns=None):
+        """Stream orders data in chunks."""
+        yield from self._iter_table('orders', days, itersize, columns)
+    
+    def count_stock_history(self, days=None):
+        """Count the stock history rows of a window."""
+        return len(self._read_table('stockHistory', days, columns=['id']))
+    
+    def bulk_stock_history(self, days=None, since_id=None, columns=None):
+        """Bulk-load stock history data (a plain read unless overridden)."""
+        return self.get_stock_history(days, since_id, columns)
+    
+    def bulk_orders(self, days=None, since_id=None, columns=None):
+        """Bulk-load orders data (a plain read unless overridden)."""
+        return self.get_orders(days, since_id, columns)
+    
+    def get_daily_usage(self, days=None):
+        """
+        Get the daily usage (sum of sell/remove quantities).
+        
+        Args:
+            days: Optional number of days to fetch data for (from today)
+            
+        Returns:
+            Pandas DataFrame with 'date' and 'quantity' columns, one row per day
+        """
+        df = self._read_table('stockHistory', days, columns=['action', 'quantity', 'createdAt'])
+        df = df[df['action'].isin(['sell', 'remove'])]
+        daily_sums = df.groupby(df['createdAt'].dt.floor('D'))['quantity'].sum()
+        return apply_schema(daily_sums.rename_axis('date').reset_index(name='quantity'), 'dailyUsage')
+    
+    def get_calendar_counts(self, table, days=None):
+        """
+        Get row counts per hour, weekday and month.
+        
+        Args:
+            table: Table to count, 'stockHistory' or 'orders'
+            days: Optional number of days to fetch data for (from today)
+            
+        Returns:
+            Pandas DataFrame with 'hour', 'weekday' (0 = Monday), 'month' and 'count' columns
+        """
+        if table not in SOFT_DELETE_TABLES:
+            raise ValueError(f"Unsupported table for calendar counts: {table}")
+        
+        created_at = self._read_table(table, days, columns=['createdAt'])['createdAt']
+        counts = created_at.groupby([
+            created_at.dt.hour.rename('hour'),
+            created_at.dt.weekday.rename('weekday'),
+            created_at.dt.month.rename('month')
+        ]).size()
+        return apply_schema(counts.reset_index(name='count'), 'calendarCounts')
+    
+    def fetch_concurrently(self, tasks):
+        """
+        Run independent fetches in parallel.
+        
+        The request then waits for the slowest query instead of the sum of
+        all of them.
+        
+        Args:
+            tasks: Dictionary mapping a result name to a zero-argument callable
+            
+        Returns:
+            Dictionary mapping each name to the result of its callable
+        """
+        if len(tasks) <= 1:
+            return {name: task() for name, task in tasks.items()}
+        
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='db-fetch'
+                    )
+        
+        futures = {name: self._executor.submit(task) for name, task in tasks.items()}
+        # result() re-raises the first failure once its query is done
+        return {name: future.result() for name, future in futures.items()}
+    
+    def close(self):
+        """Release the resources held by the data source."""
+
+def _filter_window(df, table, days=None, since_id=None):
+    """Apply the soft-delete, time-window and id-watermark filters to a frame."""
+    if table in SOFT_DELETE_TABLES and 'deleted' in df.columns:
+        df = df[~df['deleted'].astype(bool)]
+    if days:
+        time_column = TIME_COLUMNS[table]
+        df = df[pd.to_datetime(df[time_column]) >= pd.Timestamp(window_start(days))]
+    if since_id is not None:
+        df = df[df['id'] > int(since_id)]
+    return df
+
+class SQLiteDataSource(DataSource):
+    """Data source reading a SQLite database with the same tables as PostgreSQL."""
+    
+    def __init__(self, path, max_workers=None):
+        """
+        Initialize the SQLite data source.
+        
+        Args:
+            path: Path of the SQLite database file
+            max_workers: Threads used by fetch_concurrently
+        """
+        super().__init__(max_workers=max_workers)
+        if not os.path.exists(path):
+            raise ValueError(f"SQLite database not found: {path}")
+        self.path = path
+    
+    def _connect(self):
+        """
+        Open a connection (cheap for SQLite, one per call keeps threads apart).
+        
+        Returns:
+            Context manager closing the connection on exit (a bare sqlite3
+            connection used in a with block only ends its transaction)
+        """
+        return closing(sqlite3.connect(self.path))
+    
+    def _table_query(self, table, days=None, since_id=None, columns=None):
+        """Build the query of a table and its parameters."""
+        query = f'SELECT {select_list(table, columns)} FROM "{table}" WHERE 1 = 1'
+        params = []
+        
+        if table in SOFT_DELETE_TABLES:
+            query += ' AND "deleted" = 0'
+        
+        if days:
+            query += f' AND "{TIME_COLUMNS[table]}" >= ?'
+            params.append(window_start(days))
+        
+        if since_id is not None:
+            query += ' AND "id" > ?'
+            params.append(int(since_id))
+        
+        query += f' ORDER BY "{TIME_COLUMNS[table]}" DESC'
+        
+        return query, params
+    
+    def _read_table(self, table, days=None, since_id=None, columns=None):
+        """Read the live rows of a table, newest first."""
+        query, params = self._table_query(table, days, since_id, columns)
+        with self._connect() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        return apply_schema(df, table)
+    
+    def _iter_table(self, table, days=None, itersize=None, columns=None):
+        """Stream a table in chunks straight from the SQLite cursor."""
+        query, params = self._table_query(table, days, columns=columns)
+        with self._connect() as conn:
+            for chunk in pd.read_sql_query(query, conn, params=params,
+                                           chunksize=itersize or DEFAULT_ITERSIZE):
+                yield apply_schema(chunk, table)
+    
+    def count_stock_history(self, days=None):
+        """Count the stock history rows of a window."""
+        query = 'SELECT COUNT(*) FROM "stockHistory" WHERE "deleted" = 0'
+        params = []
+        if days:
+            query += ' AND "createdAt" >= ?'
+            params.append(window_start(days))
+        with self._connect() as conn:
+            return int(conn.execute(query, params).fetchone()[0])
+    
+    def get_daily_usage(self, days=None):
+        """Get the daily usage aggregated in SQLite."""
+        query = """
+            SELECT date("createdAt") AS "date", SUM("quantity") AS "quantity"
+            FROM "stockHistory"
+            WHERE "deleted" = 0 AND "action" IN ('sell', 'remove')
+        """
+        params = []
+        if days:
+            query += ' AND "createdAt" >= ?'
+            params.append(window_start(days))
+        query += " GROUP BY 1 ORDER BY 1"
+        
+        with self._connect() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        return apply_schema(df, 'dailyUsage')
+    
+    def get_calendar_counts(self, table, days=None):
+        """Get row counts per hour, weekday and month aggregated in SQLite."""
+        if table not in SOFT_DELETE_TABLES:
+            raise ValueError(f"Unsupported table for calendar counts: {table}")
+        
+        # strftime('%w') counts from Sunday = 0, shift it to Monday = 0
+        query = f"""
+            SELECT
+                CAST(strftime('%H', "createdAt") AS INTEGER) AS "hour",
+                (CAST(strftime('%w', "createdAt") AS INTEGER) + 6) % 7 AS "weekday",
+                CAST(strftime('%m', "createdAt") AS INTEGER) AS "month",
+                COUNT(*) AS "count"
+            FROM "{table}"
+            WHERE "deleted" = 0
+        """
+        params = []
+        if days:
+            query += ' AND "createdAt" >= ?'
+            params.append(window_start(days))
+        query += " GROUP BY 1, 2, 3"
+        
+        with self._connect() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        return apply_schema(df, 'calendarCounts')
+
+class ParquetDataSource(DataSource):
+    """Data source reading one Parquet file per table from a directory."""
+    
+    def __init__(self, directory, max_workers=None):
+        """
+        Initialize the Parquet data source.
+        
+        Args:
+            directory: Directory with stockHistory.parquet, stock.parquet and orders.parquet
+            max_workers: Threads used by fetch_concurrently
+        """
+        super().__init__(max_workers=max_workers)
+        if not os.path.isdir(directory):
+            raise ValueError(f"Parquet data directory not found: {directory}")
+        self.directory = directory
+    
+    def _table_path(self, table):
+        """Get the Parquet file of a table."""
+        return os.path.join(self.directory, f"{table}.parquet")
+    
+    def _read_columns(self, table, columns=None):
+        """Columns to read from disk: the selection plus the filter columns."""
+        read_columns = schema_columns(table, columns)
+        for column in ('id', TIME_COLUMNS[table]):
+            if column not in read_columns:
+                read_columns.append(column)
+        if table in SOFT_DELETE_TABLES:
+            read_columns.append('deleted')
+        return read_columns
+    
+    def _read_table(self, table, days=None, since_id=None, columns=None):
+        """Read the live rows of a table, newest first."""
+        filters = None
+        if days:
+            filters = [(TIME_COLUMNS[table], '>=', pd.Timestamp(window_start(days)))]
+        
+        df = pd.read_parquet(
+            self._table_path(table),
+            columns=self._read_columns(table, columns),
+            filters=filters
+        )
+        df = _filter_window(df, table, since_id=since_id)
+        df = df.sort_values(TIME_COLUMNS[table], ascending=False).reset_index(drop=True)
+        return apply_schema(df[schema_columns(table, columns)], table)
+    
+    def _iter_table(self, table, days=None, itersize=None, columns=None):
+        """Stream a table in record batches without loading the whole file."""
+        import pyarrow.parquet as pq
+        
+        parquet_file = pq.ParquetFile(self._table_path(table))
+        for batch in parquet_file.iter_batches(batch_size=itersize or DEFAULT_ITERSIZE,
+                                               columns=self._read_columns(table, columns)):
+            df = _filter_window(batch.to_pandas(), table, days)
+            if not df.empty:
+                yield apply_schema(df[schema_columns(table, columns)].reset_index(drop=True), table)
\ No newline at end of file
@@ -4,180 +4,545 @@ Database connector module for the AI prediction system.
 This module connects to the PostgreSQL database and provides functions to fetch data.
 """
 
+import io
 import os
+import uuid
+import threading
+from contextlib import contextmanager
 import pandas as pd
 import psycopg2
-from datetime import datetime, timedelta
+from psycopg2 import pool
+from data_source import (
+    DataSource,
+    SQLiteDataSource,
+    ParquetDataSource,
+    TABLE_SCHEMAS,
+    DEFAULT_ITERSIZE,
+    window_start,
+    select_list,
+    apply_schema
+)
 
-class DatabaseConnector:
+# Default pool bounds, overridable through the environment
+DEFAULT_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 1))
+DEFAULT_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))
+
+# Numeric columns converted to floats instead of Decimal objects
+DECIMAL_AS_FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values,
+    'DECIMAL_AS_FLOAT',
+    lambda value, cursor: float(value) if value is not None else None
+)
+
+class DatabaseConnector(DataSource):
     """Class to connect to the PostgreSQL database and fetch data."""
     
-    def __init__(self):
-        """Initialize the database connector."""
-        self.conn = None
+    def __init__(self, min_connections=None, max_connections=None):
+        """
+        Initialize the database connector.
+        
+        Args:
+            min_connections: Connections kept open in the pool (default DB_POOL_MIN)
+            max_connections: Upper bound of pooled connections (default DB_POOL_MAX)
+        """
+        self.pool = None
         self.database_url = os.environ.get('DATABASE_URL', '')
         if not self.database_url:
             raise ValueError("DATABASE_URL environment variable not set")
+        
+        self.min_connections = min_connections or DEFAULT_POOL_MIN
+        self.max_connections = max(max_connections or DEFAULT_POOL_MAX, self.min_connections)
+        self._pool_lock = threading.Lock()
+        # Threads wait for a free slot instead of failing when the pool is exhausted
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        
+        # Concurrent fetches get one pooled connection each
+        super().__init__(max_workers=self.max_connections)
     
     def connect(self):
-        """Connect to the PostgreSQL database."""
-        try:
-            self.conn = psycopg2.connect(self.database_url)
-            return self.conn
-        except Exception as e:
-            print(f"Error connecting to database: {e}")
-            raise
+        """
+        Create the connection pool if it does not exist yet.
+        
+        Returns:
+            The thread-safe connection pool
+        """
+        if self.pool is not None:
+            return self.pool
+        
+        with self._pool_lock:
+            if self.pool is None:
+                try:
+                    self.pool = pool.ThreadedConnectionPool(
+                        self.min_connections,
+                        self.max_connections,
+                        self.database_url
+                    )
+                except Exception as e:
+                    print(f"Error connecting to database: {e}")
+                    raise
+        return self.pool
     
     def close(self):
-        """Close the database connection."""
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        """Close every pooled database connection."""
+        with self._pool_lock:
+            if self.pool:
+                self.pool.closeall()
+                self.pool = None
     
-    def get_stock_history(self, days=None):
+    def _is_healthy(self, conn):
+        """Check that a pooled connection is still usable."""
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+    
+    def _checkout(self, connection_pool):
         """
-        Fetch stock history data from the database.
+        Get a healthy connection from the pool.
+        
+        Broken connections (server restarts, idle timeouts) are discarded
+        and replaced, trying at most once per pooled slot.
         
         Args:
-            days: Optional number of days to fetch data for (from today)
+            connection_pool: Pool to check the connection out from
             
         Returns:
-            Pandas DataFrame with stock history data
+            An open psycopg2 connection
         """
+        for _ in range(self.max_connections + 1):
+            conn = connection_pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            connection_pool.putconn(conn, close=True)
+        raise psycopg2.OperationalError("No healthy database connection available")
+    
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection from the pool for the duration of a block.
+        
+        The connection is rolled back and returned to the pool on exit, so
+        read-only queries never leave a transaction open.
+        
+        Yields:
+            An open psycopg2 connection
+        """
+        connection_pool = self.connect()
+        self._slots.acquire()
         try:
-            self.connect()
-            cursor = self.conn.cursor()
+            conn = self._checkout(connection_pool)
+        except Exception:
+            self._slots.release()
+            raise
+        
+        discard = False
+        try:
+            yield conn
+        finally:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+            connection_pool.putconn(conn, close=discard or conn.closed != 0)
+            self._slots.release()
+    
+    def _fetch_dataframe(self, query, params=None, table=None):
+        """
+        Run a query on a pooled connection and build a DataFrame from it.
+        
+        Args:
+            query: SQL query to execute
+            params: Optional query parameters
+            table: Optional table whose schema types the result
             
-            query = """
-                SELECT
-                    "id",
-                    "stockId",
-                    "action",
-                    "quantity",
-                    "newStock",
-                    "description",
-                    "createdAt",
-                    "createdBy"
-                FROM "stockHistory"
-                WHERE "deleted" = false
-            """
+        Returns:
+            Pandas DataFrame with the query results
+        """
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                # Same numeric types as the bulk and streaming paths
+                psycopg2.extensions.register_type(DECIMAL_AS_FLOAT, cursor)
+                cursor.execute(query, params)
+                columns = [desc[0] for desc in cursor.description]
+                data = cursor.fetchall()
+        return apply_schema(pd.DataFrame(data, columns=columns), table)
+    
+    def _iter_dataframes(self, query, params=None, itersize=None, table=None):
+        """
+        Stream a query through a named server-side cursor as DataFrame chunks.
+        
+        Only one chunk of rows is held in memory at a time, and every chunk
+        is typed with the table schema.
+        
+        Args:
+            query: SQL query to execute
+            params: Optional query parameters
+            itersize: Rows per chunk (default DB_ITERSIZE)
+            table: Optional table whose schema types the chunks
             
-            if days:
-                date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-                query += f" AND \"createdAt\" >= '{date_limit}'"
+        Yields:
+            Pandas DataFrames with up to itersize rows each
+        """
+        itersize = itersize or DEFAULT_ITERSIZE
+        with self.connection() as conn:
+            with conn.cursor(name=f"ai_stream_{uuid.uuid4().hex}") as cursor:
+                psycopg2.extensions.register_type(DECIMAL_AS_FLOAT, cursor)
+                cursor.itersize = itersize
+                cursor.execute(query, params)
                 
-            query += " ORDER BY \"createdAt\" DESC"
-            
-            cursor.execute(query)
-            columns = [desc[0] for desc in cursor.description]
+                while True:
+                    rows = cursor.fetchmany(itersize)
+                    if not rows:
+                        break
+                    columns = [desc[0] for desc in cursor.description]
+                    yield apply_schema(pd.DataFrame(rows, columns=columns), table)
+    
+    def _copy_dataframe(self, query, params=None, table=None):
+        """
+        Export a query with COPY ... TO STDOUT and parse it into a typed DataFrame.
+        
+        The rows never become Python tuples: Postgres streams CSV and the
+        pandas C parser builds NumPy columns directly from it.
+        
+        Args:
+            query: SQL query to export
+            params: Optional query parameters
+            table: Optional table whose schema types the parsed columns
             
-            data = cursor.fetchall()
-            df = pd.DataFrame(data, columns=columns)
+        Returns:
+            Pandas DataFrame with the query results
+        """
+        buffer = io.BytesIO()
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                select_sql = cursor.mogrify(query, params).decode()
+                cursor.copy_expert(
+                    f"COPY ({select_sql}) TO STDOUT WITH (FORMAT csv, HEADER true)",
+                    buffer
+                )
+        
+        schema = TABLE_SCHEMAS.get(table, {})
+        dtypes = {column: dtype for column, dtype in schema.items() if dtype != 'datetime64[ns]'}
+        parse_dates = [column for column, dtype in schema.items() if dtype == 'datetime64[ns]']
+        
+        buffer.seek(0)
+        header = buffer.readline().decode().strip().split(',')
+        buffer.seek(0)
+        return apply_schema(pd.read_csv(
+            buffer,
+            dtype={column: dtypes[column] for column in header if column in dtypes},
+            parse_dates=[column for column in parse_dates if column in header]
+        ), table)
+    
+    def _read_table(self, table, days=None, since_id=None, columns=None):
+        """Read the live rows of a table with its SQL fetch method."""
+        if table == 'stock':
+            return self.get_daily_stock(days, columns=columns)
+        fetch = {'stockHistory': self.get_stock_history, 'orders': self.get_orders}[table]
+        return fetch(days, since_id, columns)
+    
+    def _stock_history_query(self, days=None, since_id=None, columns=None):
+        """Build the stock history query and its parameters."""
+        query = f"""
+            SELECT {select_list('stockHistory', columns)}
+            FROM "stockHistory"
+            WHERE "deleted" = false
+        """
+        params = []
+        
+        if days:
+            query += " AND \"createdAt\" >= %s"
+            params.append(window_start(days))
+        
+        if since_id is not None:
+            query += " AND \"id\" > %s"
+            params.append(int(since_id))
+        
+        query += " ORDER BY \"createdAt\" DESC"
+        
+        return query, params
+    
+    def get_stock_history(self, days=None, since_id=None, columns=None):
+        """
+        Fetch stock history data from the database.
+        
+        Args:
+            days: Optional number of days to fetch data for (from today)
+            since_id: Optional id watermark, only rows with a greater id are fetched
+            columns: Optional subset of columns to fetch (default all)
             
-            self.close()
-            return df
+        Returns:
+            Pandas DataFrame with stock history data
+        """
+        try:
+            query, params = self._stock_history_query(days, since_id, columns)
+            return self._fetch_dataframe(query, params, 'stockHistory')
         except Exception as e:
             print(f"Error fetching stock history: {e}")
-            self.close()
             raise
     
-    def get_daily_stock(self, days=None):
+    def get_daily_stock(self, days=None, columns=None):
         """
         Fetch daily stock data from the database.
         
         Args:
             days: Optional number of days to fetch data for (from today)
+            columns: Optional subset of columns to fetch (default all)
             
         Returns:
             Pandas DataFrame with daily stock data
         """
         try:
-            self.connect()
-            cursor = self.conn.cursor()
-            
-            query = """
-                SELECT
-                    "id",
-                    "date",
-                    "initialStock",
-                    "currentStock",
-                    "reservedStock",
-                    "unreservedStock",
-                    "lastUpdated"
+            query = f"""
+                SELECT {select_list('stock', columns)}
                 FROM "stock"
             """
+            params = []
             
             if days:
-                date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-                query += f" WHERE \"date\" >= '{date_limit}'"
-                
-            query += " ORDER BY \"date\" DESC"
-            
-            cursor.execute(query)
-            columns = [desc[0] for desc in cursor.description]
+                query += " WHERE \"date\" >= %s"
+                params.append(window_start(days))
             
-            data = cursor.fetchall()
-            df = pd.DataFrame(data, columns=columns)
+            query += " ORDER BY \"date\" DESC"
             
-            self.close()
-            return df
+            return self._fetch_dataframe(query, params, 'stock')
         except Exception as e:
             print(f"Error fetching daily stock: {e}")
-            self.close()
             raise
     
-    def get_orders(self, days=None):
+    def _orders_query(self, days=None, since_id=None, columns=None):
+        """Build the orders query and its parameters."""
+        query = f"""
+            SELECT {select_list('orders', columns)}
+            FROM "orders"
+            WHERE "deleted" = false
+        """
+        params = []
+        
+        if days:
+            query += " AND \"createdAt\" >= %s"
+            params.append(window_start(days))
+        
+        if since_id is not None:
+            query += " AND \"id\" > %s"
+            params.append(int(since_id))
+        
+        query += " ORDER BY \"createdAt\" DESC"
+        
+        return query, params
+    
+    def get_orders(self, days=None, since_id=None, columns=None):
         """
         Fetch orders data from the database.
         
         Args:
             days: Optional number of days to fetch data for (from today)
+            since_id: Optional id watermark, only rows with a greater id are fetched
+            columns: Optional subset of columns to fetch (default all)
             
         Returns:
             Pandas DataFrame with orders data
         """
         try:
-            self.connect()
-            cursor = self.conn.cursor()
+            query, params = self._orders_query(days, since_id, columns)
+            return self._fetch_dataframe(query, params, 'orders')
+        except Exception as e:
+            print(f"Error fetching orders: {e}")
+            raise
+    
+    def iter_stock_history(self, days=None, itersize=None, columns=None):
+        """
+        Stream stock history data from the database in chunks.
+        
+        Args:
+            days: Optional number of days to fetch data for (from today)
+            itersize: Rows per chunk (default DB_ITERSIZE)
+            columns: Optional subset of columns to fetch (default all)
+            
+        Yields:
+            Pandas DataFrames with stock history data
+        """
+        query, params = self._stock_history_query(days, columns=columns)
+        yield from self._iter_dataframes(query, params, itersize, 'stockHistory')
+    
+    def iter_orders(self, days=None, itersize=None, columns=None):
+        """
+        Stream orders data from the database in chunks.
+        
+        Args:
+            days: Optional number of days to fetch data for (from today)
+            itersize: Rows per chunk (default DB_ITERSIZE)
+            columns: Optional subset of columns to fetch (default all)
             
+        Yields:
+            Pandas DataFrames with orders data
+        """
+        query, params = self._orders_query(days, columns=columns)
+        yield from self._iter_dataframes(query, params, itersize, 'orders')
+    
+    def count_stock_history(self, days=None):
+        """
+        Count the stock history rows of a window.
+        
+        Args:
+            days: Optional number of days to count (from today)
+            
+        Returns:
+            Number of rows as an int
+        """
+        query = 'SELECT COUNT(*) AS "count" FROM "stockHistory" WHERE "deleted" = false'
+        params = []
+        
+        if days:
+            query += " AND \"createdAt\" >= %s"
+            params.append(window_start(days))
+        
+        return int(self._fetch_dataframe(query, params)['count'].iloc[0])
+    
+    def bulk_stock_history(self, days=None, since_id=None, columns=None):
+        """
+        Bulk-load stock history data with COPY, for large training windows.
+        
+        Args:
+            days: Optional number of days to fetch data for (from today)
+            since_id: Optional id watermark, only rows with a greater id are fetched
+            columns: Optional subset of columns to fetch (default all)
+            
+        Returns:
+            Pandas DataFrame with stock history data
+        """
+        try:
+            query, params = self._stock_history_query(days, since_id, columns)
+            return self._copy_dataframe(query, params, 'stockHistory')
+        except Exception as e:
+            print(f"Error bulk loading stock history: {e}")
+            raise
+    
+    def bulk_orders(self, days=None, since_id=None, columns=None):
+        """
+        Bulk-load orders data with COPY.
+        
+        Args:
+            days: Optional number of days to fetch data for (from today)
+            since_id: Optional id watermark, only rows with a greater id are fetched
+            columns: Optional subset of columns to fetch (default all)
+            
+        Returns:
+            Pandas DataFrame with orders data
+        """
+        try:
+            query, params = self._orders_query(days, since_id, columns)
+            return self._copy_dataframe(query, params, 'orders')
+        except Exception as e:
+            print(f"Error bulk loading orders: {e}")
+            raise
+    
+    def get_daily_usage(self, days=None):
+        """
+        Fetch the daily usage (sum of sell/remove quantities) aggregated in the database.
+        
+        Args:
+            days: Optional number of days to fetch data for (from today)
+            
+        Returns:
+            Pandas DataFrame with 'date' and 'quantity' columns, one row per day
+        """
+        try:
             query = """
                 SELECT
-                    "id",
-                    "customerName",
-                    "quantity",
-                    "pickupTime",
-                    "status",
-                    "totalAmount",
-                    "createdAt",
-                    "updatedAt"
-                FROM "orders"
+                    date_trunc('day', "createdAt") AS "date",
+                    SUM("quantity") AS "quantity"
+                FROM "stockHistory"
                 WHERE "deleted" = false
+                  AND "action" IN ('sell', 'remove')
             """
+            params = []
             
             if days:
-                date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-                query += f" AND \"createdAt\" >= '{date_limit}'"
-                
-            query += " ORDER BY \"createdAt\" DESC"
+                query += " AND \"createdAt\" >= %s"
+                params.append(window_start(days))
+            
+            query += " GROUP BY 1 ORDER BY 1"
+            
+            return self._fetch_dataframe(query, params, 'dailyUsage')
+        except Exception as e:
+            print(f"Error fetching daily usage: {e}")
+            raise
+    
+    def get_calendar_counts(self, table, days=None):
+        """
+        Fetch row counts per hour, weekday and month aggregated in the database.
+        
+        Args:
+            table: Table to count, 'stockHistory' or 'orders'
+            days: Optional number of days to fetch data for (from today)
             
-            cursor.execute(query)
-            columns = [desc[0] for desc in cursor.description]
+        Returns:
+            Pandas DataFrame with 'hour', 'weekday' (0 = Monday), 'month' and
+            'count' columns, one row per combination present in the data
+        """
+        if table not in ('stockHistory', 'orders'):
+            raise ValueError(f"Unsupported table for calendar counts: {table}")
+        
+        try:
+            query = f"""
+                SELECT
+                    EXTRACT(HOUR FROM "createdAt")::int AS "hour",
+                    (EXTRACT(ISODOW FROM "createdAt")::int - 1) AS "weekday",
+                    EXTRACT(MONTH FROM "createdAt")::int AS "month",
+                    COUNT(*) AS "count"
+                FROM "{table}"
+                WHERE "deleted" = false
+            """
+            params = []
+            
+            if days:
+                query += " AND \"createdAt\" >= %s"
+                params.append(window_start(days))
             
-            data = cursor.fetchall()
-            df = pd.DataFrame(data, columns=columns)
+            query += " GROUP BY 1, 2, 3"
             
-            self.close()
-            return df
+            return self._fetch_dataframe(query, params, 'calendarCounts')
         except Exception as e:
-            print(f"Error fetching orders: {e}")
-            self.close()
+            print(f"Error fetching calendar counts: {e}")
             raise
 
 _connector = None
+_connector_lock = threading.Lock()
+
+def create_data_source(spec=None):
+    """
+    Create the data source described by a backend spec.
+    
+    Args:
+        spec: 'postgres' (DATABASE_URL), 'sqlite:<file>' or 'parquet:<directory>'.
+            Defaults to the AI_DATA_SOURCE environment variable, then 'postgres'.
+            
+    Returns:
+        DataSource instance
+    """
+    spec = spec or os.environ.get('AI_DATA_SOURCE', 'postgres')
+    backend, _, location = spec.partition(':')
+    
+    if backend in ('postgres', 'postgresql'):
+        return DatabaseConnector()
+    if backend == 'sqlite':
+        return SQLiteDataSource(location)
+    if backend == 'parquet':
+        return ParquetDataSource(location)
+    raise ValueError(f"Unknown data source: {spec}")
 
 def get_connector():
-    """Get the database connector instance."""
+    """Get the data source instance shared by every request thread."""
     global _connector
     if _connector is None:
-        _connector = DatabaseConnector()
+        with _connector_lock:
+            if _connector is None:
+                _connector = create_data_source()
     return _connector
\ No newline at end of file
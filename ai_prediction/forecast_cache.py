@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Forecast cache module for the AI prediction system.
+This module keeps the most recently served forecasts in memory, keyed by the
+model version they were computed with, so repeated requests skip prediction.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+class ForecastCache:
+    """
+    Least-recently-used cache of forecasts.
+    
+    Forecasts are keyed by (model name, model version, start date, horizon)
+    plus any option that changes their values, such as the number of
+    uncertainty samples. A retrained model has a new version, so its
+    forecasts never collide with the stale ones, which simply age out.
+    Cached forecasts are shared between requests and must not be modified.
+    """
+    
+    def __init__(self, max_entries=None):
+        """
+        Initialize the forecast cache.
+        
+        Args:
+            max_entries: Optional maximum number of cached forecasts
+                (default AI_FORECAST_CACHE_SIZE or 64, 0 disables caching)
+        """
+        self.max_entries = int(
+            max_entries if max_entries is not None else os.environ.get('AI_FORECAST_CACHE_SIZE', 64)
+        )
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_or_compute(self, key, compute):
+        """
+        Get a cached forecast, computing and caching it on a miss.
+        
+        Args:
+            key: Hashable key, e.g. (name, version, start date, horizon, samples)
+            compute: Callable returning the forecast
+            
+        Returns:
+            The cached or freshly computed forecast
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        
+        # Computed outside the lock; concurrent misses of one key may both compute
+        forecast = compute()
+        
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[key] = forecast
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        
+        return forecast
+    
+    def clear(self):
+        """Remove every cached forecast."""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        """
+        Get the cache usage counters.
+        
+        Returns:
+            Dictionary with 'entries', 'max_entries', 'hits' and 'misses'
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+# Process-wide forecast cache
+_forecast_cache = None
+_forecast_cache_lock = threading.Lock()
+
+def get_forecast_cache():
+    """Get the process-wide forecast cache instance."""
+    global _forecast_cache
+    if _forecast_cache is None:
+        with _forecast_cache_lock:
+            if _forecast_cache is None:
+                _forecast_cache = ForecastCache()
+    return _forecast_cache
\ No newline at end of file
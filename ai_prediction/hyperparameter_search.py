@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Hyperparameter search module for the AI prediction system.
+This module tunes the predictors with successive halving over rolling-origin
+folds and persists the winning configurations for later training runs.
+"""
+
+import os
+import json
+from datetime import datetime
+import numpy as np
+from sklearn.model_selection import ParameterGrid
+from backtesting import (
+    METRICS_PATH, FoldRunner, daily_series, find_model_entry, rolling_origins
+)
+
+# Candidate hyperparameters of every model, as ParameterGrid specifications
+SEARCH_SPACES = {
+    'prophet': {
+        'changepoint_prior_scale': [0.01, 0.05, 0.1, 0.5],
+        'seasonality_prior_scale': [1.0, 10.0],
+        'seasonality_mode': ['additive', 'multiplicative']
+    },
+    'ml': [
+        {
+            'estimator': ['random_forest'],
+            'n_estimators': [50, 100, 200],
+            'max_depth': [6, 10, None],
+            'min_samples_split': [5],
+            'min_samples_leaf': [1, 2, 4]
+        },
+        {
+            'estimator': ['hist_gradient_boosting'],
+            'learning_rate': [0.05, 0.1],
+            'max_iter': [100, 200],
+            'max_depth': [3, None],
+            'min_samples_leaf': [5, 20]
+        }
+    ]
+}
+
+TUNED_PARAMS_PATH = os.path.join(os.path.dirname(__file__), 'outputs', 'models', 'tuned_params.json')
+
+def load_tuned_params(path=None):
+    """
+    Load the persisted winning hyperparameters.
+    
+    Args:
+        path: Optional path of the tuned parameters file
+        
+    Returns:
+        Dictionary of model name -> hyperparameters (empty if never tuned)
+    """
+    path = path or TUNED_PARAMS_PATH
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            tuned = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return {name: result['params'] for name, result in tuned.items()}
+
+def save_tuned_params(results, path=None):
+    """
+    Persist the winning hyperparameters, keeping those of models not tuned now.
+    
+    Args:
+        results: Dictionary of model name -> successive_halving() result
+        path: Optional path of the tuned parameters file
+        
+    Returns:
+        Path to the written file
+    """
+    path = path or TUNED_PARAMS_PATH
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            tuned = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        tuned = {}
+    
+    tuned_at = datetime.now().isoformat(timespec='seconds')
+    for name, result in results.items():
+        tuned[name] = {'params': result['params'], 'mae': result['mae'], 'tuned_at': tuned_at}
+    
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(tuned, f, indent=2)
+    return path
+
+def successive_halving(runner, model_name, candidates, origins, horizon, eta=3):
+    """
+    Select the best candidate with successive halving over forecast origins.
+    
+    Every candidate is first scored on the most recent fold only; the best
+    1/eta of them move on to a rung with eta times more folds, and so on
+    until one candidate is left or every fold is used. Scores of folds
+    already run in earlier rungs are reused, and each rung runs all its
+    (candidate, fold) tasks in parallel.
+    
+    Args:
+        runner: Entered FoldRunner over the daily series
+        model_name: Key of BACKTEST_MODELS
+        candidates: List of hyperparameter dictionaries
+        origins: Forecast origins, oldest first
+        horizon: Days forecast from every origin
+        eta: Reduction factor between rungs
+        
+    Returns:
+        Dictionary with the winning 'params', its 'mae', the 'rungs' and a
+        'leaderboard' of every candidate, deepest rung and lowest MAE first
+    """
+    usage = runner.series.values
+    fold_mae = {}
+    # Deepest rung reached by every candidate: (folds, mean MAE)
+    reached = {}
+    alive = list(range(len(candidates)))
+    n_folds = 1
+    rungs = []
+    
+    while True:
+        rung_origins = origins[-n_folds:]
+        tasks = [(candidate, origin) for candidate in alive for origin in rung_origins
+                 if (candidate, origin) not in fold_mae]
+        results = runner.run([
+            (model_name, origin, horizon, candidates[candidate]) for candidate, origin in tasks
+        ])
+        for (candidate, origin), result in zip(tasks, results):
+            actual = usage[origin:origin + horizon]
+            fold_mae[(candidate, origin)] = float(np.mean(np.abs(result['yhat'] - actual)))
+        
+        scores = {
+            candidate: float(np.mean([fold_mae[(candidate, origin)] for origin in rung_origins]))
+            for candidate in alive
+        }
+        reached.update({candidate: (len(rung_origins), score) for candidate, score in scores.items()})
+        alive.sort(key=scores.get)
+        rungs.append({
+            'folds': len(rung_origins),
+            'candidates': len(alive),
+            'best_mae': scores[alive[0]]
+        })
+        
+        if len(alive) == 1 or len(rung_origins) == len(origins):
+            break
+        alive = alive[:max(1, len(alive) // eta)]
+        n_folds = min(n_folds * eta, len(origins))
+    
+    return {
+        'params': candidates[alive[0]],
+        'mae': scores[alive[0]],
+        'rungs': rungs,
+        'leaderboard': [
+            {'params': candidates[candidate], 'folds': folds, 'mae': mae}
+            for candidate, (folds, mae) in sorted(reached.items(), key=lambda item: (-item[1][0], item[1][1]))
+        ]
+    }
+
+def tune_hyperparameters(daily_usage_df, models=None, folds=9, horizon=14, step=7, eta=3,
+                         max_candidates=None, workers=None, seed=42):
+    """
+    Tune the hyperparameters of the models and persist the winners.
+    
+    Args:
+        daily_usage_df: DataFrame with 'date' and 'usage' columns
+        models: Optional list of SEARCH_SPACES keys (default all)
+        folds: Maximum number of forecast origins
+        horizon: Days forecast from every origin
+        step: Days between origins
+        eta: Reduction factor between successive halving rungs
+        max_candidates: Optional number of candidates sampled from each space
+        workers: Optional number of worker processes
+        seed: Seed of the candidate sampling
+        
+    Returns:
+        Dictionary of model name -> successive_halving() result
+    """
+    models = list(models or SEARCH_SPACES)
+    series = daily_series(daily_usage_df)
+    origins = rolling_origins(len(series), folds=folds, horizon=horizon, step=step)
+    if not origins:
+        raise ValueError(f"Not enough days of usage to tune the models, got {len(series)}")
+    
+    rng = np.random.default_rng(seed)
+    results = {}
+    # One pool and one copy of the series serve every model and rung
+    with FoldRunner(series, workers=workers) as runner:
+        for model_name in models:
+            candidates = list(ParameterGrid(SEARCH_SPACES[model_name]))
+            if max_candidates and len(candidates) > max_candidates:
+                chosen = rng.choice(len(candidates), size=max_candidates, replace=False)
+                candidates = [candidates[index] for index in sorted(chosen)]
+            results[model_name] = successive_halving(runner, model_name, candidates, origins, horizon, eta=eta)
+            results[model_name]['candidates'] = len(candidates)
+    
+    save_tuned_params(results)
+    record_tuning(results)
+    return results
+
+def record_tuning(results, path=None):
+    """
+    Record the tuning results of the models in the model metrics file.
+    
+    Args:
+        results: Dictionary of model name -> successive_halving() result
+        path: Optional path of the metrics file
+    """
+    path = path or METRICS_PATH
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            document = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return
+    
+    entries = document.get('model_training', {}).get('models', [])
+    for model_name, result in results.items():
+        entry = find_model_entry(entries, model_name)
+        if entry is None:
+            continue
+        entry['hyperparameter_tuning'] = [
+            {**candidate['params'], 'folds': candidate['folds'], 'mae': round(candidate['mae'], 4)}
+            for candidate in result['leaderboard'][:10]
+        ]
+    
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2, ensure_ascii=False)
\ No newline at end of file
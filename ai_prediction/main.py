@@ -18,6 +18,17 @@ def main():
                         help='Run in debug mode')
     parser.add_argument('--host', type=str, default='0.0.0.0',
                         help='Host to run the API server on')
+    parser.add_argument('--no-preload', action='store_true',
+                        help='Load the models on the first request instead of in the background at startup')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Serve with a pre-fork server and this many worker processes '
+                             '(default 0: single-process development server)')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='Threads per worker process of the pre-fork server')
+    parser.add_argument('--max-requests', type=int, default=1000,
+                        help='Requests served by a worker before it is replaced (0 never)')
+    parser.add_argument('--timeout', type=int, default=600,
+                        help='Seconds a worker may spend on one request')
     
     args = parser.parse_args()
     
@@ -27,7 +38,15 @@ def main():
     os.makedirs(os.path.join(os.path.dirname(__file__), 'outputs', 'data'), exist_ok=True)
     
     # Start the API server
-    start_api(host=args.host, port=args.port, debug=args.debug)
+    if args.workers > 0:
+        # Only needed (and only available on Unix) in production mode
+        from wsgi_server import start_production_api
+        start_production_api(host=args.host, port=args.port, workers=args.workers,
+                             threads=args.threads, max_requests=args.max_requests,
+                             timeout=args.timeout)
+    else:
+        start_api(host=args.host, port=args.port, debug=args.debug,
+                  preload=False if args.no_preload else None)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Model registry module for the AI prediction system.
+This module keeps the trained models loaded in memory and reloads them only
+when their files on disk change.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+
+class ModelRegistry:
+    """
+    Process-wide registry of loaded predictors.
+    
+    Each registered predictor is loaded from disk once. Later requests reuse
+    the loaded instance; its artifact files are stat-ed at most every
+    check_interval seconds and the predictor is reloaded only when their
+    modification times change (e.g. another worker trained a new model).
+    Training publishes a new predictor instance, which replaces the previous
+    entry atomically, so requests in flight keep the model they started with.
+    """
+    
+    def __init__(self, check_interval=None):
+        """
+        Initialize the model registry.
+        
+        Args:
+            check_interval: Optional seconds between artifact mtime checks
+                (default AI_MODEL_CHECK_INTERVAL or 2)
+        """
+        self.check_interval = float(
+            check_interval if check_interval is not None else os.environ.get('AI_MODEL_CHECK_INTERVAL', 2)
+        )
+        self._factories = {}
+        self._paths = {}
+        self._entries = {}
+        self._checked_at = {}
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+    
+    def register(self, name, factory):
+        """
+        Register a predictor class (or factory) under a name.
+        
+        Args:
+            name: Model name, e.g. 'prophet'
+            factory: Callable returning a new, unloaded predictor with
+                load_model() and model_path (and optionally scaler_path),
+                whose model_path file is replaced last when it is saved
+        """
+        with self._registry_lock:
+            if name in self._factories:
+                return
+            template = factory()
+            self._factories[name] = factory
+            self._paths[name] = [
+                getattr(template, attribute) for attribute in ('model_path', 'scaler_path')
+                if getattr(template, attribute, None)
+            ]
+            self._locks[name] = threading.Lock()
+    
+    def _signature(self, name):
+        """Get the modification times of the artifacts of a model, None if any is missing."""
+        try:
+            return tuple(os.stat(path).st_mtime_ns for path in self._paths[name])
+        except FileNotFoundError:
+            return None
+    
+    def _entry(self, name, predictor, signature):
+        """Build a registry entry for a loaded predictor."""
+        return {
+            'predictor': predictor,
+            'version': datetime.fromtimestamp(max(signature) / 1e9).strftime('%Y%m%d%H%M%S'),
+            'signature': signature,
+            'loaded_at': datetime.now().isoformat()
+        }
+    
+    def get(self, name):
+        """
+        Get the current entry of a model, loading or reloading it if its files changed.
+        
+        Args:
+            name: Registered model name
+            
+        Returns:
+            Dictionary with 'predictor', 'version', 'signature' and 'loaded_at',
+            or None if no trained model exists
+        """
+        entry = self._entries.get(name)
+        now = time.monotonic()
+        if entry is not None and now - self._checked_at.get(name, 0) < self.check_interval:
+            return entry
+        
+        signature = self._signature(name)
+        if entry is not None and entry['signature'] == signature:
+            self._checked_at[name] = now
+            return entry
+        
+        with self._locks[name]:
+            # Another thread may have reloaded it while we waited
+            entry = self._entries.get(name)
+            if entry is not None and entry['signature'] == signature:
+                return entry
+            
+            if signature is None:
+                self._entries.pop(name, None)
+                return None
+            
+            try:
+                predictor = self._factories[name]()
+                loaded = predictor.load_model() is not None
+            except Exception as e:
+                # Files may be mid-write by another process, keep serving the current model
+                print(f"Error loading {name} model: {e}")
+                return entry
+            
+            entry = self._entry(name, predictor, signature) if loaded else None
+            self._entries[name] = entry
+            self._checked_at[name] = time.monotonic()
+            return entry
+    
+    def publish(self, name, predictor):
+        """
+        Publish a freshly trained predictor (its artifacts already saved).
+        
+        Args:
+            name: Registered model name
+            predictor: Trained predictor instance
+            
+        Returns:
+            The new registry entry
+        """
+        with self._locks[name]:
+            entry = self._entry(name, predictor, self._signature(name))
+            self._entries[name] = entry
+            self._checked_at[name] = time.monotonic()
+            return entry
+    
+    def changed(self):
+        """
+        Get the models whose artifacts on disk differ from the loaded ones.
+        
+        Returns:
+            List of model names with new (saved but not yet loaded) artifacts
+        """
+        changed = []
+        for name in self._factories:
+            entry = self._entries.get(name)
+            signature = self._signature(name)
+            if signature is not None and (entry is None or entry['signature'] != signature):
+                changed.append(name)
+        return changed
+    
+    def refresh(self):
+        """
+        Reload every model whose artifacts changed, without waiting for the check interval.
+        
+        Returns:
+            Dictionary mapping model names to versions (None if not loaded)
+        """
+        for name in self._factories:
+            self._checked_at.pop(name, None)
+            self.get(name)
+        return self.versions()
+    
+    def versions(self):
+        """
+        Get the versions of the loaded models.
+        
+        Returns:
+            Dictionary mapping model names to versions (None if not loaded)
+        """
+        return {
+            name: (entry['version'] if entry else None)
+            for name, entry in ((name, self._entries.get(name)) for name in self._factories)
+        }
+
+# Process-wide registry
+_model_registry = None
+_model_registry_lock = threading.Lock()
+
+def get_model_registry():
+    """Get the process-wide model registry instance."""
+    global _model_registry
+    if _model_registry is None:
+        with _model_registry_lock:
+            if _model_registry is None:
+                _model_registry = ModelRegistry()
+    return _model_registry
\ No newline at end of file
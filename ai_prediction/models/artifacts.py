@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Artifacts module for the AI prediction system.
+This module writes model artifacts atomically and stores tree ensembles in a
+compact layout that worker processes memory-map instead of unpickling.
+"""
+
+import os
+import numpy as np
+
+# One row per tree node: children, split feature and threshold, leaf value.
+# Leaves point to themselves with an infinite threshold, so a traversal can
+# run a fixed number of steps without checking which rows reached a leaf.
+NODE_DTYPE = np.dtype([
+    ('left', np.int32),
+    ('right', np.int32),
+    ('feature', np.int32),
+    ('threshold', np.float64),
+    ('value', np.float64)
+])
+
+def atomic_write(path, write):
+    """
+    Write a file atomically: readers see either the old or the new file, never a partial one.
+    
+    Args:
+        path: Destination path
+        write: Callable taking a temporary path in the same directory and writing to it
+        
+    Returns:
+        The destination path
+    """
+    base, extension = os.path.splitext(path)
+    temporary_path = f"{base}.{os.getpid()}.tmp{extension}"
+    try:
+        write(temporary_path)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+    return path
+
+class CompactForest:
+    """
+    Regression forest stored as one contiguous table of nodes.
+    
+    The nodes of every tree are concatenated into a single NODE_DTYPE array
+    that is saved as a plain .npy file and loaded with mmap_mode='r', so all
+    worker processes serving the model share the same page-cache pages
+    instead of each holding an unpickled copy of every tree. All trees are
+    evaluated together for a batch of rows with vectorized indexing, giving
+    the per-tree predictions as a (trees x rows) array.
+    """
+    
+    def __init__(self, nodes, roots, depth, feature_importances):
+        """
+        Initialize the compact forest.
+        
+        Args:
+            nodes: NODE_DTYPE array of every node (possibly memory-mapped)
+            roots: Index of the root node of every tree
+            depth: Maximum depth of the trees
+            feature_importances: Impurity-based importance of every feature
+        """
+        self.nodes = nodes
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.depth = int(depth)
+        self.feature_importances_ = np.asarray(feature_importances)
+        self.n_estimators = len(self.roots)
+        # Field views of the node table
+        self._left = nodes['left']
+        self._right = nodes['right']
+        self._feature = nodes['feature']
+        self._threshold = nodes['threshold']
+        self._value = nodes['value']
+    
+    @classmethod
+    def from_forest(cls, forest):
+        """
+        Build a compact forest from a fitted scikit-learn regression forest.
+        
+        Args:
+            forest: Fitted RandomForestRegressor (or another forest of decision trees)
+            
+        Returns:
+            CompactForest with the same predictions
+        """
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        sizes = np.array([tree.node_count for tree in trees])
+        roots = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        nodes = np.empty(sizes.sum(), dtype=NODE_DTYPE)
+        
+        for root, tree in zip(roots, trees):
+            own = np.arange(root, root + tree.node_count)
+            is_leaf = tree.children_left < 0
+            block = nodes[root:root + tree.node_count]
+            block['left'] = np.where(is_leaf, own, tree.children_left + root)
+            block['right'] = np.where(is_leaf, own, tree.children_right + root)
+            block['feature'] = np.where(is_leaf, 0, tree.feature)
+            block['threshold'] = np.where(is_leaf, np.inf, tree.threshold)
+            block['value'] = tree.value[:, 0, 0]
+        
+        depth = max(tree.max_depth for tree in trees)
+        return cls(nodes, roots, depth, forest.feature_importances_)
+    
+    def predict_trees(self, X):
+        """
+        Predict a batch of rows with every tree.
+        
+        Args:
+            X: Feature matrix (rows x features)
+            
+        Returns:
+            NumPy array of shape (trees, rows)
+        """
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))
+        node = np.repeat(self.roots[:, None], len(X), axis=1)
+        for _ in range(self.depth):
+            # Same float32 feature vs float64 threshold test as scikit-learn
+            go_left = X[rows, self._feature[node]] <= self._threshold[node]
+            node = np.where(go_left, self._left[node], self._right[node])
+        return self._value[node]
+    
+    def predict(self, X):
+        """
+        Predict a batch of rows with the mean of the trees.
+        
+        Args:
+            X: Feature matrix (rows x features)
+            
+        Returns:
+            NumPy array with one prediction per row
+        """
+        return self.mean(self.predict_trees(X))
+    
+    @staticmethod
+    def mean(per_tree):
+        """
+        Average per-tree predictions into the forest prediction.
+        
+        Args:
+            per_tree: NumPy array of shape (trees, rows)
+            
+        Returns:
+            NumPy array with one prediction per row
+        """
+        # Summed in tree order, like RandomForestRegressor.predict
+        return np.cumsum(per_tree, axis=0)[-1] / len(per_tree)
+    
+    def state(self):
+        """Get the metadata needed to load the node table back."""
+        return {
+            'roots': self.roots,
+            'depth': self.depth,
+            'feature_importances': self.feature_importances_
+        }
+    
+    def save(self, path):
+        """
+        Save the node table atomically as a .npy file.
+        
+        Args:
+            path: Destination .npy path
+        """
+        atomic_write(path, lambda temporary_path: np.save(temporary_path, self.nodes))
+    
+    @classmethod
+    def load(cls, path, state):
+        """
+        Load a saved forest, memory-mapping its node table.
+        
+        Args:
+            path: Path of the saved .npy node table
+            state: Metadata returned by state() when the forest was saved
+            
+        Returns:
+            CompactForest reading its nodes from the shared mapping
+        """
+        nodes = np.load(path, mmap_mode='r')
+        return cls(nodes, state['roots'], state['depth'], state['feature_importances'])
\ No newline at end of file
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Calendar features module for the AI prediction system.
+This module encodes dates into a fixed layout of calendar features for the ML models.
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+
+# Column layout of the encoded features. Categorical fields are one-hot
+# encoded with their first category (Monday, January, Q1) as the baseline,
+# so every batch has the same columns whatever dates it contains.
+CALENDAR_FEATURES = (
+    ['day_of_month', 'year', 'is_weekend', 'is_month_start', 'is_month_end']
+    + [f'day_of_week_{day}' for day in range(1, 7)]
+    + [f'month_{month}' for month in range(2, 13)]
+    + [f'quarter_{quarter}' for quarter in range(2, 5)]
+)
+
+# Offsets of the one-hot blocks in the layout
+DAY_OF_WEEK_OFFSET = CALENDAR_FEATURES.index('day_of_week_1') - 1
+MONTH_OFFSET = CALENDAR_FEATURES.index('month_2') - 2
+QUARTER_OFFSET = CALENDAR_FEATURES.index('quarter_2') - 2
+
+def to_day_numbers(dates):
+    """
+    Convert dates to day numbers (days since 1970-01-01).
+    
+    Args:
+        dates: Datetime-like values (list, array, Series or DatetimeIndex)
+        
+    Returns:
+        NumPy int64 array of day numbers
+    """
+    index = pd.DatetimeIndex(dates)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.values.astype('datetime64[D]').astype(np.int64)
+
+def encode_calendar(day_numbers):
+    """
+    Encode day numbers into the calendar feature layout with array arithmetic.
+    
+    Args:
+        day_numbers: NumPy int64 array of days since 1970-01-01
+        
+    Returns:
+        NumPy float32 matrix with one row per day and CALENDAR_FEATURES columns
+    """
+    days = np.asarray(day_numbers, dtype='datetime64[D]')
+    month_start = days.astype('datetime64[M]')
+    months = month_start.astype(np.int64)
+    
+    year = months // 12 + 1970
+    month = months % 12 + 1
+    quarter = (month - 1) // 3 + 1
+    day_of_month = (days - month_start.astype('datetime64[D]')).astype(np.int64) + 1
+    days_in_month = ((month_start + 1).astype('datetime64[D]')
+                     - month_start.astype('datetime64[D]')).astype(np.int64)
+    # 1970-01-01 was a Thursday (weekday 3)
+    day_of_week = (days.astype(np.int64) + 3) % 7
+    
+    X = np.zeros((len(days), len(CALENDAR_FEATURES)), dtype=np.float32)
+    X[:, 0] = day_of_month
+    X[:, 1] = year
+    X[:, 2] = day_of_week >= 5
+    X[:, 3] = day_of_month == 1
+    X[:, 4] = day_of_month == days_in_month
+    
+    rows = np.arange(len(days))
+    for values, offset, baseline in ((day_of_week, DAY_OF_WEEK_OFFSET, 0),
+                                     (month, MONTH_OFFSET, 1),
+                                     (quarter, QUARTER_OFFSET, 1)):
+        encoded = values != baseline
+        X[rows[encoded], offset + values[encoded]] = 1.0
+    
+    return X
+
+class CalendarFeatureEncoder:
+    """
+    Calendar feature encoder with a memoized table of encoded days.
+    
+    Encoded rows are kept in a dense table covering a contiguous range of
+    days, so encoding dates that were seen before (forecasts keep asking for
+    the same future days) is a single fancy-indexing lookup. Days outside
+    the range are encoded once and the table is extended.
+    """
+    
+    columns = CALENDAR_FEATURES
+    
+    def __init__(self):
+        """Initialize the encoder with an empty table."""
+        self._first_day = None
+        self._table = np.zeros((0, len(self.columns)), dtype=np.float32)
+        self._lock = threading.Lock()
+    
+    def _extend(self, first_day, last_day):
+        """Extend the table so it covers a range of day numbers."""
+        if self._first_day is None:
+            self._first_day = first_day
+            self._table = encode_calendar(np.arange(first_day, last_day + 1))
+            return
+        
+        table_last_day = self._first_day + len(self._table) - 1
+        parts = [self._table]
+        if first_day < self._first_day:
+            parts.insert(0, encode_calendar(np.arange(first_day, self._first_day)))
+            self._first_day = first_day
+        if last_day > table_last_day:
+            parts.append(encode_calendar(np.arange(table_last_day + 1, last_day + 1)))
+        if len(parts) > 1:
+            self._table = np.concatenate(parts)
+    
+    def transform(self, dates):
+        """
+        Encode dates into calendar features.
+        
+        Args:
+            dates: Datetime-like values (list, array, Series or DatetimeIndex)
+            
+        Returns:
+            NumPy float32 matrix with one row per date and CALENDAR_FEATURES columns
+        """
+        day_numbers = to_day_numbers(dates)
+        if len(day_numbers) == 0:
+            return np.zeros((0, len(self.columns)), dtype=np.float32)
+        
+        with self._lock:
+            self._extend(int(day_numbers.min()), int(day_numbers.max()))
+            return self._table[day_numbers - self._first_day]
\ No newline at end of file
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Lag features module for the AI prediction system.
+This module builds lag and rolling-window features of the usage series, in
+batch for training and incrementally for recursive forecasting.
+"""
+
+import numpy as np
+
+# Past days whose usage is used as a feature (t-1, t-7, t-14)
+LAGS = (1, 7, 14)
+
+# Windows (days) of the rolling mean features, over the days before t
+ROLLING_WINDOWS = (7, 28)
+
+LAG_FEATURES = (
+    [f'lag_{lag}' for lag in LAGS]
+    + [f'rolling_mean_{window}' for window in ROLLING_WINDOWS]
+)
+
+# Days of history needed to build the features of the next day
+BUFFER_SIZE = max(max(LAGS), max(ROLLING_WINDOWS))
+
+# First row of a series with every lag and full rolling window available,
+# like the features LagRingBuffer gives at inference
+MIN_HISTORY = BUFFER_SIZE
+
+def lag_feature_matrix(values):
+    """
+    Build the lag and rolling-mean features of every day of a series.
+    
+    Args:
+        values: Daily values, oldest first, one per consecutive day
+        
+    Returns:
+        NumPy float32 matrix with LAG_FEATURES columns; lags and rolling
+        means not fully covered by the series (rows before MIN_HISTORY) are
+        missing (NaN)
+    """
+    y = np.asarray(values, dtype=np.float64)
+    n = len(y)
+    X = np.full((n, len(LAG_FEATURES)), np.nan, dtype=np.float32)
+    
+    for column, lag in enumerate(LAGS):
+        X[lag:, column] = y[:n - lag]
+    
+    # Rolling means of the days before t from a cumulative sum
+    cumulative = np.concatenate([[0.0], np.cumsum(y)])
+    t = np.arange(n)
+    for column, window in enumerate(ROLLING_WINDOWS, start=len(LAGS)):
+        # Only full windows, a partial one would not match LagRingBuffer
+        full = t[window:]
+        X[window:, column] = (cumulative[full] - cumulative[full - window]) / window
+    
+    return X
+
+class LagRingBuffer:
+    """
+    Fixed-size ring buffer of the most recent daily values.
+    
+    Each push overwrites the oldest value and updates the running window
+    sums, so the features of the next day are read in constant time instead
+    of being recomputed from the whole series.
+    """
+    
+    def __init__(self, history):
+        """
+        Initialize the buffer from the most recent values.
+        
+        Args:
+            history: At least BUFFER_SIZE daily values, oldest first
+        """
+        history = np.asarray(history, dtype=np.float64)
+        if len(history) < BUFFER_SIZE:
+            raise ValueError(f"At least {BUFFER_SIZE} days of history are needed, got {len(history)}")
+        
+        self.values = history[-BUFFER_SIZE:].copy()
+        # Index of the oldest value, which is the next one overwritten
+        self.position = 0
+        self.sums = {window: self.values[-window:].sum() for window in ROLLING_WINDOWS}
+    
+    def _value(self, lag):
+        """Get the value of lag days ago."""
+        return self.values[(self.position - lag) % BUFFER_SIZE]
+    
+    def features(self):
+        """
+        Get the features of the next day.
+        
+        Returns:
+            NumPy float32 array with LAG_FEATURES values
+        """
+        return np.array(
+            [self._value(lag) for lag in LAGS]
+            + [self.sums[window] / window for window in ROLLING_WINDOWS],
+            dtype=np.float32
+        )
+    
+    def push(self, value):
+        """
+        Append the value of the next day.
+        
+        Args:
+            value: Observed or predicted value of the day
+        """
+        for window in ROLLING_WINDOWS:
+            self.sums[window] += value - self._value(window)
+        self.values[self.position] = value
+        self.position = (self.position + 1) % BUFFER_SIZE
\ No newline at end of file
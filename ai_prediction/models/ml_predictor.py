@@ -7,28 +7,75 @@ This module implements a regression model for stock usage prediction.
 import os
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.linear_model import LinearRegression
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split, GridSearchCV
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import joblib
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend for headless environment
+from datetime import datetime
+from models.calendar_features import CalendarFeatureEncoder
+from models.artifacts import CompactForest, atomic_write
+from models.lag_features import (
+    LAG_FEATURES, BUFFER_SIZE, MIN_HISTORY, lag_feature_matrix, LagRingBuffer
+)
+
+# Days of the training series saved with the model to seed recursive forecasts
+HISTORY_DAYS = 2 * BUFFER_SIZE
+
+# Training rows needed (after the first MIN_HISTORY days) to use lag features
+MIN_LAG_TRAINING_ROWS = 28
+
+# Regression estimators the model can be trained with
+ESTIMATORS = {
+    'random_forest': RandomForestRegressor,
+    'hist_gradient_boosting': HistGradientBoostingRegressor
+}
+
+# Coverage of the prediction intervals (10th to 90th percentile)
+INTERVAL_WIDTH = 0.8
+
+# Hyperparameters used when no tuned configuration is given
+DEFAULT_PARAMS = {
+    'estimator': 'random_forest',
+    'n_estimators': 100,
+    'max_depth': 10,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2
+}
+
+def _pyplot():
+    """Import pyplot on first use, so processes that never plot skip matplotlib."""
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-interactive backend for headless environment
+    import matplotlib.pyplot as plt
+    return plt
 
 class MLPredictor:
     """Machine learning regression model for stock usage prediction."""
     
-    def __init__(self):
-        """Initialize the ML predictor."""
+    def __init__(self, use_lags=True, params=None):
+        """
+        Initialize the ML predictor.
+        
+        Args:
+            use_lags: Whether to train with lag and rolling-mean features of
+                recent usage (forecasts are then recursive, one day at a time)
+            params: Optional hyperparameters, an 'estimator' name from
+                ESTIMATORS plus its arguments (default DEFAULT_PARAMS)
+        """
         self.model = None
+        self.params = dict(params or DEFAULT_PARAMS)
+        # Lower and upper quantile-loss models of gradient boosting estimators
+        self.quantile_models = None
         self.scaler = StandardScaler()
+        self.encoder = CalendarFeatureEncoder()
+        self.use_lags = use_lags
+        # Column layout the model was trained with, saved along with it
+        self.feature_columns = list(self.encoder.columns)
+        # Most recent training values ('values', oldest first, and 'last_date')
+        self.history = None
+        # The scaler is saved in the model file; forests add a memory-mapped node table
         self.model_path = os.path.join(os.path.dirname(os.path.dirname(__file__)),
                                        'outputs', 'models', 'ml_model.joblib')
-        self.scaler_path = os.path.join(os.path.dirname(os.path.dirname(__file__)),
-                                       'outputs', 'models', 'ml_scaler.joblib')
         self.plots_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)),
                                      'outputs', 'plots')
         
@@ -41,92 +88,213 @@ class MLPredictor:
         Prepare feature matrix from dates.
         
         Args:
-            dates: List or array of datetime objects
+            dates: Datetime-like values (list, array, Series or DatetimeIndex)
             
         Returns:
-            Feature matrix (X)
-        """
-        # Create features from dates
-        X = pd.DataFrame({
-            'day_of_week': [d.weekday() for d in dates],
-            'day_of_month': [d.day for d in dates],
-            'month': [d.month for d in dates],
-            'year': [d.year for d in dates],
-            'quarter': [((d.month - 1) // 3) + 1 for d in dates],
-            'is_weekend': [(d.weekday() >= 5) for d in dates],
-            'is_month_start': [(d.day == 1) for d in dates],
-            'is_month_end': [(d.day == self._last_day_of_month(d)) for d in dates]
-        })
-        
-        # One-hot encode categorical features
-        X_encoded = pd.get_dummies(X, columns=['day_of_week', 'month', 'quarter'], drop_first=True)
+            Feature matrix (X) as a float32 NumPy array with a fixed column layout
+        """
+        return self.encoder.transform(dates)
+    
+    @property
+    def estimator(self):
+        """Display name of the regression estimator, e.g. 'RandomForest' or 'HistGradientBoosting'."""
+        return ESTIMATORS[self.params.get('estimator', 'random_forest')].__name__.removesuffix('Regressor')
+    
+    @property
+    def interval_source(self):
+        """
+        Where the prediction intervals of the current model come from.
         
-        return X_encoded
+        'trees' for forests, 'quantile_models' for gradient boosting trained
+        with intervals, None when the model has no interval source (its
+        forecast bounds are missing).
+        """
+        if isinstance(self.model, CompactForest):
+            return 'trees'
+        if self.quantile_models:
+            return 'quantile_models'
+        return None
+    
+    @property
+    def uses_lags(self):
+        """Whether the current model was trained with lag features."""
+        return self.feature_columns == list(self.encoder.columns) + LAG_FEATURES
+    
+    def _daily_series(self, data_df):
+        """Get the training data as a series with one value per consecutive day."""
+        dates = pd.DatetimeIndex(data_df['ds']).normalize()
+        series = pd.Series(data_df['y'].to_numpy(dtype=np.float64), index=dates)
+        return series.groupby(level=0).sum().asfreq('D', fill_value=0.0)
     
-    def _last_day_of_month(self, date):
-        """Get the last day of the month for a given date."""
-        next_month = date.replace(day=28) + timedelta(days=4)
-        return (next_month - timedelta(days=next_month.day)).day
+    def _build_model(self, **overrides):
+        """Create a new, untrained regression model from the hyperparameters."""
+        params = dict(self.params, **overrides)
+        estimator = ESTIMATORS[params.pop('estimator', 'random_forest')]
+        return estimator(random_state=42, **params)
     
-    def train(self, data_df):
+    def _interval_quantiles(self):
+        """Get the lower and upper quantiles of the prediction intervals."""
+        tail = (1 - INTERVAL_WIDTH) / 2
+        return tail, 1 - tail
+    
+    def train(self, data_df, holdout_fraction=0.2, save=True, intervals=True):
         """
         Train the ML model.
         
+        The model is evaluated on the most recent days (a chronological
+        holdout, never a random split, so no future day is used to predict a
+        past one) and then refitted on all the data.
+        
         Args:
             data_df: DataFrame with columns 'ds' (dates) and 'y' (values)
+            holdout_fraction: Fraction of the final days held out for evaluation
+                (0 skips the evaluation)
+            save: Whether to save the trained model to disk
+            intervals: Whether to fit the quantile-loss models that give the
+                prediction intervals of gradient boosting estimators (forests
+                get them from their trees at no training cost)
             
         Returns:
             Trained model and evaluation metrics
         """
         # Prepare features and target
-        X = self._prepare_features(data_df['ds'].dt.to_pydatetime())
-        y = data_df['y'].values
-        
-        # Scale features
+        series = self._daily_series(data_df)
+        X = self._prepare_features(series.index)
+        y = series.values
+        
+        use_lags = self.use_lags and len(series) >= MIN_HISTORY + MIN_LAG_TRAINING_ROWS
+        if use_lags:
+            # Lags and rolling means of the first days are incomplete, train from MIN_HISTORY on
+            X = np.hstack([X, lag_feature_matrix(y)])[MIN_HISTORY:]
+            y = y[MIN_HISTORY:]
+        
+        # Evaluate on the final days with a model fitted only on the earlier ones
+        metrics = {}
+        split = len(y) - int(len(y) * holdout_fraction)
+        if 0 < split < len(y) - 1:
+            holdout_scaler = StandardScaler().fit(X[:split])
+            holdout_model = self._build_model()
+            holdout_model.fit(holdout_scaler.transform(X[:split]), y[:split])
+            y_test = y[split:]
+            y_pred = holdout_model.predict(holdout_scaler.transform(X[split:]))
+            metrics = {
+                'mse': mean_squared_error(y_test, y_pred),
+                'rmse': np.sqrt(mean_squared_error(y_test, y_pred)),
+                'mae': mean_absolute_error(y_test, y_pred),
+                'r2': r2_score(y_test, y_pred),
+                'holdout_days': int(len(y_test))
+            }
+        
+        # Scale features and train the model on all the data
         X_scaled = self.scaler.fit_transform(X)
-        
-        # Split data for training and evaluation
-        X_train, X_test, y_train, y_test = train_test_split(
-            X_scaled, y, test_size=0.2, random_state=42
-        )
-        
-        # Create and train the model
-        self.model = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=5,
-            min_samples_leaf=2,
-            random_state=42
-        )
-        
-        # Train the model
-        self.model.fit(X_train, y_train)
-        
-        # Evaluate the model
-        y_pred = self.model.predict(X_test)
-        metrics = {
-            'mse': mean_squared_error(y_test, y_pred),
-            'rmse': np.sqrt(mean_squared_error(y_test, y_pred)),
-            'mae': mean_absolute_error(y_test, y_pred),
-            'r2': r2_score(y_test, y_pred)
+        self.model = self._build_model()
+        self.model.fit(X_scaled, y)
+        if isinstance(self.model, RandomForestRegressor):
+            self.model = CompactForest.from_forest(self.model)
+        
+        self.quantile_models = None
+        if intervals and self.params.get('estimator') == 'hist_gradient_boosting':
+            self.quantile_models = [
+                self._build_model(loss='quantile', quantile=quantile).fit(X_scaled, y)
+                for quantile in self._interval_quantiles()
+            ]
+        
+        # Save the model with its feature layout and recent history, and the scaler
+        self.feature_columns = list(self.encoder.columns) + (LAG_FEATURES if use_lags else [])
+        self.history = {
+            'values': series.values[-HISTORY_DAYS:],
+            'last_date': series.index[-1]
         }
-        
-        # Save the model and scaler
-        joblib.dump(self.model, self.model_path)
-        joblib.dump(self.scaler, self.scaler_path)
+        if save:
+            self.save_model()
         
         return self.model, metrics
     
+    def save_model(self):
+        """
+        Save the trained model, its scaler, feature layout and recent history.
+        
+        Forests are saved as a versioned node table next to the model file,
+        which is replaced last, so a process loading the model never pairs
+        it with the nodes of another training run.
+        """
+        models_dir = os.path.dirname(self.model_path)
+        forest = None
+        if isinstance(self.model, CompactForest):
+            forest = {'file': f"ml_forest_{datetime.now().strftime('%Y%m%d%H%M%S%f')}.npy",
+                      **self.model.state()}
+            self.model.save(os.path.join(models_dir, forest['file']))
+        
+        state = {
+            'model': None if forest else self.model,
+            'forest': forest,
+            'scaler': self.scaler,
+            'feature_columns': self.feature_columns,
+            'history': self.history,
+            'params': self.params,
+            'quantile_models': self.quantile_models
+        }
+        atomic_write(self.model_path, lambda temporary_path: joblib.dump(state, temporary_path))
+        
+        # Node tables of earlier models; processes still serving one keep their mapping
+        for name in os.listdir(models_dir):
+            if name.startswith('ml_forest_') and name.endswith('.npy') and '.tmp' not in name \
+                    and (forest is None or name != forest['file']):
+                try:
+                    os.remove(os.path.join(models_dir, name))
+                except OSError:
+                    pass
+    
     def load_model(self):
         """
         Load a previously trained model.
         
+        Arrays are memory-mapped read-only, so processes serving the same
+        model share its pages instead of each holding a copy.
+        
         Returns:
             Loaded model or None if no model exists
         """
-        if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
-            self.model = joblib.load(self.model_path)
-            self.scaler = joblib.load(self.scaler_path)
+        if os.path.exists(self.model_path):
+            models_dir = os.path.dirname(self.model_path)
+            saved = joblib.load(self.model_path, mmap_mode='r')
+            if isinstance(saved, dict) and 'scaler' in saved:
+                scaler = saved['scaler']
+            else:
+                # Models saved before the scaler was stored in the model file
+                legacy_scaler_path = os.path.join(models_dir, 'ml_scaler.joblib')
+                if not os.path.exists(legacy_scaler_path):
+                    return None
+                scaler = joblib.load(legacy_scaler_path)
+            
+            if isinstance(saved, dict):
+                model, feature_columns = saved['model'], saved['feature_columns']
+                if saved.get('forest'):
+                    model = CompactForest.load(os.path.join(models_dir, saved['forest']['file']), saved['forest'])
+                history = saved.get('history')
+                params = saved.get('params', self.params)
+                quantile_models = saved.get('quantile_models')
+            else:
+                # Models saved before the layout was stored: usable only if
+                # they were trained on the same columns
+                model = saved
+                feature_columns = list(getattr(scaler, 'feature_names_in_', []))
+                history = None
+                params = self.params
+                quantile_models = None
+            
+            calendar_columns = list(self.encoder.columns)
+            lag_columns = calendar_columns + LAG_FEATURES
+            if feature_columns != calendar_columns and (feature_columns != lag_columns or history is None):
+                print("Saved ML model uses a different feature layout, it must be retrained")
+                return None
+            
+            if isinstance(model, RandomForestRegressor):
+                model = CompactForest.from_forest(model)
+            
+            self.model, self.scaler = model, scaler
+            self.feature_columns, self.history = feature_columns, history
+            self.params, self.quantile_models = params, quantile_models
             return self.model
         return None
     
@@ -148,28 +316,133 @@ class MLPredictor:
             raise ValueError("No trained model available. Please train the model first.")
         
         # Generate future dates
-        future_dates = [start_date + timedelta(days=i) for i in range(days)]
+        future_dates = pd.date_range(start=start_date, periods=days)
         
-        # Prepare features
-        X_future = self._prepare_features(future_dates)
-        
-        # Scale features
-        X_future_scaled = self.scaler.transform(X_future)
-        
-        # Make predictions
-        predictions = self.model.predict(X_future_scaled)
+        if self.uses_lags:
+            predictions, lower, upper = self._predict_recursive(future_dates)
+        else:
+            # Prepare features
+            X_future = self._prepare_features(future_dates)
+            
+            # Scale features
+            X_future_scaled = self.scaler.transform(X_future)
+            
+            # Make predictions and their intervals
+            if isinstance(self.model, CompactForest):
+                # The forest prediction is the mean of the per-tree predictions
+                per_tree = self.model.predict_trees(X_future_scaled)
+                predictions = CompactForest.mean(per_tree)
+                lower, upper = self._prediction_intervals(X_future_scaled, predictions, per_tree)
+            else:
+                predictions = self.model.predict(X_future_scaled)
+                lower, upper = self._prediction_intervals(X_future_scaled, predictions)
         
         # Create a DataFrame with results
         forecast = pd.DataFrame({
             'ds': future_dates,
             'yhat': predictions,
-            # Add some uncertainty bounds based on prediction
-            'yhat_lower': np.maximum(0, predictions * 0.8),
-            'yhat_upper': predictions * 1.2
+            'yhat_lower': lower,
+            'yhat_upper': upper
         })
         
         return forecast
     
+    def _prediction_intervals(self, X, predictions, per_tree=None):
+        """
+        Compute the prediction intervals of a batch of scaled feature rows.
+        
+        Forests predict the rows with every tree into one (trees x rows)
+        array and take the interval quantiles along the tree axis; gradient
+        boosting estimators use their quantile-loss models. Either way the
+        whole batch is predicted at once.
+        
+        Args:
+            X: Scaled float32 feature matrix
+            predictions: Point predictions of the rows
+            per_tree: Optional per-tree predictions of the rows, if already computed
+            
+        Returns:
+            Tuple (lower, upper) of NumPy arrays, bounds containing the point
+            predictions, or NaN bounds when the model has no interval source
+        """
+        if len(X) == 0:
+            return predictions.copy(), predictions.copy()
+        
+        source = self.interval_source
+        if source is None:
+            # Trained without intervals: report them as missing rather than invent a band
+            missing = np.full(len(predictions), np.nan)
+            return missing, missing.copy()
+        
+        if source == 'trees':
+            if per_tree is None:
+                per_tree = self.model.predict_trees(X)
+            lower, upper = np.quantile(per_tree, self._interval_quantiles(), axis=0)
+        else:
+            lower, upper = (model.predict(X) for model in self.quantile_models)
+        
+        return np.maximum(np.minimum(lower, predictions), 0), np.maximum(upper, predictions)
+    
+    def _predict_recursive(self, future_dates):
+        """
+        Forecast one day at a time, feeding each prediction back as a lag.
+        
+        Calendar features of every step are encoded and scaled in one batch;
+        each step only reads the lag features from a ring buffer, scales them
+        and makes one model call. Days still covered by the saved history are
+        predicted from observed lags and the observed value is fed back.
+        
+        Args:
+            future_dates: DatetimeIndex of consecutive days to predict
+            
+        Returns:
+            Tuple of NumPy arrays (predictions, lower, upper), NaN for days
+            before the saved history allows
+        """
+        values = np.asarray(self.history['values'], dtype=np.float64)
+        last_date = pd.Timestamp(self.history['last_date'])
+        history_start = last_date - pd.Timedelta(days=len(values) - 1)
+        
+        first_date = min(future_dates[0], last_date + pd.Timedelta(days=1))
+        first_date = max(first_date, history_start + pd.Timedelta(days=BUFFER_SIZE))
+        steps = pd.date_range(start=first_date, end=future_dates[-1])
+        if len(steps) == 0:
+            missing = np.full(len(future_dates), np.nan)
+            return missing, missing.copy(), missing.copy()
+        
+        first_offset = (first_date - history_start).days
+        buffer = LagRingBuffer(values[:first_offset])
+        
+        # Split the scaler so each part of the row is scaled separately, in
+        # place on float32 values like StandardScaler.transform does
+        n_calendar = len(self.encoder.columns)
+        mean = self.scaler.mean_.astype(np.float32)
+        scale = self.scaler.scale_.astype(np.float32)
+        X_calendar = self._prepare_features(steps).copy()
+        X_calendar -= mean[:n_calendar]
+        X_calendar /= scale[:n_calendar]
+        lag_mean, lag_scale = mean[n_calendar:], scale[n_calendar:]
+        
+        # Rows of every step are kept to compute the intervals in one batch
+        rows = np.empty((len(steps), len(self.feature_columns)), dtype=np.float32)
+        predictions = np.empty(len(steps))
+        for step in range(len(steps)):
+            lag_row = buffer.features()
+            lag_row -= lag_mean
+            lag_row /= lag_scale
+            rows[step, :n_calendar] = X_calendar[step]
+            rows[step, n_calendar:] = lag_row
+            predictions[step] = self.model.predict(rows[step:step + 1])[0]
+            
+            offset = first_offset + step
+            buffer.push(values[offset] if offset < len(values) else predictions[step])
+        
+        lower, upper = self._prediction_intervals(rows, predictions)
+        return tuple(
+            pd.Series(values, index=steps).reindex(future_dates).to_numpy()
+            for values in (predictions, lower, upper)
+        )
+    
     def plot_forecast(self, forecast, history_df=None):
         """
         Plot the forecast and save the plot to a file.
@@ -181,6 +454,7 @@ class MLPredictor:
         Returns:
             Path to the saved plot file
         """
+        plt = _pyplot()
         # Create a plot
         plt.figure(figsize=(12, 6))
         
@@ -190,8 +464,9 @@ class MLPredictor:
         
         # Plot forecast
         plt.plot(forecast['ds'], forecast['yhat'], 'r-', label='ML Forecast')
-        plt.fill_between(forecast['ds'], forecast['yhat_lower'], forecast['yhat_upper'],
-                        color='red', alpha=0.2, label='Confidence Interval')
+        if forecast['yhat_lower'].notna().any():
+            plt.fill_between(forecast['ds'], forecast['yhat_lower'], forecast['yhat_upper'],
+                            color='red', alpha=0.2, label='Confidence Interval')
         
         # Format plot
         plt.xlabel('Date')
@@ -224,10 +499,10 @@ class MLPredictor:
             raise ValueError("No trained model with feature importances available.")
         
         # Get feature names
-        X_dummy = self._prepare_features([datetime.now()])
-        feature_names = X_dummy.columns
+        feature_names = self.feature_columns
         
         # Plot feature importance
+        plt = _pyplot()
         plt.figure(figsize=(12, 8))
         
         # Sort importances
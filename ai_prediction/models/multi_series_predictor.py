@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Multi-series predictor module for the AI prediction system.
+This module forecasts the daily usage of many series (e.g. per action) in one batch.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import joblib
+from datetime import timedelta
+from models.artifacts import atomic_write
+
+# Days with usage a series needs to be forecast: four weeks, so every
+# weekday effect is fitted on more than one observation
+MIN_HISTORY = 28
+
+def forecastable_series(usage_matrix):
+    """
+    Keep the series of a usage matrix with at least MIN_HISTORY days of usage.
+    
+    Args:
+        usage_matrix: DataFrame indexed by date with one column of daily usage per series
+        
+    Returns:
+        Tuple (usage matrix of the kept series, list of the skipped series)
+    """
+    usage_days = (usage_matrix > 0).sum()
+    kept = usage_days.index[usage_days >= MIN_HISTORY]
+    return usage_matrix[kept], [series for series in usage_matrix.columns if series not in kept]
+
+class MultiSeriesPredictor:
+    """
+    Batch forecasting model for a matrix of daily usage series.
+    
+    Every series is modelled as level + linear trend + day-of-week effect.
+    All series share the same dates and therefore the same design matrix, so
+    the coefficients of every series come out of one least-squares solve and
+    forecasting is a single matrix product.
+    """
+    
+    def __init__(self, window_days=56, holdout_days=14):
+        """
+        Initialize the multi-series predictor.
+        
+        Args:
+            window_days: Number of most recent days each fit uses
+            holdout_days: Number of final days held out to evaluate the fit
+        """
+        self.window_days = window_days
+        self.holdout_days = holdout_days
+        self.coefficients = None
+        self.sigma = None
+        self.series = None
+        self.first_date = None
+        self.last_date = None
+        self.model_path = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                                       'outputs', 'models', 'multi_series_model.joblib')
+        
+        # Create directories if they don't exist
+        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
+    
+    def _design_matrix(self, dates, first_date):
+        """
+        Build the shared design matrix for a range of dates.
+        
+        Args:
+            dates: DatetimeIndex of the days to model
+            first_date: Date the trend is counted from
+            
+        Returns:
+            NumPy array with intercept, trend and 6 weekday dummy columns
+        """
+        trend = ((dates - first_date).days.values / 7.0).astype(float)
+        weekdays = dates.weekday.values
+        X = np.zeros((len(dates), 8))
+        X[:, 0] = 1.0
+        X[:, 1] = trend
+        # Monday is the baseline day, Tuesday to Sunday get a dummy column each
+        rows = np.flatnonzero(weekdays > 0)
+        X[rows, weekdays[rows] + 1] = 1.0
+        return X
+    
+    def _fit(self, usage_matrix):
+        """
+        Fit the coefficients of every series with one least-squares solve.
+        
+        Args:
+            usage_matrix: DataFrame indexed by date with one column per series
+            
+        Returns:
+            Tuple (coefficients, residual standard deviations)
+        """
+        X = self._design_matrix(usage_matrix.index, usage_matrix.index[0])
+        Y = usage_matrix.to_numpy(dtype=float)
+        coefficients, _, _, _ = np.linalg.lstsq(X, Y, rcond=None)
+        residuals = Y - X @ coefficients
+        return coefficients, residuals.std(axis=0)
+    
+    def train(self, usage_matrix, save=True):
+        """
+        Train the model on all series at once.
+        
+        Args:
+            usage_matrix: DataFrame indexed by date with one column of daily usage per series
+            save: Whether to save the trained model to disk
+            
+        Returns:
+            Dictionary with evaluation metrics over the holdout days
+        """
+        window = usage_matrix.iloc[-self.window_days:]
+        
+        # Evaluate on the final days before refitting on the whole window
+        metrics = {'series': int(window.shape[1]), 'holdout_days': 0}
+        if len(window) > self.holdout_days + 14:
+            fit_part = window.iloc[:-self.holdout_days]
+            holdout = window.iloc[-self.holdout_days:]
+            coefficients, _ = self._fit(fit_part)
+            X_holdout = self._design_matrix(holdout.index, fit_part.index[0])
+            errors = np.maximum(X_holdout @ coefficients, 0) - holdout.to_numpy(dtype=float)
+            mae = np.abs(errors).mean(axis=0)
+            metrics.update({
+                'holdout_days': self.holdout_days,
+                'mae': float(mae.mean()),
+                'rmse': float(np.sqrt((errors ** 2).mean())),
+                'worst_series_mae': float(mae.max())
+            })
+        
+        self.coefficients, self.sigma = self._fit(window)
+        self.series = list(window.columns)
+        self.first_date = window.index[0]
+        self.last_date = window.index[-1]
+        
+        # Save the model
+        if save:
+            self.save_model()
+        
+        return metrics
+    
+    def save_model(self):
+        """
+        Save the trained model.
+        """
+        state = {
+            'coefficients': self.coefficients,
+            'sigma': self.sigma,
+            'series': self.series,
+            'first_date': self.first_date,
+            'last_date': self.last_date
+        }
+        atomic_write(self.model_path, lambda temporary_path: joblib.dump(state, temporary_path))
+    
+    def load_model(self):
+        """
+        Load a previously trained model.
+        
+        Returns:
+            Coefficient matrix or None if no model exists
+        """
+        if os.path.exists(self.model_path):
+            state = joblib.load(self.model_path)
+            self.coefficients = state['coefficients']
+            self.sigma = state['sigma']
+            self.series = state['series']
+            self.first_date = state['first_date']
+            self.last_date = state['last_date']
+            return self.coefficients
+        return None
+    
+    def predict(self, start_date=None, days=30):
+        """
+        Forecast every series for future dates.
+        
+        Args:
+            start_date: Optional first date to predict (default the day after the training data)
+            days: Number of days to predict
+            
+        Returns:
+            DataFrame with 'series', 'ds', 'yhat', 'yhat_lower' and 'yhat_upper' columns
+        """
+        if self.coefficients is None:
+            self.load_model()
+        
+        if self.coefficients is None:
+            raise ValueError("No trained model available. Please train the model first.")
+        
+        start_date = pd.Timestamp(start_date or self.last_date + timedelta(days=1)).normalize()
+        future_dates = pd.date_range(start=start_date, periods=days)
+        
+        # One matrix product forecasts every series, clipped at zero usage
+        predictions = np.maximum(self._design_matrix(future_dates, self.first_date) @ self.coefficients, 0)
+        # 80% interval from the residual spread of each series
+        margin = 1.28 * self.sigma
+        
+        n_series = len(self.series)
+        return pd.DataFrame({
+            'series': np.tile(np.asarray(self.series, dtype=object), days),
+            'ds': np.repeat(future_dates.values, n_series),
+            'yhat': predictions.ravel(),
+            'yhat_lower': np.maximum(predictions - margin, 0).ravel(),
+            'yhat_upper': (predictions + margin).ravel()
+        })
\ No newline at end of file
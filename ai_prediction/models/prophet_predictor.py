@@ -5,23 +5,56 @@ This module implements a time series forecasting model using Facebook Prophet.
 """
 
 import os
+import copy
 import pandas as pd
 import numpy as np
 from prophet import Prophet
-import joblib
+from prophet.serialize import model_to_json, model_from_json
 from datetime import datetime
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend for headless environment
+from models.artifacts import atomic_write
+
+# Rows of training history kept in the saved model (prediction only needs
+# the history dates and the last steps of the time index)
+SAVED_HISTORY_ROWS = 7
+
+# Days each end of the training window may move for a retrain to warm-start
+# from the saved model instead of fitting from scratch
+MAX_WARM_START_SHIFT_DAYS = 7
+
+# Fitted parameters passed to Stan as initial values when warm-starting
+WARM_START_SCALARS = ('k', 'm', 'sigma_obs')
+WARM_START_VECTORS = ('delta', 'beta')
+
+# Hyperparameters used when no tuned configuration is given
+DEFAULT_PARAMS = {
+    'changepoint_prior_scale': 0.05,
+    'seasonality_prior_scale': 10.0,
+    'seasonality_mode': 'additive'
+}
+
+def _pyplot():
+    """Import pyplot on first use, selecting the headless backend only when plotting."""
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-interactive backend for headless environment
+    import matplotlib.pyplot as plt
+    return plt
 
 class ProphetPredictor:
     """Time series forecasting model using Facebook Prophet."""
     
-    def __init__(self):
-        """Initialize the Prophet predictor."""
+    def __init__(self, params=None):
+        """
+        Initialize the Prophet predictor.
+        
+        Args:
+            params: Optional Prophet hyperparameters (default DEFAULT_PARAMS)
+        """
         self.model = None
+        self.params = dict(params or DEFAULT_PARAMS)
+        # Whether the last training run was warm-started
+        self.warm_started = False
         self.model_path = os.path.join(os.path.dirname(os.path.dirname(__file__)),
-                                       'outputs', 'models', 'prophet_model.joblib')
+                                       'outputs', 'models', 'prophet_model.json')
         self.plots_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)),
                                      'outputs', 'plots')
         
@@ -29,36 +62,90 @@ class ProphetPredictor:
         os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
         os.makedirs(self.plots_dir, exist_ok=True)
     
-    def train(self, data_df):
+    def _warm_start_init(self, data_df):
+        """
+        Get Stan initial values from the saved model for an incremental retrain.
+        
+        Args:
+            data_df: DataFrame with columns 'ds' (dates) and 'y' (values)
+            
+        Returns:
+            Dictionary of initial parameter values, or None when a cold fit is
+            needed (no saved model, other hyperparameters, or a training window
+            that moved more than MAX_WARM_START_SHIFT_DAYS at either end)
+        """
+        previous = self.model
+        if previous is None:
+            if not os.path.exists(self.model_path):
+                return None
+            with open(self.model_path, 'r', encoding='utf-8') as f:
+                previous = model_from_json(f.read())
+        
+        if any(getattr(previous, name, None) != value for name, value in self.params.items()):
+            return None
+        
+        dates = pd.to_datetime(data_df['ds'])
+        start_shift = (dates.min() - previous.history_dates.min()).days
+        end_shift = (dates.max() - previous.history_dates.max()).days
+        if abs(start_shift) > MAX_WARM_START_SHIFT_DAYS or not 0 <= end_shift <= MAX_WARM_START_SHIFT_DAYS:
+            return None
+        
+        init = {name: float(previous.params[name][0][0]) for name in WARM_START_SCALARS}
+        init.update({name: np.asarray(previous.params[name][0]) for name in WARM_START_VECTORS})
+        return init
+    
+    def train(self, data_df, save=True, warm_start=False):
         """
         Train the Prophet model.
         
         Args:
             data_df: DataFrame with columns 'ds' (dates) and 'y' (values)
+            save: Whether to save the trained model to disk
+            warm_start: Whether to start the optimization from the parameters
+                of the saved model when the training window barely moved
             
         Returns:
             Trained model
         """
+        init = self._warm_start_init(data_df) if warm_start else None
         # Create a new Prophet model
         self.model = Prophet(
             yearly_seasonality=True,
             weekly_seasonality=True,
             daily_seasonality=True,
-            changepoint_prior_scale=0.05,
-            seasonality_prior_scale=10.0
+            **self.params
         )
         
         # Add custom seasonality: monthly
         self.model.add_seasonality(name='monthly', period=30.5, fourier_order=5)
         
-        # Train the model
-        self.model.fit(data_df)
+        # Train the model, from the previous optimum when warm-starting
+        if init is not None:
+            self.model.fit(data_df, init=init)
+        else:
+            self.model.fit(data_df)
+        self.warm_started = init is not None
         
         # Save the model
-        joblib.dump(self.model, self.model_path)
+        if save:
+            self.save_model()
         
         return self.model
     
+    def save_model(self):
+        """
+        Save the trained model as JSON, without Stan objects and with its history trimmed.
+        """
+        trimmed = copy.copy(self.model)
+        trimmed.history = self.model.history.tail(SAVED_HISTORY_ROWS)
+        model_json = model_to_json(trimmed)
+        
+        def write(temporary_path):
+            with open(temporary_path, 'w', encoding='utf-8') as f:
+                f.write(model_json)
+        
+        atomic_write(self.model_path, write)
+    
     def load_model(self):
         """
         Load a previously trained model.
@@ -67,16 +154,26 @@ class ProphetPredictor:
             Loaded model or None if no model exists
         """
         if os.path.exists(self.model_path):
-            self.model = joblib.load(self.model_path)
+            with open(self.model_path, 'r', encoding='utf-8') as f:
+                self.model = model_from_json(f.read())
             return self.model
         return None
     
-    def predict(self, days=30):
+    def predict(self, days=30, start_date=None, include_history=False, uncertainty_samples=None):
         """
         Make predictions for the future.
         
+        Only the requested dates are scored: the training history is not
+        re-predicted unless include_history is set.
+        
         Args:
             days: Number of days to predict
+            start_date: Optional first date to predict (default the day after
+                the training history)
+            include_history: Whether to also predict every training date
+            uncertainty_samples: Optional number of simulated draws for the
+                intervals (default the model's, 0 skips sampling and returns
+                intervals collapsed onto the point forecast)
             
         Returns:
             DataFrame with predictions
@@ -88,10 +185,26 @@ class ProphetPredictor:
             raise ValueError("No trained model available. Please train the model first.")
         
         # Create future dataframe
-        future = self.model.make_future_dataframe(periods=days)
+        if start_date is None:
+            future = self.model.make_future_dataframe(periods=days, include_history=include_history)
+        else:
+            future = pd.DataFrame({'ds': pd.date_range(start=start_date, periods=days)})
+            if include_history:
+                future = pd.concat([pd.DataFrame({'ds': self.model.history_dates}), future],
+                                   ignore_index=True)
+        
+        # Make predictions, on a shallow copy when the sampling is overridden
+        # so concurrent requests sharing the model are not affected
+        model = self.model
+        if uncertainty_samples is not None and uncertainty_samples != model.uncertainty_samples:
+            model = copy.copy(self.model)
+            model.uncertainty_samples = int(uncertainty_samples)
+        forecast = model.predict(future)
         
-        # Make predictions
-        forecast = self.model.predict(future)
+        if not model.uncertainty_samples:
+            for column in ('yhat', 'trend'):
+                forecast[f'{column}_lower'] = forecast[column]
+                forecast[f'{column}_upper'] = forecast[column]
         
         return forecast
     
@@ -106,6 +219,7 @@ class ProphetPredictor:
         Returns:
             Path to the saved plot file
         """
+        plt = _pyplot()
         # Create a plot
         plt.figure(figsize=(12, 6))
         
@@ -145,6 +259,7 @@ class ProphetPredictor:
         Returns:
             Path to the saved plot file
         """
+        plt = _pyplot()
         # Create a components plot
         fig = self.model.plot_components(forecast)
         
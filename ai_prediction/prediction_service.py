@@ -6,35 +6,82 @@ This module provides a high-level interface to the prediction models.
 
 import os
 import json
+import threading
 import pandas as pd
+from functools import partial
 from datetime import datetime
 from db_connector import get_connector
+from data_cache import LocalDataCache
+from usage_aggregator import DailyUsageAggregator
+from usage_statistics import RollingUsageStatistics
+from model_registry import get_model_registry
+from forecast_cache import get_forecast_cache
+from backtesting import run_backtest, write_model_metrics
+from hyperparameter_search import tune_hyperparameters, load_tuned_params
 from data_processor import (
     calculate_daily_usage, 
+    calculate_usage_matrix,
+    reduce_calendar_counts,
     prepare_time_series_data,
-    calculate_hourly_distribution,
-    calculate_weekly_distribution,
-    calculate_monthly_distribution,
-    calculate_average_daily_usage,
-    predict_days_until_empty
+    calculate_calendar_distributions,
+    predict_days_until_empty,
+    simulate_stock_out
 )
 from models.prophet_predictor import ProphetPredictor
 from models.ml_predictor import MLPredictor
+from models.multi_series_predictor import MultiSeriesPredictor, MIN_HISTORY, forecastable_series
+
+# Columns needed to derive daily usage and calendar distributions
+USAGE_COLUMNS = ['action', 'quantity', 'createdAt']
+CALENDAR_COLUMNS = ['createdAt']
+
+# Predictors served through the model registry
+MODEL_CLASSES = {
+    'prophet': ProphetPredictor,
+    'ml': MLPredictor
+}
+
+# Stock history columns that can identify a usage series
+SERIES_KEYS = ('stockId', 'action', 'createdBy')
 
 class PredictionService:
     """High-level prediction service using multiple models."""
     
-    def __init__(self):
-        """Initialize the prediction service."""
+    def __init__(self, fetch_mode=None):
+        """
+        Initialize the prediction service.
+        
+        Args:
+            fetch_mode: How history is fetched, 'cache' (local incremental cache and usage aggregator),
+                'aggregate' (daily sums and calendar counts computed in the database)
+                or 'direct' (raw rows from the database). Defaults to AI_FETCH_MODE.
+        """
         self.db_connector = get_connector()
-        self.prophet_predictor = ProphetPredictor()
-        self.ml_predictor = MLPredictor()
+        # Trained models are loaded once per process and shared by every request
+        self.models = get_model_registry()
+        for name, model_class in MODEL_CLASSES.items():
+            self.models.register(name, model_class)
+        self.forecasts = get_forecast_cache()
+        self.usage_statistics = RollingUsageStatistics()
         self.outputs_dir = os.path.join(os.path.dirname(__file__), 'outputs')
         self.plots_dir = os.path.join(self.outputs_dir, 'plots')
         self.data_dir = os.path.join(self.outputs_dir, 'data')
         
         # Ensure output directories exist
         self.ensure_output_dir()
+        
+        # Training windows with more rows than this are bulk-loaded with COPY
+        self.bulk_threshold = int(os.environ.get('AI_BULK_THRESHOLD', 50000))
+        
+        # Serve history from the local cache unless configured otherwise
+        self.fetch_mode = fetch_mode or os.environ.get('AI_FETCH_MODE', 'cache')
+        if self.fetch_mode == 'cache':
+            self.data_source = LocalDataCache(self.db_connector)
+            # Daily usage is maintained incrementally from new stock events
+            self.usage_aggregator = DailyUsageAggregator()
+        else:
+            self.data_source = self.db_connector
+            self.usage_aggregator = None
     
     def ensure_output_dir(self):
         """Ensure the output directory exists."""
@@ -42,34 +89,186 @@ class PredictionService:
         os.makedirs(self.plots_dir, exist_ok=True)
         os.makedirs(self.data_dir, exist_ok=True)
     
-    def train_models(self, days=None):
+    def load_daily_usage(self, days=None):
+        """
+        Load the daily usage series for a window of history.
+        
+        Args:
+            days: Optional number of days of history to use
+            
+        Returns:
+            DataFrame with daily usage data, empty when there is no usage
+        """
+        if self.usage_aggregator is not None:
+            self.usage_aggregator.sync(self.db_connector)
+            return self.usage_aggregator.daily_usage(days=days)
+        
+        if self.fetch_mode == 'aggregate':
+            usage_data = self.data_source.get_daily_usage(days=days)
+        else:
+            # Stream raw rows so long windows are reduced in bounded memory
+            usage_data = self.data_source.iter_stock_history(days=days, columns=USAGE_COLUMNS)
+        
+        return calculate_daily_usage(usage_data)
+    
+    def load_training_usage(self, days=None):
+        """
+        Load the daily usage series used for training.
+        
+        In direct mode, windows above the bulk threshold are exported with
+        COPY instead of being fetched row by row.
+        
+        Args:
+            days: Optional number of days of history to use
+            
+        Returns:
+            DataFrame with daily usage data, empty when there is no usage
+        """
+        if self.fetch_mode == 'direct':
+            row_count = self.data_source.count_stock_history(days=days)
+            if row_count >= self.bulk_threshold:
+                return calculate_daily_usage(
+                    self.data_source.bulk_stock_history(days=days, columns=USAGE_COLUMNS)
+                )
+        
+        return self.load_daily_usage(days=days)
+    
+    def load_usage_matrix(self, days=None, key='action'):
+        """
+        Load the daily usage of every series for a window of history.
+        
+        Args:
+            days: Optional number of days of history to use
+            key: Stock history column identifying the series
+            
+        Returns:
+            DataFrame indexed by date with one column of usage per series
+        """
+        # The key may itself be a usage column (e.g. 'action')
+        columns = [key] + [column for column in USAGE_COLUMNS if column != key]
+        return calculate_usage_matrix(
+            self.data_source.iter_stock_history(days=days, columns=columns),
+            key=key
+        )
+    
+    def load_calendar_data(self, days=None):
+        """
+        Load the orders and stock operations used by the distribution analysis.
+        
+        Args:
+            days: Optional number of days of history to use
+            
+        Returns:
+            Tuple (orders, stock history) of calendar counts
+        """
+        if self.fetch_mode == 'aggregate':
+            counts = self.db_connector.fetch_concurrently({
+                'orders': partial(self.data_source.get_calendar_counts, 'orders', days=days),
+                'stock_history': partial(self.data_source.get_calendar_counts, 'stockHistory', days=days)
+            })
+            return counts['orders'], counts['stock_history']
+        
+        # Reduce streamed rows to counts once, every distribution reads the counts
+        counts = self.db_connector.fetch_concurrently({
+            'orders': lambda: reduce_calendar_counts(
+                self.data_source.iter_orders(days=days, columns=CALENDAR_COLUMNS)
+            ),
+            'stock_history': lambda: reduce_calendar_counts(
+                self.data_source.iter_stock_history(days=days, columns=CALENDAR_COLUMNS)
+            )
+        })
+        return counts['orders'], counts['stock_history']
+    
+    def get_model(self, name, training_data):
+        """
+        Get the registry entry of a model, training and publishing one if none exists.
+        
+        Args:
+            name: Model name ('prophet' or 'ml')
+            training_data: DataFrame with 'ds' and 'y' columns to train on if needed
+            
+        Returns:
+            Registry entry with the 'predictor' and its 'version'
+        """
+        entry = self.models.get(name)
+        if entry is None:
+            predictor = MODEL_CLASSES[name](params=load_tuned_params().get(name))
+            predictor.train(training_data)
+            entry = self.models.publish(name, predictor)
+        return entry
+    
+    def forecast(self, name, entry, start_date, days, uncertainty_samples=None):
+        """
+        Get the forecast of a model, served from the forecast cache when possible.
+        
+        Args:
+            name: Model name ('prophet' or 'ml')
+            entry: Registry entry of the model
+            start_date: First date to predict
+            days: Number of days to predict
+            uncertainty_samples: Optional number of Prophet uncertainty samples
+            
+        Returns:
+            DataFrame with the forecast of the requested dates (read-only)
+        """
+        predictor = entry['predictor']
+        # The artifact signature changes with every saved model, so it
+        # identifies the model version more finely than entry['version']
+        key = (name, entry['signature'], pd.Timestamp(start_date), days, uncertainty_samples)
+        if name == 'prophet':
+            compute = partial(predictor.predict, days=days, start_date=start_date,
+                              uncertainty_samples=uncertainty_samples)
+        else:
+            compute = partial(predictor.predict, start_date, days=days)
+        return self.forecasts.get_or_compute(key, compute)
+    
+    def train_models(self, days=None, tune=False, incremental=False):
         """
         Train all predictive models.
         
         Args:
             days: Optional number of days of data to use for training
+            tune: Whether to search the hyperparameters first; the winners are
+                persisted and used by this and later training runs
+            incremental: Whether to warm-start Prophet from the saved model
+                (it falls back to a cold fit if the window moved too much)
             
         Returns:
             Dictionary with training results
         """
-        # Fetch stock history data
-        stock_history_df = self.db_connector.get_stock_history(days=days)
+        # Calculate daily usage from stock history
+        daily_usage_df = self.load_training_usage(days=days)
         
-        if stock_history_df.empty:
+        if daily_usage_df.empty:
             return {
                 "error": "No stock history data available for training",
                 "success": False
             }
         
-        # Calculate daily usage from stock history
-        daily_usage_df = calculate_daily_usage(stock_history_df)
-        
         # Prepare data for time series model
         prophet_data = prepare_time_series_data(daily_usage_df)
         
-        # Train models
-        prophet_model = self.prophet_predictor.train(prophet_data)
-        ml_model, ml_metrics = self.ml_predictor.train(prophet_data)
+        tuning = None
+        if tune:
+            try:
+                results = tune_hyperparameters(daily_usage_df)
+                tuning = {
+                    name: {key: result[key] for key in ('params', 'mae', 'candidates', 'rungs')}
+                    for name, result in results.items()
+                }
+            except ValueError as e:
+                tuning = {"error": str(e)}
+        params = load_tuned_params()
+        
+        # Train new models and publish them, requests switch to them atomically
+        prophet_predictor = ProphetPredictor(params=params.get('prophet'))
+        prophet_predictor.train(prophet_data, warm_start=incremental)
+        ml_predictor = MLPredictor(params=params.get('ml'))
+        ml_model, ml_metrics = ml_predictor.train(prophet_data)
+        model_versions = {
+            'prophet': self.models.publish('prophet', prophet_predictor)['version'],
+            'ml': self.models.publish('ml', ml_predictor)['version']
+        }
         
         return {
             "success": True,
@@ -79,26 +278,71 @@ class PredictionService:
                 "start": daily_usage_df['date'].min().strftime('%Y-%m-%d'),
                 "end": daily_usage_df['date'].max().strftime('%Y-%m-%d')
             },
-            "ml_metrics": ml_metrics
+            "ml_metrics": ml_metrics,
+            "parameters": {
+                'prophet': prophet_predictor.params,
+                'ml': ml_predictor.params
+            },
+            "tuning": tuning,
+            "prophet_warm_started": prophet_predictor.warm_started,
+            "model_versions": model_versions
         }
     
-    def predict_stock_usage(self, days=30):
+    def backtest_models(self, days=365, folds=3, workers=None):
+        """
+        Backtest the models with rolling forecast origins and save their metrics.
+        
+        Args:
+            days: Number of days of history to backtest on
+            folds: Maximum number of forecast origins
+            workers: Optional number of worker processes
+            
+        Returns:
+            Dictionary with backtest results per model and horizon
+        """
+        daily_usage_df = self.load_training_usage(days=days)
+        
+        if daily_usage_df.empty:
+            return {
+                "error": "No stock history data available for backtesting",
+                "success": False
+            }
+        
+        try:
+            backtest = run_backtest(daily_usage_df, folds=folds, workers=workers, params=load_tuned_params())
+        except ValueError as e:
+            return {"error": str(e), "success": False}
+        
+        metrics_path = write_model_metrics(backtest)
+        
+        return {
+            "success": True,
+            "metrics_file": os.path.basename(metrics_path),
+            **backtest
+        }
+    
+    def predict_stock_usage(self, days=30, uncertainty_samples=None):
         """
         Predict stock usage for the specified number of days.
         
         Args:
             days: Number of days to predict
+            uncertainty_samples: Optional number of Prophet uncertainty samples
+                (default the model's, 0 skips the interval simulation)
             
         Returns:
             Dictionary with prediction results and plots
         """
-        # Fetch stock history data (last 90 days)
-        stock_history_df = self.db_connector.get_stock_history(days=90)
-        
-        # Fetch current stock data
-        current_stock_df = self.db_connector.get_daily_stock()
-        
-        if stock_history_df.empty or current_stock_df.empty:
+        # Calculate daily usage from stock history (last 90 days) while
+        # fetching current stock data on another connection
+        fetched = self.db_connector.fetch_concurrently({
+            'daily_usage': partial(self.load_daily_usage, days=90),
+            'current_stock': self.data_source.get_daily_stock
+        })
+        daily_usage_df = fetched['daily_usage']
+        current_stock_df = fetched['current_stock']
+        
+        if daily_usage_df.empty or current_stock_df.empty:
             return {
                 "error": "Insufficient data available for prediction",
                 "success": False
@@ -107,37 +351,40 @@ class PredictionService:
         # Get the most recent stock record
         current_stock = current_stock_df.iloc[0].to_dict()
         
-        # Calculate daily usage from stock history
-        daily_usage_df = calculate_daily_usage(stock_history_df)
-        
         # Prepare data for prediction
         prophet_data = prepare_time_series_data(daily_usage_df)
         
-        # Load models or train if not available
-        if self.prophet_predictor.load_model() is None:
-            self.prophet_predictor.train(prophet_data)
-            
-        if self.ml_predictor.load_model() is None:
-            self.ml_predictor.train(prophet_data)
-        
-        # Make predictions
-        prophet_forecast = self.prophet_predictor.predict(days=days)
-        ml_forecast = self.ml_predictor.predict(
-            datetime.now().replace(hour=0, minute=0, second=0, microsecond=0),
-            days=days
-        )
-        
-        # Calculate historical metrics
-        avg_daily_usage = calculate_average_daily_usage(daily_usage_df, last_n_days=30)
+        # Get the loaded models, training them only if none exist yet
+        prophet_model = self.get_model('prophet', prophet_data)
+        ml_model = self.get_model('ml', prophet_data)
+        prophet_predictor = prophet_model['predictor']
+        ml_predictor = ml_model['predictor']
+        
+        # Make predictions of the requested days only, from today
+        start_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        prophet_forecast = self.forecast('prophet', prophet_model, start_date, days,
+                                         uncertainty_samples=uncertainty_samples)
+        ml_forecast = self.forecast('ml', ml_model, start_date, days)
+        
+        # Calculate historical metrics (rolling statistics are only recomputed
+        # when the usage series changed since the last request)
+        self.usage_statistics.update(daily_usage_df)
+        avg_daily_usage = self.usage_statistics.get('mean', 30)
         days_until_empty = predict_days_until_empty(
             float(current_stock['unreservedStock']), 
             avg_daily_usage
         )
         
+        # Stock-out day distribution from the forecast
+        stock_out_simulation = simulate_stock_out(
+            float(current_stock['unreservedStock']),
+            prophet_forecast
+        )
+        
         # Generate plots
-        prophet_forecast_plot = self.prophet_predictor.plot_forecast(prophet_forecast, prophet_data)
-        prophet_components_plot = self.prophet_predictor.plot_components(prophet_forecast)
-        ml_forecast_plot = self.ml_predictor.plot_forecast(ml_forecast, prophet_data)
+        prophet_forecast_plot = prophet_predictor.plot_forecast(prophet_forecast, prophet_data)
+        prophet_components_plot = prophet_predictor.plot_components(prophet_forecast)
+        ml_forecast_plot = ml_predictor.plot_forecast(ml_forecast, prophet_data)
         
         # Create forecast summary data
         next_7_days = prophet_forecast[prophet_forecast['ds'] < prophet_forecast['ds'].iloc[0] + pd.Timedelta(days=7)]
@@ -151,7 +398,9 @@ class PredictionService:
             "historical_analysis": {
                 "avg_daily_usage": avg_daily_usage,
                 "days_until_empty": days_until_empty,
-                "total_usage_last_30_days": daily_usage_df['usage'].sum() if len(daily_usage_df) > 0 else 0
+                "stock_out_simulation": stock_out_simulation,
+                "total_usage_last_30_days": self.usage_statistics.get('sum', 30),
+                "rolling_statistics": self.usage_statistics.latest()
             },
             "forecast_summary": {
                 "next_7_days": {
@@ -178,6 +427,12 @@ class PredictionService:
                 "prophet_components": prophet_components_plot,
                 "ml_forecast": ml_forecast_plot
             },
+            "model_versions": {
+                "prophet": prophet_model['version'],
+                "ml": ml_model['version']
+            },
+            # None when the ML model has no interval source and its bounds are missing
+            "ml_interval_source": ml_predictor.interval_source,
             "full_forecast": prophet_forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].to_dict('records')
         }
         
@@ -186,6 +441,67 @@ class PredictionService:
         
         return result
     
+    def predict_series_usage(self, days=14, key='action', history_days=90):
+        """
+        Train and forecast the usage of every series in one batch.
+        
+        Series with fewer than MIN_HISTORY days of usage are skipped: a
+        stockId, for instance, identifies one day's stock record, so its
+        series holds a single day.
+        
+        Args:
+            days: Number of days to predict
+            key: Stock history column identifying the series
+            history_days: Number of days of history to train on
+            
+        Returns:
+            Dictionary with the forecast of every series with enough history
+        """
+        if key not in SERIES_KEYS:
+            return {
+                "error": f"Unsupported series key: {key}. Use one of {', '.join(SERIES_KEYS)}",
+                "success": False
+            }
+        
+        usage_matrix = self.load_usage_matrix(days=history_days, key=key)
+        if usage_matrix.empty:
+            return {
+                "error": "No stock history data available for series prediction",
+                "success": False
+            }
+        
+        usage_matrix, skipped = forecastable_series(usage_matrix)
+        if usage_matrix.empty:
+            return {
+                "error": f"No series by {key} has {MIN_HISTORY} days of usage to forecast from",
+                "success": False
+            }
+        
+        # A predictor per request: concurrent requests (possibly with another
+        # key) must not share coefficients, and a read endpoint saves nothing
+        multi_series_predictor = MultiSeriesPredictor()
+        metrics = multi_series_predictor.train(usage_matrix, save=False)
+        forecast = multi_series_predictor.predict(days=days)
+        forecast['ds'] = forecast['ds'].dt.strftime('%Y-%m-%d')
+        
+        series = {}
+        for name, series_forecast in forecast.groupby('series', sort=False):
+            series[str(name)] = {
+                "total_usage": float(series_forecast['yhat'].sum()),
+                "avg_daily_usage": float(series_forecast['yhat'].mean()),
+                "forecast": series_forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].to_dict('records')
+            }
+        
+        return {
+            "success": True,
+            "key": key,
+            "series_count": len(series),
+            "skipped_series": len(skipped),
+            "data_points": len(usage_matrix),
+            "metrics": metrics,
+            "series": series
+        }
+    
     def analyze_patterns(self):
         """
         Analyze patterns in stock usage and orders.
@@ -194,8 +510,7 @@ class PredictionService:
             Dictionary with pattern analysis
         """
         # Fetch stock history and orders data (last 180 days for more comprehensive patterns)
-        stock_history_df = self.db_connector.get_stock_history(days=180)
-        orders_df = self.db_connector.get_orders(days=180)
+        orders_df, stock_history_df = self.load_calendar_data(days=180)
         
         if stock_history_df.empty:
             return {
@@ -203,14 +518,11 @@ class PredictionService:
                 "success": False
             }
         
-        # Analyze hourly distribution
-        hourly_distribution = calculate_hourly_distribution(orders_df, stock_history_df)
-        
-        # Analyze weekly distribution
-        weekly_distribution = calculate_weekly_distribution(orders_df, stock_history_df)
-        
-        # Analyze monthly distribution
-        monthly_distribution = calculate_monthly_distribution(orders_df, stock_history_df)
+        # Hourly, weekly and monthly distributions from one count per table
+        distributions = calculate_calendar_distributions(orders_df, stock_history_df)
+        hourly_distribution = distributions['hourly']
+        weekly_distribution = distributions['weekly']
+        monthly_distribution = distributions['monthly']
         
         # Compile results
         result = {
@@ -254,10 +566,14 @@ class PredictionService:
 
 # Singleton instance of the prediction service
 _prediction_service = None
+_prediction_service_lock = threading.Lock()
 
 def get_prediction_service():
     """Get the prediction service instance."""
     global _prediction_service
     if _prediction_service is None:
-        _prediction_service = PredictionService()
+        # The startup preload and the first requests may race to create it
+        with _prediction_service_lock:
+            if _prediction_service is None:
+                _prediction_service = PredictionService()
     return _prediction_service
\ No newline at end of file
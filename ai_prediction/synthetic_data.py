@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Synthetic data module for the AI prediction system.
+This module generates realistic stockHistory, orders and stock tables and
+writes them to the SQLite and Parquet data sources, so the prediction
+pipeline can be benchmarked and load-tested without a live PostgreSQL.
+"""
+
+import os
+import sqlite3
+import argparse
+from contextlib import closing
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# Relative demand per weekday (Monday first): weekends are the busy days
+WEEKDAY_DEMAND = np.array([0.8, 0.75, 0.8, 0.9, 1.1, 1.45, 1.4])
+
+# Share of the events per hour of day, peaking at lunch time
+HOURLY_DEMAND = np.array([
+    0, 0, 0, 0, 0, 0, 0, 0.2, 0.5, 1, 2, 4,
+    7, 9, 8, 4, 1.5, 1, 1, 1.5, 2, 1, 0.3, 0
+], dtype=float)
+HOURLY_DEMAND /= HOURLY_DEMAND.sum()
+
+STOCK_ACTIONS = np.array(['sell', 'remove', 'add'])
+STOCK_ACTION_WEIGHTS = np.array([0.8, 0.05, 0.15])
+ACTION_DESCRIPTIONS = {
+    'sell': 'Venta directa',
+    'remove': 'Retirada de stock',
+    'add': 'Pollos montados'
+}
+CREATED_BY = np.array(['admin', 'system', 'client'])
+
+ORDER_STATUSES = np.array(['delivered', 'pending', 'cancelled', 'error'])
+ORDER_STATUS_WEIGHTS = np.array([0.85, 0.08, 0.05, 0.02])
+CUSTOMER_NAMES = np.array([
+    'María García', 'José Martínez', 'Ana López', 'Antonio Sánchez',
+    'Carmen Pérez', 'Francisco Gómez', 'Laura Navarro', 'David Ruiz'
+])
+PRICE_PER_UNIT = 13.5
+
+def _daily_demand(days, events_per_day):
+    """Expected number of events per day, with weekly and yearly seasonality."""
+    yearly = 1 + 0.25 * np.cos(2 * np.pi * (days.dayofyear.values - 220) / 365.25)
+    # Moros y Cristianos (5-9 September) and Christmas peaks
+    fiestas = np.where((days.month == 9) & (days.day >= 5) & (days.day <= 9), 1.8, 1.0)
+    christmas = np.where((days.month == 12) & (days.day >= 22), 1.5, 1.0)
+    return events_per_day * WEEKDAY_DEMAND[days.weekday] * yearly * fiestas * christmas
+
+def _event_times(rng, days, counts):
+    """Timestamps of the events of every day, following the hourly profile."""
+    day_index = np.repeat(np.arange(len(days)), counts)
+    hours = rng.choice(24, size=len(day_index), p=HOURLY_DEMAND)
+    seconds = rng.integers(0, 3600, size=len(day_index))
+    times = (days.values[day_index]
+             + hours.astype('timedelta64[h]')
+             + seconds.astype('timedelta64[s]'))
+    return day_index, times
+
+def generate_dataset(years=1.0, events_per_day=200, end_date=None, seed=42):
+    """
+    Generate a synthetic dataset.
+    
+    Args:
+        years: Years of history to generate
+        events_per_day: Average number of stock events per day
+        end_date: Last day of history (default today)
+        seed: Random seed
+        
+    Returns:
+        Dictionary with 'stockHistory', 'stock' and 'orders' DataFrames
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end_date or datetime.now()).normalize()
+    days = pd.date_range(end=end, periods=max(int(years * 365), 1), freq='D')
+    demand = _daily_demand(days, events_per_day)
+    
+    # Stock operations, ordered in time
+    counts = rng.poisson(demand)
+    day_index, created_at = _event_times(rng, days, counts)
+    order = np.argsort(created_at, kind='stable')
+    day_index, created_at = day_index[order], created_at[order]
+    
+    n_events = len(created_at)
+    actions = rng.choice(STOCK_ACTIONS, size=n_events, p=STOCK_ACTION_WEIGHTS)
+    quantities = np.where(
+        actions == 'add',
+        rng.integers(10, 41, size=n_events) / 2,
+        rng.choice([0.5, 1, 1.5, 2, 3], size=n_events, p=[0.2, 0.4, 0.15, 0.2, 0.05])
+    )
+    signed = np.where(actions == 'add', quantities, -quantities)
+    
+    # Daily stock: what was mounted in the morning plus that day's movements
+    sold_per_day = np.bincount(day_index, weights=np.where(actions == 'add', 0, quantities),
+                               minlength=len(days))
+    initial_stock = np.round(sold_per_day * rng.uniform(1.0, 1.2, size=len(days)))
+    running = np.cumsum(signed)
+    day_start = np.concatenate([[0], np.cumsum(np.bincount(day_index, minlength=len(days)))])[:-1]
+    running_at_day_start = np.concatenate([[0], running])[day_start[day_index]]
+    new_stock = initial_stock[day_index] + running - running_at_day_start
+    
+    stock_history = pd.DataFrame({
+        'id': np.arange(1, n_events + 1),
+        'stockId': day_index + 1,
+        'action': actions,
+        'quantity': quantities,
+        'newStock': new_stock,
+        'description': pd.Series(actions).map(ACTION_DESCRIPTIONS).values,
+        'createdAt': created_at,
+        'createdBy': rng.choice(CREATED_BY, size=n_events, p=[0.6, 0.3, 0.1]),
+        'deleted': rng.random(n_events) < 0.01
+    })
+    
+    current_stock = initial_stock + np.bincount(day_index, weights=signed, minlength=len(days))
+    reserved_stock = np.minimum(np.round(rng.uniform(0, 0.3, size=len(days)) * initial_stock),
+                                np.maximum(current_stock, 0))
+    stock = pd.DataFrame({
+        'id': np.arange(1, len(days) + 1),
+        'date': days.values,
+        'initialStock': initial_stock,
+        'currentStock': current_stock,
+        'reservedStock': reserved_stock,
+        'unreservedStock': np.maximum(current_stock - reserved_stock, 0),
+        'lastUpdated': days.values + np.timedelta64(21, 'h')
+    })
+    
+    # Orders: about a third of the demand is ordered in advance
+    order_counts = rng.poisson(demand * 0.3)
+    order_day_index, pickup_time = _event_times(rng, days, order_counts)
+    order_sort = np.argsort(pickup_time, kind='stable')
+    order_day_index, pickup_time = order_day_index[order_sort], pickup_time[order_sort]
+    
+    n_orders = len(pickup_time)
+    lead_time = rng.integers(10 * 60, 3 * 24 * 3600, size=n_orders).astype('timedelta64[s]')
+    order_created_at = pickup_time - lead_time
+    order_quantities = rng.choice([0.5, 1, 1.5, 2, 3], size=n_orders, p=[0.15, 0.45, 0.15, 0.2, 0.05])
+    orders = pd.DataFrame({
+        'id': np.arange(1, n_orders + 1),
+        'customerName': rng.choice(CUSTOMER_NAMES, size=n_orders),
+        'quantity': order_quantities,
+        'pickupTime': pickup_time,
+        'status': rng.choice(ORDER_STATUSES, size=n_orders, p=ORDER_STATUS_WEIGHTS),
+        'totalAmount': np.round(order_quantities * PRICE_PER_UNIT, 2),
+        'createdAt': order_created_at,
+        'updatedAt': order_created_at + rng.integers(0, 3600, size=n_orders).astype('timedelta64[s]'),
+        'deleted': rng.random(n_orders) < 0.01
+    })
+    
+    return {
+        'stockHistory': stock_history,
+        'stock': stock,
+        'orders': orders
+    }
+
+def write_sqlite(dataset, path):
+    """
+    Write a dataset to a SQLite database (replacing its tables).
+    
+    Args:
+        dataset: Dictionary of DataFrames from generate_dataset
+        path: Path of the SQLite database file
+        
+    Returns:
+        Path of the database file
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # closing() closes the connection, the inner with commits the tables
+    with closing(sqlite3.connect(path)) as conn, conn:
+        for table, df in dataset.items():
+            df.to_sql(table, conn, if_exists='replace', index=False, chunksize=50000)
+            time_column = 'date' if table == 'stock' else 'createdAt'
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{time_column}" '
+                         f'ON "{table}" ("{time_column}")')
+            conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "idx_{table}_id" ON "{table}" ("id")')
+    return path
+
+def write_parquet(dataset, directory):
+    """
+    Write a dataset to a directory with one Parquet file per table.
+    
+    Args:
+        dataset: Dictionary of DataFrames from generate_dataset
+        directory: Output directory
+        
+    Returns:
+        Path of the directory
+    """
+    os.makedirs(directory, exist_ok=True)
+    for table, df in dataset.items():
+        df.to_parquet(os.path.join(directory, f"{table}.parquet"), index=False,
+                      row_group_size=100000)
+    return directory
+
+def main():
+    """Command-line entry point to generate a synthetic dataset."""
+    parser = argparse.ArgumentParser(description='Generate synthetic prediction data')
+    parser.add_argument('--years', type=float, default=1.0,
+                        help='Years of history to generate')
+    parser.add_argument('--events-per-day', type=int, default=200,
+                        help='Average number of stock events per day')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Random seed')
+    parser.add_argument('--sqlite', type=str,
+                        help='Write the dataset to this SQLite file')
+    parser.add_argument('--parquet', type=str,
+                        help='Write the dataset to this Parquet directory')
+    
+    args = parser.parse_args()
+    if not args.sqlite and not args.parquet:
+        parser.error('Choose at least one of --sqlite and --parquet')
+    
+    dataset = generate_dataset(years=args.years, events_per_day=args.events_per_day, seed=args.seed)
+    for table, df in dataset.items():
+        print(f"{table}: {len(df)} rows")
+    
+    if args.sqlite:
+        print(f"SQLite database written to {write_sqlite(dataset, args.sqlite)}")
+    if args.parquet:
+        print(f"Parquet directory written to {write_parquet(dataset, args.parquet)}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""Tests of the compact model artifacts."""
+
+import os
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from models.artifacts import CompactForest, atomic_write
+from models.ml_predictor import MLPredictor
+
+def fitted_forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 6)).astype(np.float32)
+    y = X[:, 0] * 3 + np.sin(X[:, 1]) + rng.normal(scale=0.1, size=300)
+    forest = RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0).fit(X, y)
+    return forest, rng.normal(size=(50, 6)).astype(np.float32)
+
+def test_predictions_equal_the_sklearn_forest():
+    forest, X = fitted_forest()
+    compact = CompactForest.from_forest(forest)
+    
+    np.testing.assert_array_equal(compact.predict(X), forest.predict(X))
+    np.testing.assert_array_equal(compact.predict_trees(X), [tree.predict(X) for tree in forest.estimators_])
+    np.testing.assert_array_equal(compact.feature_importances_, forest.feature_importances_)
+
+def test_memory_mapped_round_trip(tmp_path):
+    forest, X = fitted_forest()
+    compact = CompactForest.from_forest(forest)
+    path = str(tmp_path / 'forest.npy')
+    compact.save(path)
+    
+    loaded = CompactForest.load(path, compact.state())
+    
+    assert isinstance(loaded.nodes, np.memmap)
+    assert not loaded.nodes.flags.writeable
+    np.testing.assert_array_equal(loaded.predict(X), forest.predict(X))
+    # No temporary file is left next to the artifact
+    assert os.listdir(tmp_path) == ['forest.npy']
+
+def test_atomic_write_keeps_the_old_file_on_failure(tmp_path):
+    path = tmp_path / 'model.json'
+    path.write_text('old')
+    
+    def fail(temporary_path):
+        with open(temporary_path, 'w') as f:
+            f.write('partial')
+        raise RuntimeError('write failed')
+    
+    try:
+        atomic_write(str(path), fail)
+    except RuntimeError:
+        pass
+    
+    assert path.read_text() == 'old'
+    assert os.listdir(tmp_path) == ['model.json']
+
+def test_saved_ml_model_predicts_the_same(tmp_path):
+    data = pd.DataFrame({'ds': pd.date_range('2026-01-01', periods=120),
+                         'y': np.random.default_rng(0).poisson(20, 120).astype(float)})
+    predictor = MLPredictor()
+    predictor.model_path = str(tmp_path / 'ml_model.joblib')
+    predictor.train(data)
+    expected = predictor.predict(pd.Timestamp('2026-05-01'), days=14)
+    
+    loaded = MLPredictor()
+    loaded.model_path = predictor.model_path
+    loaded.load_model()
+    
+    assert isinstance(loaded.model, CompactForest)
+    pd.testing.assert_frame_equal(loaded.predict(pd.Timestamp('2026-05-01'), days=14), expected)
@@ -0,0 +1,51 @@
+"""Tests of the calendar feature encoder."""
+
+import numpy as np
+import pandas as pd
+from models.calendar_features import CALENDAR_FEATURES, CalendarFeatureEncoder, encode_calendar, to_day_numbers
+
+def reference_features(dates):
+    """Encode dates with pandas date fields, one column at a time."""
+    dates = pd.DatetimeIndex(dates)
+    features = pd.DataFrame({
+        'day_of_month': dates.day,
+        'year': dates.year,
+        'is_weekend': dates.dayofweek >= 5,
+        'is_month_start': dates.is_month_start,
+        'is_month_end': dates.is_month_end
+    }, index=dates)
+    for day in range(1, 7):
+        features[f'day_of_week_{day}'] = dates.dayofweek == day
+    for month in range(2, 13):
+        features[f'month_{month}'] = dates.month == month
+    for quarter in range(2, 5):
+        features[f'quarter_{quarter}'] = dates.quarter == quarter
+    return features[CALENDAR_FEATURES].to_numpy(dtype=np.float32)
+
+def test_encoding_matches_pandas_date_fields():
+    # Spans leap days, month and year ends
+    dates = pd.date_range('2023-12-25', '2025-03-05')
+    
+    np.testing.assert_array_equal(encode_calendar(to_day_numbers(dates)), reference_features(dates))
+
+def test_encoder_extends_its_table_both_ways():
+    encoder = CalendarFeatureEncoder()
+    middle = pd.date_range('2026-03-01', periods=10)
+    later = pd.date_range('2026-05-01', periods=10)
+    earlier = pd.date_range('2025-12-30', periods=5)
+    
+    for dates in (middle, later, earlier, middle):
+        np.testing.assert_array_equal(encoder.transform(dates), reference_features(dates))
+
+def test_encoder_accepts_unordered_and_timezone_aware_dates():
+    encoder = CalendarFeatureEncoder()
+    dates = pd.DatetimeIndex(['2026-02-28', '2026-01-01', '2026-02-28'])
+    
+    np.testing.assert_array_equal(encoder.transform(list(dates)), reference_features(dates))
+    np.testing.assert_array_equal(encoder.transform(dates.tz_localize('Europe/Madrid')), reference_features(dates))
+
+def test_empty_batch_keeps_the_layout():
+    X = CalendarFeatureEncoder().transform([])
+    
+    assert X.shape == (0, len(CALENDAR_FEATURES))
+    assert X.dtype == np.float32
@@ -0,0 +1,56 @@
+"""Tests of the successive halving hyperparameter search."""
+
+import numpy as np
+import pandas as pd
+from hyperparameter_search import load_tuned_params, save_tuned_params, successive_halving
+
+class FakeRunner:
+    """Fold runner whose forecasts miss the actual usage by each candidate's 'bias'."""
+    
+    def __init__(self, days=200):
+        self.series = pd.Series(np.arange(days, dtype=float), index=pd.date_range('2026-01-01', periods=days))
+        self.tasks = []
+    
+    def run(self, tasks):
+        self.tasks.extend(tasks)
+        usage = self.series.values
+        return [{'yhat': usage[origin:origin + horizon] + params['bias']}
+                for _, origin, horizon, params in tasks]
+
+def search(candidates, origins, eta=3):
+    runner = FakeRunner()
+    return runner, successive_halving(runner, 'ml', candidates, origins, horizon=7, eta=eta)
+
+def test_best_candidate_wins():
+    candidates = [{'bias': bias} for bias in (5.0, -3.0, 1.0, 8.0, -0.5, 2.0, 4.0, 6.0, 7.0)]
+    
+    _, result = search(candidates, origins=list(range(100, 190, 10)))
+    
+    assert result['params'] == {'bias': -0.5}
+    assert result['mae'] == 0.5
+    assert result['leaderboard'][0]['params'] == {'bias': -0.5}
+
+def test_rungs_shrink_candidates_and_grow_folds():
+    candidates = [{'bias': float(bias)} for bias in range(9)]
+    
+    _, result = search(candidates, origins=list(range(100, 190, 10)))
+    
+    assert [(rung['folds'], rung['candidates']) for rung in result['rungs']] == [(1, 9), (3, 3), (9, 1)]
+
+def test_folds_already_scored_are_not_run_again():
+    candidates = [{'bias': float(bias)} for bias in range(9)]
+    origins = list(range(100, 190, 10))
+    
+    runner, _ = search(candidates, origins)
+    
+    keys = [(params['bias'], origin) for _, origin, _, params in runner.tasks]
+    assert len(keys) == len(set(keys))
+    # 9 candidates on 1 fold, 3 on 2 more folds, 1 on 6 more folds
+    assert len(keys) == 9 + 3 * 2 + 6
+
+def test_tuned_params_round_trip(tmp_path):
+    path = str(tmp_path / 'tuned_params.json')
+    save_tuned_params({'ml': {'params': {'bias': 1.0}, 'mae': 1.0}}, path=path)
+    save_tuned_params({'prophet': {'params': {'changepoint_prior_scale': 0.1}, 'mae': 2.0}}, path=path)
+    
+    assert load_tuned_params(path) == {'ml': {'bias': 1.0}, 'prophet': {'changepoint_prior_scale': 0.1}}
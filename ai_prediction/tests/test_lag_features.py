@@ -0,0 +1,36 @@
+"""Tests of the lag and rolling-mean features."""
+
+import numpy as np
+import pytest
+from models.lag_features import BUFFER_SIZE, LAG_FEATURES, LAGS, MIN_HISTORY, ROLLING_WINDOWS, LagRingBuffer, lag_feature_matrix
+
+def usage(days=120):
+    return np.random.default_rng(0).poisson(10, days).astype(float)
+
+def test_matrix_matches_direct_computation():
+    y = usage()
+    X = lag_feature_matrix(y)
+    
+    for t in range(MIN_HISTORY, len(y)):
+        expected = [y[t - lag] for lag in LAGS] + [y[t - window:t].mean() for window in ROLLING_WINDOWS]
+        np.testing.assert_allclose(X[t], expected, rtol=1e-6)
+
+def test_rows_without_full_windows_are_missing():
+    X = lag_feature_matrix(usage())
+    
+    assert np.isnan(X[:MIN_HISTORY, LAG_FEATURES.index(f'rolling_mean_{max(ROLLING_WINDOWS)}')]).all()
+    assert not np.isnan(X[MIN_HISTORY:]).any()
+
+def test_ring_buffer_matches_training_features():
+    y = usage()
+    X = lag_feature_matrix(y)
+    buffer = LagRingBuffer(y[:MIN_HISTORY])
+    
+    # Pushing day after day must give the batch features of the next day
+    for t in range(MIN_HISTORY, len(y)):
+        np.testing.assert_allclose(buffer.features(), X[t], rtol=1e-5)
+        buffer.push(y[t])
+
+def test_ring_buffer_needs_a_full_window():
+    with pytest.raises(ValueError):
+        LagRingBuffer(usage(BUFFER_SIZE - 1))
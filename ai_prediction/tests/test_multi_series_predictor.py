@@ -0,0 +1,35 @@
+"""Tests of the multi-series usage forecasts."""
+
+import numpy as np
+import pandas as pd
+from data_processor import calculate_usage_matrix
+from models.multi_series_predictor import MIN_HISTORY, MultiSeriesPredictor, forecastable_series
+
+def stock_history(days=90):
+    """Stock history where every day has its own stock record, like the real schema."""
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2026-01-01 09:00', periods=days, freq='D')
+    rows = []
+    for stock_id, created_at in enumerate(dates, start=1):
+        for action in ('sell', 'remove', 'add'):
+            rows.append({'stockId': stock_id, 'action': action, 'quantity': float(rng.integers(1, 20)),
+                         'createdAt': created_at})
+    return pd.DataFrame(rows)
+
+def test_series_per_stock_record_are_skipped():
+    usage_matrix, skipped = forecastable_series(calculate_usage_matrix(stock_history(), key='stockId'))
+    
+    assert usage_matrix.empty
+    assert len(skipped) == 90
+
+def test_forecast_series_have_enough_history():
+    usage_matrix, skipped = forecastable_series(calculate_usage_matrix(stock_history(), key='action'))
+    
+    assert sorted(usage_matrix.columns) == ['remove', 'sell']
+    assert skipped == []
+    assert ((usage_matrix > 0).sum() >= MIN_HISTORY).all()
+    
+    predictor = MultiSeriesPredictor()
+    predictor.train(usage_matrix, save=False)
+    forecast = predictor.predict(days=7)
+    assert forecast.groupby('series').size().to_dict() == {'remove': 7, 'sell': 7}
@@ -0,0 +1,46 @@
+"""Tests of the warm-started Prophet retraining."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from models.prophet_predictor import ProphetPredictor
+
+def usage(start, days=120):
+    dates = pd.date_range(start, periods=days)
+    weekly = 5 * (dates.dayofweek < 5)
+    noise = np.random.default_rng(0).normal(scale=1.0, size=days)
+    return pd.DataFrame({'ds': dates, 'y': 20 + weekly + noise})
+
+@pytest.fixture
+def saved_model(tmp_path):
+    """Path of a Prophet model trained on 120 days from 2026-01-01."""
+    predictor = ProphetPredictor()
+    predictor.model_path = str(tmp_path / 'prophet_model.json')
+    predictor.train(usage('2026-01-01'))
+    return predictor.model_path
+
+def retrain(model_path, data, params=None):
+    predictor = ProphetPredictor(params=params)
+    predictor.model_path = model_path
+    predictor.train(data, save=False, warm_start=True)
+    return predictor
+
+def test_window_moved_a_few_days_warm_starts(saved_model):
+    predictor = retrain(saved_model, usage('2026-01-04'))
+    
+    assert predictor.warm_started
+    assert len(predictor.predict(days=7)) == 7
+
+def test_window_moved_too_far_fits_cold(saved_model):
+    assert not retrain(saved_model, usage('2026-02-15')).warm_started
+
+def test_window_ending_earlier_fits_cold(saved_model):
+    assert not retrain(saved_model, usage('2026-01-01', days=110)).warm_started
+
+def test_other_hyperparameters_fit_cold(saved_model):
+    params = {'changepoint_prior_scale': 0.5, 'seasonality_prior_scale': 10.0, 'seasonality_mode': 'additive'}
+    
+    assert not retrain(saved_model, usage('2026-01-04'), params=params).warm_started
+
+def test_no_saved_model_fits_cold(tmp_path):
+    assert not retrain(str(tmp_path / 'missing.json'), usage('2026-01-01')).warm_started
\ No newline at end of file
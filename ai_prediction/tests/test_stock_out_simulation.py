@@ -0,0 +1,51 @@
+"""Tests of the Monte Carlo stock-out simulation."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from data_processor import simulate_stock_out
+
+def forecast(days=30, usage=10.0, spread=3.0):
+    """Flat forecast with a symmetric interval."""
+    return pd.DataFrame({
+        'ds': pd.date_range('2026-01-01', periods=days),
+        'yhat': np.full(days, usage),
+        'yhat_lower': np.full(days, usage - spread),
+        'yhat_upper': np.full(days, usage + spread)
+    })
+
+@pytest.mark.parametrize('stock', [0, -5, None, float('nan')])
+def test_no_stock_is_out_on_day_zero(stock):
+    result = simulate_stock_out(stock, forecast(days=5), seed=0)
+    
+    assert result['already_out']
+    assert result['simulations'] == 0
+    assert result['p10_days'] == result['p50_days'] == result['p90_days'] == 0.0
+    assert result['probability_within_horizon'] == 1.0
+    assert [day['probability'] for day in result['probability_by_day']] == [1.0] * 5
+
+def test_percentiles_bracket_the_expected_day():
+    result = simulate_stock_out(100.0, forecast(), seed=0)
+    
+    assert not result['already_out']
+    assert result['p10_days'] <= result['p50_days'] <= result['p90_days']
+    # 100 units at 10 a day run out after about 10 days
+    assert result['p50_days'] == pytest.approx(10, abs=0.5)
+    assert result['probability_within_horizon'] == 1.0
+
+def test_stock_beyond_the_horizon_never_runs_out():
+    result = simulate_stock_out(10000.0, forecast(), seed=0)
+    
+    assert result['p50_days'] is None
+    assert result['probability_within_horizon'] == 0.0
+
+def test_exact_forecast_without_interval():
+    result = simulate_stock_out(25.0, forecast(days=5, spread=0.0), seed=0)
+    
+    assert result['p10_days'] == result['p90_days'] == pytest.approx(2.5)
+    assert [day['probability'] for day in result['probability_by_day']] == [0.0, 0.0, 1.0, 1.0, 1.0]
+
+def test_probability_by_day_is_cumulative():
+    probabilities = [day['probability'] for day in simulate_stock_out(100.0, forecast(), seed=1)['probability_by_day']]
+    
+    assert probabilities == sorted(probabilities)
@@ -0,0 +1,64 @@
+"""Tests of the training job queue."""
+
+import subprocess
+import pytest
+from training_jobs import TrainingJobQueue
+
+@pytest.fixture
+def queue(tmp_path):
+    """Job queue without a dispatcher, so submitted jobs stay pending."""
+    return TrainingJobQueue(jobs_dir=str(tmp_path))
+
+def test_duplicate_submission_returns_the_pending_job(queue):
+    job, dedup = queue.submit(force=True, tune=False)
+    again, again_dedup = queue.submit(tune=False, force=True)
+    
+    assert not dedup
+    assert again_dedup
+    assert again['id'] == job['id']
+    assert len(queue.jobs()) == 1
+
+def test_other_params_queue_a_new_job(queue):
+    job, _ = queue.submit(force=True)
+    other, dedup = queue.submit(force=False)
+    
+    assert not dedup
+    assert other['id'] != job['id']
+    assert [record['id'] for record in queue.jobs()] == [other['id'], job['id']]
+
+def test_cancel_pending_job(queue):
+    job, _ = queue.submit(force=True)
+    
+    cancelled = queue.cancel(job['id'])
+    assert cancelled['status'] == 'cancelled'
+    assert cancelled['finished_at'] is not None
+    assert queue.get(job['id'])['status'] == 'cancelled'
+    
+    # A cancelled job is no longer a duplicate of a new submission
+    new_job, dedup = queue.submit(force=True)
+    assert not dedup
+    assert new_job['id'] != job['id']
+
+def test_cancel_leaves_finished_jobs_alone(queue):
+    job, _ = queue.submit(force=True)
+    queue.cancel(job['id'])
+    finished_at = queue.get(job['id'])['finished_at']
+    
+    assert queue.cancel(job['id'])['finished_at'] == finished_at
+
+@pytest.mark.parametrize('job_id', ['0' * 32, 'not-a-job', '../../etc/passwd'])
+def test_unknown_job(queue, job_id):
+    assert queue.get(job_id) is None
+    assert queue.cancel(job_id) is None
+
+def test_running_job_of_a_stopped_dispatcher_reports_failed(queue):
+    job, _ = queue.submit(force=True)
+    dead = subprocess.Popen(['true'])
+    dead.wait()
+    job['status'] = 'running'
+    job['owner'] = dead.pid
+    queue._save(job)
+    
+    record = queue.get(job['id'])
+    assert record['status'] == 'failed'
+    assert record['error']
\ No newline at end of file
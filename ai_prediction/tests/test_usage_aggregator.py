@@ -0,0 +1,54 @@
+"""Tests of the usage aggregator checkpoints."""
+
+import pandas as pd
+import pytest
+from usage_aggregator import DailyUsageAggregator
+
+def events(ids):
+    return pd.DataFrame({
+        'id': ids,
+        'action': 'sell',
+        'quantity': 1.0,
+        'createdAt': [pd.Timestamp('2026-03-01') + pd.Timedelta(days=i) for i in ids]
+    })
+
+@pytest.fixture
+def checkpoint_path(tmp_path):
+    return str(tmp_path / 'daily_usage.npz')
+
+def test_checkpoint_round_trip(checkpoint_path):
+    aggregator = DailyUsageAggregator(checkpoint_path=checkpoint_path)
+    aggregator.apply(events([1, 2, 3]))
+    assert aggregator.save()
+    
+    restored = DailyUsageAggregator(checkpoint_path=checkpoint_path)
+    assert restored.last_id == 3
+    pd.testing.assert_frame_equal(restored.daily_usage(), aggregator.daily_usage())
+
+def test_older_state_does_not_overwrite_the_checkpoint(checkpoint_path):
+    behind = DailyUsageAggregator(checkpoint_path=checkpoint_path)
+    ahead = DailyUsageAggregator(checkpoint_path=checkpoint_path)
+    behind.apply(events([1, 2]))
+    ahead.apply(events([1, 2, 3, 4]))
+    
+    assert ahead.save()
+    assert not behind.save()
+    assert not ahead.save()
+    assert DailyUsageAggregator(checkpoint_path=checkpoint_path).last_id == 4
+
+def test_later_resync_replaces_the_checkpoint(checkpoint_path):
+    aggregator = DailyUsageAggregator(checkpoint_path=checkpoint_path)
+    aggregator.apply(events([1, 2]))
+    aggregator.save()
+    
+    aggregator.reaggregate(events([1]), days=3650)
+    assert aggregator.save()
+    assert DailyUsageAggregator(checkpoint_path=checkpoint_path).daily_usage()['usage'].sum() == 1.0
+
+def test_reset_removes_the_checkpoint(checkpoint_path):
+    aggregator = DailyUsageAggregator(checkpoint_path=checkpoint_path)
+    aggregator.apply(events([1]))
+    aggregator.save()
+    
+    aggregator.reset()
+    assert DailyUsageAggregator(checkpoint_path=checkpoint_path).last_id is None
\ No newline at end of file
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Training jobs module for the AI prediction system.
+This module runs model training in background worker processes and tracks
+every job, so training requests return immediately with a job id.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import fcntl
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from models.artifacts import atomic_write
+
+# Directory of the job records, shared by every server process
+JOBS_DIR = os.path.join(os.path.dirname(__file__), 'outputs', 'jobs')
+
+# Finished job records kept on disk
+MAX_FINISHED_JOBS = 100
+
+# Seconds between two scans of the pending jobs by the dispatcher
+POLL_INTERVAL = 0.5
+
+# Job ids are uuid4 hex strings, also used as record file names
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+# States of a job that will not change any more
+FINISHED_STATES = ('succeeded', 'failed', 'cancelled')
+
+def _run_training_job(params):
+    """
+    Train the models in a worker process.
+    
+    Args:
+        params: Keyword arguments of PredictionService.train_models
+        
+    Returns:
+        Dictionary with the training 'result', 'started_at' and 'run_time'
+    """
+    # Imported here so the API process does not need the training stack loaded
+    from prediction_service import get_prediction_service
+    started_at = datetime.now().isoformat()
+    start = time.perf_counter()
+    result = get_prediction_service().train_models(**params)
+    return {'result': result, 'started_at': started_at, 'run_time': time.perf_counter() - start}
+
+def _process_alive(pid):
+    """Check whether a process exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _serializable(value):
+    """Convert a result to plain JSON types (dates as strings, numpy values as floats)."""
+    return json.loads(json.dumps(value, default=lambda x: str(x) if hasattr(x, 'isoformat') else float(x)))
+
+class TrainingJobQueue:
+    """
+    Queue of training jobs run by a pool of worker processes.
+    
+    The queue lives on disk: every job is a JSON record in JOBS_DIR and
+    every state change happens under an exclusive lock of the directory, so
+    any server process (e.g. any pre-fork worker) can submit, poll or cancel
+    jobs, and no job is lost when the process that accepted it is recycled.
+    Submitting a job identical to one still pending returns the pending job
+    instead of queueing a duplicate.
+    
+    One process per server runs the dispatcher (start_dispatcher()): the
+    gunicorn master in production mode, the server process otherwise. It
+    claims pending jobs, oldest first, only when a worker is free, so pending
+    jobs can still be cancelled, and fits them in spawned processes outside
+    the API process and its GIL, with their own database connections.
+    """
+    
+    def __init__(self, max_workers=None, jobs_dir=None):
+        """
+        Initialize the training job queue.
+        
+        Args:
+            max_workers: Optional number of dispatcher worker processes
+                (default AI_TRAINING_WORKERS or 1, so jobs train one after another)
+            jobs_dir: Optional directory of the job records (default JOBS_DIR)
+        """
+        self.max_workers = max(1, int(max_workers or os.environ.get('AI_TRAINING_WORKERS', 1)))
+        self.jobs_dir = jobs_dir or JOBS_DIR
+        # Dispatcher state, only used in the process running the dispatcher
+        self._executor = None
+        self._running = 0
+        self._running_lock = threading.Lock()
+        self._dispatcher = None
+        os.makedirs(self.jobs_dir, exist_ok=True)
+    
+    @contextmanager
+    def _locked(self):
+        """Hold the exclusive lock of the jobs directory, shared by every process."""
+        with open(os.path.join(self.jobs_dir, '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                # Explicit unlock: a forked child may still hold a copy of the descriptor
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _record_path(self, job_id):
+        """Get the path of a job record."""
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+    
+    def _save(self, job):
+        """Write a job record atomically."""
+        data = json.dumps(job, indent=2, ensure_ascii=False)
+        
+        def write(temporary_path):
+            with open(temporary_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+        
+        atomic_write(self._record_path(job['id']), write)
+    
+    def _load(self, job_id):
+        """Read a job record, None if unknown."""
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        try:
+            with open(self._record_path(job_id), 'r', encoding='utf-8') as f:
+                job = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        
+        if job['status'] == 'running' and not _process_alive(job['owner']):
+            # The dispatcher running it stopped before it finished
+            job['status'] = 'failed'
+            job['error'] = "The server stopped before the job finished"
+        return job
+    
+    def _records(self):
+        """Read every job record, oldest first."""
+        records = []
+        for filename in os.listdir(self.jobs_dir):
+            if filename.endswith('.json') and not filename.startswith('.'):
+                job = self._load(filename[:-len('.json')])
+                if job is not None:
+                    records.append(job)
+        return sorted(records, key=lambda job: job['submitted_at'])
+    
+    def submit(self, **params):
+        """
+        Queue a training job, unless an identical one is already pending.
+        
+        Args:
+            **params: Keyword arguments of PredictionService.train_models
+            
+        Returns:
+            Tuple of (job record, whether an existing pending job was returned)
+        """
+        with self._locked():
+            for job in self._records():
+                if job['status'] == 'pending' and job['params'] == params:
+                    return job, True
+            
+            job = {
+                'id': uuid.uuid4().hex,
+                'status': 'pending',
+                'owner': None,
+                'params': params,
+                'submitted_at': datetime.now().isoformat(),
+                'started_at': None,
+                'finished_at': None,
+                'wait_time': None,
+                'run_time': None,
+                'result': None,
+                'error': None
+            }
+            self._save(job)
+            return job, False
+    
+    def get(self, job_id):
+        """
+        Get the record of a job.
+        
+        Args:
+            job_id: Job id returned by submit()
+            
+        Returns:
+            Job record with its status, timings and training result, or None if unknown
+        """
+        return self._load(job_id)
+    
+    def jobs(self):
+        """
+        Get the records of every known job, newest first.
+        
+        Returns:
+            List of job records
+        """
+        return self._records()[::-1]
+    
+    def cancel(self, job_id):
+        """
+        Cancel a pending job (running jobs cannot be interrupted).
+        
+        Args:
+            job_id: Job id returned by submit()
+            
+        Returns:
+            The job record, or None if unknown; its status is 'cancelled' only
+            if the job was still pending
+        """
+        with self._locked():
+            job = self._load(job_id)
+            if job is not None and job['status'] == 'pending':
+                self._finish(job, 'cancelled')
+            return job
+    
+    def _finish(self, job, status, error=None):
+        """Record the final state of a job (called with the directory locked)."""
+        job['status'] = status
+        job['error'] = error
+        job['finished_at'] = datetime.now().isoformat()
+        self._save(job)
+    
+    def _prune(self):
+        """Delete the oldest finished records beyond MAX_FINISHED_JOBS (called with the directory locked)."""
+        finished = [job for job in self._records() if job['status'] in FINISHED_STATES]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            os.remove(self._record_path(job['id']))
+    
+    def start_dispatcher(self):
+        """Start running the pending jobs of every server process from this process."""
+        if self._dispatcher is not None:
+            return
+        self._dispatcher = threading.Thread(target=self._dispatch_forever, name='training-jobs', daemon=True)
+        self._dispatcher.start()
+    
+    def _dispatch_forever(self):
+        """Dispatcher loop: claim pending jobs whenever a worker is free."""
+        while True:
+            try:
+                self._dispatch()
+            except Exception as e:
+                print(f"Error dispatching training jobs: {e}")
+            time.sleep(POLL_INTERVAL)
+    
+    def _dispatch(self):
+        """Claim the oldest pending jobs that fit in the free workers and start them."""
+        with self._running_lock:
+            free = self.max_workers - self._running
+        if free <= 0:
+            return
+        
+        with self._locked():
+            claimed = [job for job in self._records() if job['status'] == 'pending'][:free]
+            for job in claimed:
+                job['status'] = 'running'
+                job['owner'] = os.getpid()
+                job['wait_time'] = (datetime.now() - datetime.fromisoformat(job['submitted_at'])).total_seconds()
+                self._save(job)
+        
+        for job in claimed:
+            if self._executor is None:
+                # Spawned, not forked: the workers must not inherit this
+                # process' threads and pooled database connections
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            with self._running_lock:
+                self._running += 1
+            future = self._executor.submit(_run_training_job, job['params'])
+            future.add_done_callback(lambda future, job=job: self._completed(job, future))
+    
+    def _completed(self, job, future):
+        """Record the outcome of a job."""
+        with self._locked():
+            try:
+                outcome = future.result()
+                result = _serializable(outcome['result'])
+                job.update(started_at=outcome['started_at'], run_time=outcome['run_time'], result=result)
+                if result.get('success', True):
+                    self._finish(job, 'succeeded')
+                else:
+                    self._finish(job, 'failed', error=result.get('error'))
+            except Exception as e:
+                print(f"Error running training job {job['id']}: {e}")
+                self._finish(job, 'failed', error=str(e))
+                if isinstance(e, BrokenProcessPool):
+                    # A worker died (e.g. out of memory), start a new pool for the next jobs
+                    self._executor = None
+            self._prune()
+        with self._running_lock:
+            self._running -= 1
+    
+    def shutdown(self):
+        """Stop the worker processes once the running jobs finished."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+# Process-wide training job queue
+_training_queue = None
+_training_queue_lock = threading.Lock()
+
+def get_training_queue():
+    """Get the process-wide training job queue instance."""
+    global _training_queue
+    if _training_queue is None:
+        with _training_queue_lock:
+            if _training_queue is None:
+                _training_queue = TrainingJobQueue()
+    return _training_queue
\ No newline at end of file
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Usage aggregator module for the AI prediction system.
+This module keeps the daily (and hourly) usage series up to date from new
+stock history events, so predictions do not rebuild it from raw history.
+"""
+
+import os
+import time
+import fcntl
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from data_source import window_start
+from data_cache import RESYNC_DAYS, RESYNC_INTERVAL
+from models.artifacts import atomic_write
+
+# Stock history actions that reduce stock
+USAGE_ACTIONS = ('sell', 'remove')
+
+# Columns needed to apply stock history events
+EVENT_COLUMNS = ['id', 'action', 'quantity', 'createdAt']
+
+class DailyUsageAggregator:
+    """
+    Online daily usage aggregator.
+    
+    Usage is kept as dense arrays indexed by day since a start date, so each
+    event is added to its day in constant time. Events may arrive late or out
+    of order: the arrays grow in either direction when an event falls outside
+    the current range. The largest applied id is the watermark used to fetch
+    and deduplicate new events, and the state is checkpointed to disk.
+    
+    stockHistory rows are not append-only, though: events can be
+    soft-deleted or edited, and an event can commit after one with a higher
+    id. So, like the local cache, at most every RESYNC_INTERVAL seconds the
+    last RESYNC_DAYS days are re-aggregated from the live events; older days
+    are assumed settled and reset() rebuilds everything.
+    
+    Every API worker process keeps its own aggregator over the same
+    checkpoint file, so checkpoints are written under a file lock and only
+    when they are newer than the one on disk.
+    """
+    
+    def __init__(self, checkpoint_path=None, hourly=True):
+        """
+        Initialize the aggregator, restoring the last checkpoint if any.
+        
+        Args:
+            checkpoint_path: Optional checkpoint file (default outputs/cache/daily_usage.npz)
+            hourly: Whether to also keep usage per hour of day
+        """
+        self.checkpoint_path = checkpoint_path or os.path.join(
+            os.path.dirname(__file__), 'outputs', 'cache', 'daily_usage.npz'
+        )
+        self.hourly = hourly
+        self._lock = threading.RLock()
+        self._reset()
+        self.load()
+    
+    def _reset(self):
+        """Clear the aggregated state."""
+        self.start_day = None
+        self.last_id = None
+        self.resynced_at = None
+        self._usage = np.zeros(0, dtype=np.float64)
+        # Usage events per day, the series spans the days that have any
+        self._events = np.zeros(0, dtype=np.int64)
+        self._hourly_usage = np.zeros((0, 24), dtype=np.float64)
+    
+    def _ensure_range(self, first_day, last_day):
+        """
+        Grow the arrays so they cover a range of days.
+        
+        Capacity is doubled when growing, so extending the range one day at a
+        time stays amortized constant per event.
+        
+        Args:
+            first_day: First day number (days since epoch) to cover
+            last_day: Last day number to cover
+        """
+        if self.start_day is None:
+            self.start_day = first_day
+        
+        size = len(self._usage)
+        front = max(self.start_day - first_day, 0)
+        back = max(last_day - (self.start_day + size - 1), 0)
+        if front == 0 and back == 0:
+            return
+        
+        if front:
+            front = max(front, size)
+        if back:
+            back = max(back, size)
+        
+        self._usage = np.pad(self._usage, (front, back))
+        self._events = np.pad(self._events, (front, back))
+        if self.hourly:
+            self._hourly_usage = np.pad(self._hourly_usage, ((front, back), (0, 0)))
+        self.start_day -= front
+    
+    def apply(self, events):
+        """
+        Apply stock history events to the aggregates.
+        
+        Args:
+            events: DataFrame with 'id', 'action', 'quantity' and 'createdAt' columns
+            
+        Returns:
+            Number of events applied (events at or below the watermark are skipped)
+        """
+        with self._lock:
+            if events.empty:
+                return 0
+            
+            ids = events['id'].to_numpy(dtype=np.int64)
+            new = ids > self.last_id if self.last_id is not None else np.ones(len(ids), dtype=bool)
+            if not new.any():
+                return 0
+            
+            self._add(events[new])
+            self.last_id = int(ids[new].max())
+            return int(new.sum())
+    
+    def _add(self, events):
+        """Add the usage events of a DataFrame to the aggregates, regardless of the watermark."""
+        usage = events['action'].isin(USAGE_ACTIONS).to_numpy()
+        created_at = pd.to_datetime(events['createdAt']).to_numpy()[usage]
+        quantities = events['quantity'].to_numpy(dtype=np.float64)[usage]
+        dated = ~np.isnat(created_at)
+        created_at, quantities = created_at[dated], quantities[dated]
+        
+        if len(created_at):
+            hours = created_at.astype('datetime64[h]').astype(np.int64)
+            days = hours // 24
+            self._ensure_range(int(days.min()), int(days.max()))
+            
+            offsets = days - self.start_day
+            np.add.at(self._usage, offsets, quantities)
+            np.add.at(self._events, offsets, 1)
+            if self.hourly:
+                np.add.at(self._hourly_usage, (offsets, hours % 24), quantities)
+    
+    def reaggregate(self, events, days):
+        """
+        Replace the aggregates of the last days with the ones of the given events.
+        
+        Args:
+            events: Every live stock history event of the window, as for apply()
+            days: Number of whole days the events cover (from today)
+        """
+        with self._lock:
+            if self.start_day is not None:
+                first_day = int(np.datetime64(window_start(days), 'D').astype(np.int64))
+                first = min(max(first_day - self.start_day, 0), len(self._usage))
+                self._usage[first:] = 0
+                self._events[first:] = 0
+                if self.hourly:
+                    self._hourly_usage[first:] = 0
+            
+            if not events.empty:
+                self._add(events)
+                last_id = int(events['id'].max())
+                self.last_id = max(last_id, self.last_id if self.last_id is not None else last_id)
+            self.resynced_at = time.time()
+    
+    def sync(self, source):
+        """
+        Apply the stock history events past the watermark, re-aggregate the
+        trailing window when it is due, and checkpoint.
+        
+        Args:
+            source: Data source with get_stock_history (and optionally
+                bulk_stock_history, used for the initial backfill)
+                
+        Returns:
+            Number of new events
+        """
+        with self._lock:
+            full = self.last_id is None
+            fetch = source.get_stock_history
+            if full and hasattr(source, 'bulk_stock_history'):
+                fetch = source.bulk_stock_history
+            
+            applied = self.apply(fetch(since_id=self.last_id, columns=EVENT_COLUMNS))
+            if full:
+                self.resynced_at = time.time()
+            elif time.time() - (self.resynced_at or 0) >= RESYNC_INTERVAL:
+                self.reaggregate(source.get_stock_history(days=RESYNC_DAYS, columns=EVENT_COLUMNS), RESYNC_DAYS)
+                self.save()
+                return applied
+            
+            if applied:
+                self.save()
+            return applied
+    
+    def _window(self, days=None):
+        """
+        Get the array slice holding a window of days, trimmed to the days with usage.
+        
+        Args:
+            days: Optional number of whole days to include (from today)
+            
+        Returns:
+            Tuple (first day number, slice), or None when there is no usage
+        """
+        if self.start_day is None:
+            return None
+        
+        first = 0
+        if days:
+            first_day = int(np.datetime64(window_start(days), 'D').astype(np.int64))
+            first = min(max(first_day - self.start_day, 0), len(self._events))
+        
+        active = np.flatnonzero(self._events[first:])
+        if len(active) == 0:
+            return None
+        return self.start_day + first + active[0], slice(first + active[0], first + active[-1] + 1)
+    
+    def daily_usage(self, days=None):
+        """
+        Get the gap-filled daily usage series.
+        
+        Args:
+            days: Optional number of whole days to include (from today)
+            
+        Returns:
+            DataFrame with 'date' and 'usage' columns, like calculate_daily_usage
+        """
+        with self._lock:
+            window = self._window(days)
+            if window is None:
+                return pd.DataFrame({'date': pd.to_datetime([]), 'usage': pd.Series(dtype=float)})
+            
+            first_day, days_slice = window
+            usage = self._usage[days_slice].copy()
+        
+        dates = pd.date_range(pd.Timestamp(np.datetime64(int(first_day), 'D')), periods=len(usage))
+        return pd.DataFrame({'date': dates, 'usage': usage})
+    
+    def hourly_usage(self, days=None):
+        """
+        Get the usage per day and hour of day.
+        
+        Args:
+            days: Optional number of whole days to include (from today)
+            
+        Returns:
+            DataFrame indexed by date with one column per hour (0-23)
+        """
+        with self._lock:
+            window = self._window(days) if self.hourly else None
+            if window is None:
+                return pd.DataFrame(columns=range(24), dtype=float)
+            
+            first_day, days_slice = window
+            usage = self._hourly_usage[days_slice].copy()
+        
+        dates = pd.date_range(pd.Timestamp(np.datetime64(int(first_day), 'D')), periods=len(usage))
+        return pd.DataFrame(usage, index=pd.Index(dates, name='date'), columns=range(24))
+    
+    @contextmanager
+    def _checkpoint_locked(self):
+        """Hold the exclusive lock of the checkpoint file, shared by every process."""
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        with open(f"{self.checkpoint_path}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                # Explicit unlock: a forked child may still hold a copy of the descriptor
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _checkpoint_watermark(self):
+        """
+        Read the watermark of the checkpoint on disk.
+        
+        Returns:
+            Tuple (last_id, resynced_at), or None if there is no readable checkpoint
+        """
+        try:
+            with np.load(self.checkpoint_path) as checkpoint:
+                resynced_at = float(checkpoint['resynced_at']) if 'resynced_at' in checkpoint else 0.0
+                return int(checkpoint['last_id']), resynced_at
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error reading usage checkpoint: {e}")
+            return None
+    
+    def save(self):
+        """
+        Write the aggregated state to the checkpoint file atomically.
+        
+        Returns:
+            True if the checkpoint was written, False if there is no state or
+            another process already wrote one at least as recent
+        """
+        with self._lock:
+            if self.last_id is None:
+                return False
+            
+            watermark = (self.last_id, self.resynced_at or 0.0)
+            with self._checkpoint_locked():
+                on_disk = self._checkpoint_watermark()
+                if on_disk is not None and on_disk >= watermark:
+                    return False
+                
+                atomic_write(self.checkpoint_path, lambda temporary_path: np.savez(
+                    temporary_path,
+                    start_day=self.start_day if self.start_day is not None else 0,
+                    last_id=self.last_id,
+                    resynced_at=self.resynced_at or 0.0,
+                    usage=self._usage,
+                    events=self._events,
+                    hourly_usage=self._hourly_usage
+                ))
+                return True
+    
+    def load(self):
+        """
+        Restore the aggregated state from the checkpoint file.
+        
+        Returns:
+            True if a checkpoint was loaded, False otherwise
+        """
+        with self._lock:
+            if not os.path.exists(self.checkpoint_path):
+                return False
+            
+            try:
+                with np.load(self.checkpoint_path) as checkpoint:
+                    usage = checkpoint['usage']
+                    hourly_usage = checkpoint['hourly_usage']
+                    if self.hourly and len(hourly_usage) != len(usage):
+                        # Checkpoint written without hourly usage, rebuild it
+                        return False
+                    
+                    self.start_day = int(checkpoint['start_day']) if len(usage) else None
+                    self.last_id = int(checkpoint['last_id'])
+                    # Checkpoints written before the trailing re-aggregation are due for one
+                    self.resynced_at = float(checkpoint['resynced_at']) if 'resynced_at' in checkpoint else None
+                    self._usage = usage
+                    self._events = checkpoint['events']
+                    self._hourly_usage = hourly_usage if self.hourly else np.zeros((0, 24))
+            except Exception as e:
+                print(f"Error loading usage checkpoint: {e}")
+                self._reset()
+                return False
+            
+            return True
+    
+    def reset(self):
+        """Drop the aggregated state and its checkpoint (the next sync rebuilds it)."""
+        with self._lock:
+            self._reset()
+            with self._checkpoint_locked():
+                if os.path.exists(self.checkpoint_path):
+                    os.remove(self.checkpoint_path)
\ No newline at end of file
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Usage statistics module for the AI prediction system.
+This module computes rolling statistics of the daily usage series once and
+serves them until the series changes.
+"""
+
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+
+# Rolling windows (days) computed for every statistic
+DEFAULT_WINDOWS = (7, 14, 30, 90)
+
+# Rolling quantiles computed for every window
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+
+# Same-weekday history (weeks) for the weekday-conditioned means
+DEFAULT_WEEKDAY_WEEKS = (4, 8)
+
+class RollingUsageStatistics:
+    """
+    Rolling statistics of a daily usage series.
+    
+    Every statistic is computed for every day with vectorized rolling window
+    operations and kept until a different series is passed to update(), so
+    reading the latest value of any statistic is a dictionary lookup.
+    Statistic names are '<stat>_<window>': mean, sum, std, ewm and q<percent>
+    (e.g. 'mean_30', 'q90_7'), plus 'weekday_mean_<weeks>w'.
+    """
+    
+    def __init__(self, windows=DEFAULT_WINDOWS, quantiles=DEFAULT_QUANTILES,
+                 weekday_weeks=DEFAULT_WEEKDAY_WEEKS):
+        """
+        Initialize the rolling statistics.
+        
+        Args:
+            windows: Rolling windows in days
+            quantiles: Quantiles computed over each window
+            weekday_weeks: Number of weeks of same-weekday history to average
+        """
+        self.windows = tuple(windows)
+        self.quantiles = tuple(quantiles)
+        self.weekday_weeks = tuple(weekday_weeks)
+        self.table = None
+        self._latest = {}
+        self._weekday_latest = {}
+        self._fingerprint = None
+        self._lock = threading.Lock()
+    
+    def _series_fingerprint(self, daily_usage_df):
+        """Get a fingerprint identifying the contents of a daily usage series."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(daily_usage_df['date'].to_numpy(dtype='datetime64[ns]').tobytes())
+        digest.update(daily_usage_df['usage'].to_numpy(dtype=np.float64).tobytes())
+        return digest.hexdigest()
+    
+    def _compute(self, daily_usage_df):
+        """
+        Compute every rolling statistic for every day of the series.
+        
+        Args:
+            daily_usage_df: DataFrame with 'date' and 'usage' columns, sorted by date
+            
+        Returns:
+            DataFrame indexed by date with one column per statistic
+        """
+        usage = pd.Series(
+            daily_usage_df['usage'].to_numpy(dtype=np.float64),
+            index=pd.DatetimeIndex(daily_usage_df['date'], name='date')
+        )
+        
+        columns = {'usage': usage}
+        for window in self.windows:
+            rolling = usage.rolling(window, min_periods=1)
+            columns[f'mean_{window}'] = rolling.mean()
+            columns[f'sum_{window}'] = rolling.sum()
+            columns[f'std_{window}'] = rolling.std(ddof=0)
+            columns[f'ewm_{window}'] = usage.ewm(span=window, adjust=False).mean()
+            for quantile in self.quantiles:
+                columns[f'q{int(round(quantile * 100))}_{window}'] = rolling.quantile(quantile)
+        
+        # Mean of the last N values seen on the same weekday
+        weekdays = usage.index.weekday
+        for weeks in self.weekday_weeks:
+            columns[f'weekday_mean_{weeks}w'] = usage.groupby(weekdays).transform(
+                lambda values: values.rolling(weeks, min_periods=1).mean()
+            )
+        
+        return pd.DataFrame(columns)
+    
+    def update(self, daily_usage_df):
+        """
+        Recompute the statistics if the series changed since the last update.
+        
+        Args:
+            daily_usage_df: DataFrame with 'date' and 'usage' columns
+            
+        Returns:
+            True if the statistics were recomputed, False if the cached ones were kept
+        """
+        if not daily_usage_df['date'].is_monotonic_increasing:
+            daily_usage_df = daily_usage_df.sort_values('date')
+        
+        fingerprint = self._series_fingerprint(daily_usage_df)
+        with self._lock:
+            if fingerprint == self._fingerprint:
+                return False
+            
+            table = self._compute(daily_usage_df)
+            latest = {}
+            weekday_latest = {}
+            if not table.empty:
+                latest = {name: float(value) for name, value in table.iloc[-1].items()}
+                # The last row of each weekday holds its current weekday means
+                last_week = table.iloc[-7:]
+                for date, row in last_week.iterrows():
+                    weekday_latest[date.weekday()] = {
+                        weeks: float(row[f'weekday_mean_{weeks}w']) for weeks in self.weekday_weeks
+                    }
+            
+            self.table = table
+            self._latest = latest
+            self._weekday_latest = weekday_latest
+            self._fingerprint = fingerprint
+            return True
+    
+    def get(self, stat, window=None, default=0.0):
+        """
+        Get the latest value of a statistic.
+        
+        Args:
+            stat: Statistic name, e.g. 'mean' or 'mean_30'
+            window: Optional window, appended to the name ('mean', 30 -> 'mean_30')
+            default: Value returned when the statistic is not available
+            
+        Returns:
+            Latest value as a float
+        """
+        name = f'{stat}_{window}' if window is not None else stat
+        value = self._latest.get(name, default)
+        return default if value is None or np.isnan(value) else value
+    
+    def weekday_mean(self, weekday, weeks=None, default=0.0):
+        """
+        Get the latest mean usage of a weekday.
+        
+        Args:
+            weekday: Day of week (0 = Monday)
+            weeks: Weeks of same-weekday history (default the shortest configured)
+            default: Value returned when the weekday has no history
+            
+        Returns:
+            Mean usage of that weekday as a float
+        """
+        weeks = weeks or self.weekday_weeks[0]
+        return self._weekday_latest.get(weekday, {}).get(weeks, default)
+    
+    def latest(self):
+        """
+        Get a snapshot of the latest statistics.
+        
+        Returns:
+            Dictionary with every latest statistic and the weekday means
+        """
+        snapshot = {name: (None if np.isnan(value) else value) for name, value in self._latest.items()}
+        snapshot['weekday_means'] = {
+            weekday: means.get(self.weekday_weeks[0]) for weekday, means in sorted(self._weekday_latest.items())
+        }
+        return snapshot
\ No newline at end of file
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+WSGI server module for the AI prediction system.
+This module serves the API with a pre-fork gunicorn server whose workers
+share the models loaded once in the master process.
+"""
+
+import gc
+import os
+import signal
+import time
+import threading
+from gunicorn.app.base import BaseApplication
+
+# Requests served by a worker before it is replaced (plus up to 10% jitter)
+DEFAULT_MAX_REQUESTS = 1000
+
+# Seconds a worker may spend on one request; training and backtests are slow
+DEFAULT_TIMEOUT = 600
+
+def _freeze_heap():
+    """Exclude the loaded objects from garbage collection, so workers do not dirty their shared pages."""
+    gc.collect()
+    gc.freeze()
+
+def _watch_models(server, registry):
+    """
+    Signal a graceful reload when another process saves new model artifacts.
+    
+    Runs in a daemon thread of the master. It only stats the artifact files;
+    the models themselves are reloaded by the on_reload hook, in the master's
+    main thread, before the new workers are forked.
+    
+    Args:
+        server: Gunicorn arbiter
+        registry: Model registry loaded in the master
+    """
+    signaled = set()
+    while True:
+        time.sleep(registry.check_interval)
+        changed = set(registry.changed())
+        if changed - signaled:
+            # A training run saves its models one after another, reload once for all
+            time.sleep(registry.check_interval)
+            changed = set(registry.changed())
+            server.log.info("New model artifacts for %s, reloading workers", ", ".join(sorted(changed)))
+            os.kill(server.pid, signal.SIGHUP)
+        signaled = changed
+
+def _when_ready(server):
+    """Start watching the model artifacts and running training jobs once the master is serving."""
+    from prediction_service import get_prediction_service
+    from training_jobs import get_training_queue
+    registry = get_prediction_service().models
+    threading.Thread(target=_watch_models, args=(server, registry), name='model-watch', daemon=True).start()
+    # Jobs run from the master, so recycling the workers that queued them loses none
+    get_training_queue().start_dispatcher()
+
+def _on_reload(server):
+    """Load the new models in the master before the replacement workers are forked."""
+    from prediction_service import get_prediction_service
+    versions = get_prediction_service().models.refresh()
+    _freeze_heap()
+    server.log.info("Serving model versions %s", versions)
+
+class PreforkServer(BaseApplication):
+    """
+    Gunicorn application serving the prediction API with forked workers.
+    
+    The API, the prediction stack and the trained models are loaded once in
+    the master before the workers are forked, so every worker starts ready
+    and shares the model memory copy-on-write. Workers are recycled after
+    max_requests requests. Training jobs queued by any worker are run by the
+    master. When new model artifacts appear on disk (e.g. a training job
+    finished), the master reloads them and replaces the workers gracefully:
+    requests in flight finish on the old workers.
+    """
+    
+    def __init__(self, host='0.0.0.0', port=5000, workers=None, threads=1,
+                 max_requests=DEFAULT_MAX_REQUESTS, timeout=DEFAULT_TIMEOUT):
+        """
+        Initialize the server.
+        
+        Args:
+            host: Host to listen on
+            port: Port to listen on
+            workers: Number of worker processes (default one per CPU)
+            threads: Threads per worker
+            max_requests: Requests served by a worker before it is replaced (0 never)
+            timeout: Seconds a worker may spend on one request
+        """
+        self.options = {
+            'bind': f"{host}:{port}",
+            'workers': workers or os.cpu_count() or 1,
+            'threads': threads,
+            'worker_class': 'gthread' if threads > 1 else 'sync',
+            'max_requests': max_requests,
+            'max_requests_jitter': max_requests // 10,
+            'timeout': timeout,
+            'graceful_timeout': timeout,
+            'preload_app': True,
+            'when_ready': _when_ready,
+            'on_reload': _on_reload
+        }
+        super().__init__()
+    
+    def load_config(self):
+        """Apply the server options to the gunicorn configuration."""
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+    
+    def load(self):
+        """
+        Load the API and the models in the master process.
+        
+        Returns:
+            The Flask WSGI application
+        """
+        from api import app, preload_models
+        preload_models()
+        _freeze_heap()
+        return app
+
+def start_production_api(host='0.0.0.0', port=5000, workers=None, threads=1,
+                         max_requests=DEFAULT_MAX_REQUESTS, timeout=DEFAULT_TIMEOUT):
+    """
+    Start the API with the pre-fork server (blocks until it is stopped).
+    
+    Args:
+        host: Host to listen on
+        port: Port to listen on
+        workers: Number of worker processes (default one per CPU)
+        threads: Threads per worker
+        max_requests: Requests served by a worker before it is replaced (0 never)
+        timeout: Seconds a worker may spend on one request
+    """
+    PreforkServer(host=host, port=port, workers=workers, threads=threads,
+                  max_requests=max_requests, timeout=timeout).run()
\ No newline at end of file
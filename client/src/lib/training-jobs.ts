@@ -0,0 +1,63 @@
+// Cliente de los trabajos de entrenamiento de la IA: POST /train devuelve un
+// job_id y el entrenamiento se ejecuta en segundo plano en el servidor.
+
+export interface TrainingJob {
+  id: string;
+  status: "pending" | "running" | "succeeded" | "failed" | "cancelled";
+  submitted_at: string;
+  started_at: string | null;
+  finished_at: string | null;
+  wait_time: number | null;
+  run_time: number | null;
+  result: any;
+  error: string | null;
+}
+
+const FINISHED_STATES = ["succeeded", "failed", "cancelled"];
+
+// Intervalo de consulta del estado y tiempo máximo de espera
+const POLL_INTERVAL_MS = 2000;
+const TIMEOUT_MS = 30 * 60 * 1000;
+
+// Encolar un entrenamiento y devolver su job_id
+export async function submitTraining(body: Record<string, unknown> = {}): Promise<string> {
+  const response = await fetch("/api/predictions/train", {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify(body)
+  });
+
+  const data = await response.json().catch(() => ({}));
+  if (!response.ok || !data.job_id) {
+    throw new Error(data.error || "No se pudo iniciar el entrenamiento");
+  }
+  return data.job_id;
+}
+
+// Consultar el trabajo hasta que termine; falla si no termina con éxito
+export async function waitForTraining(jobId: string): Promise<TrainingJob> {
+  const deadline = Date.now() + TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    const response = await fetch(`/api/predictions/jobs/${jobId}`);
+    const job = await response.json().catch(() => ({}));
+    if (!response.ok) {
+      throw new Error(job.error || "No se pudo consultar el entrenamiento");
+    }
+
+    if (FINISHED_STATES.includes(job.status)) {
+      if (job.status !== "succeeded") {
+        throw new Error(job.error || `Entrenamiento ${job.status === "cancelled" ? "cancelado" : "fallido"}`);
+      }
+      return job;
+    }
+    await new Promise(resolve => setTimeout(resolve, POLL_INTERVAL_MS));
+  }
+  throw new Error("El entrenamiento no terminó a tiempo");
+}
+
+// Encolar un entrenamiento y esperar a que termine
+export async function trainAndWait(body: Record<string, unknown> = {}): Promise<TrainingJob> {
+  return waitForTraining(await submitTraining(body));
+}
\ No newline at end of file
@@ -5,6 +5,7 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/com
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { Button } from "@/components/ui/button";
 import { useToast } from "@/hooks/use-toast";
+import { submitTraining, waitForTraining } from "@/lib/training-jobs";
 import {
   BarChart,
   Bar,
@@ -191,7 +192,7 @@ export default function ModelMetrics() {
   const [activeModel, setActiveModel] = useState("");
   const { toast } = useToast();
   
-  const { data, error, isLoading } = useQuery({
+  const { data, error, isLoading, refetch } = useQuery({
     queryKey: ['/api/predictions/model-metrics'],
     refetchOnWindowFocus: false,
     onError: (error: any) => {
@@ -210,17 +211,9 @@ export default function ModelMetrics() {
   }, [data]);
 
   const handleTrainModels = async () => {
+    let jobId: string;
     try {
-      const response = await fetch('/api/predictions/train', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json'
-        }
-      });
-      
-      if (!response.ok) {
-        throw new Error('Error al entrenar los modelos');
-      }
+      jobId = await submitTraining();
       
       toast({
         title: "Entrenamiento iniciado",
@@ -232,6 +225,23 @@ export default function ModelMetrics() {
         description: "No se pudo iniciar el entrenamiento de los modelos",
         variant: "destructive"
       });
+      return;
+    }
+    
+    try {
+      await waitForTraining(jobId);
+      await refetch();
+      
+      toast({
+        title: "Entrenamiento completado",
+        description: "Los modelos se han entrenado y las métricas se han actualizado.",
+      });
+    } catch (error: any) {
+      toast({
+        title: "Error",
+        description: `El entrenamiento de los modelos falló: ${error.message}`,
+        variant: "destructive"
+      });
     }
   };
 
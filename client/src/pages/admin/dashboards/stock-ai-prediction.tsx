@@ -12,6 +12,7 @@ import { Button } from "@/components/ui/button";
 import { Alert, AlertTitle, AlertDescription } from "@/components/ui/alert";
 import { AlertTriangle, BrainCircuit, Loader2 } from "lucide-react";
 import { useState } from "react";
+import { trainAndWait } from "@/lib/training-jobs";
 
 type PredictionResult = {
   status: string;
@@ -107,20 +108,9 @@ export default function StockAIPrediction() {
     
     try {
       setIsTraining(true);
-      const response = await fetch("/api/predictions/train", {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify({ days: 90 })
-      });
-      
-      if (!response.ok) {
-        throw new Error("Failed to train models");
-      }
-      
-      const result = await response.json();
-      console.log("Training result:", result);
+      // Training runs in the background, wait for the job to finish
+      const job = await trainAndWait({ days: 90 });
+      console.log("Training result:", job.result);
       
       // Refetch predictions after training
       await refetchPrediction();
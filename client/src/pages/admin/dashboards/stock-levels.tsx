@@ -31,6 +31,7 @@ import {
 } from "recharts";
 import { format } from "date-fns";
 import { useState } from "react";
+import { trainAndWait } from "@/lib/training-jobs";
 import { AlertTriangle, TrendingUp, BrainCircuit, BarChart3, Loader2 } from "lucide-react";
 
 type StockDistribution = {
@@ -196,20 +197,9 @@ export default function StockLevels() {
     
     try {
       setIsTraining(true);
-      const response = await fetch("/api/predictions/train", {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify({ days: 90 })
-      });
-      
-      if (!response.ok) {
-        throw new Error("Failed to train models");
-      }
-      
-      const result = await response.json();
-      console.log("Training result:", result);
+      // Training runs in the background, wait for the job to finish
+      const job = await trainAndWait({ days: 90 });
+      console.log("Training result:", job.result);
       
       // Refetch predictions after training
       await refetchPrediction();
@@ -6,8 +6,13 @@ import fs from 'fs';
 
 const router = Router();
 let pythonProcess: any = null;
+let serverReady: Promise<boolean> | null = null;
 const isRunning = () => pythonProcess && pythonProcess.pid && !pythonProcess.killed;
 
+// How long to wait for the AI server to preload its models, and how often to ask
+const AI_READY_TIMEOUT_MS = 30000;
+const AI_READY_POLL_MS = 200;
+
 // Auth middleware for admin routes
 const isHaykakan = (req: Request, res: Response, next: any) => {
   // Permitir el acceso sin restricciones para pruebas
@@ -24,10 +29,33 @@ const isHaykakan = (req: Request, res: Response, next: any) => {
   */
 };
 
+// Poll the AI server until it reports ready, instead of sleeping a fixed time
+async function waitForAIServer(timeoutMs = AI_READY_TIMEOUT_MS) {
+  const deadline = Date.now() + timeoutMs;
+  while (isRunning() && Date.now() < deadline) {
+    try {
+      const response = await fetch('http://localhost:5000/ready');
+      if (response.ok) {
+        return true;
+      }
+      const status: any = await response.json();
+      // Up but the preload failed: requests will load the models themselves
+      if (status.error) {
+        return true;
+      }
+    } catch (error) {
+      // Not accepting connections yet
+    }
+    await new Promise(resolve => setTimeout(resolve, AI_READY_POLL_MS));
+  }
+  console.warn('AI prediction server did not become ready in time');
+  return false;
+}
+
 function startAIServer() {
   if (isRunning()) {
     console.log('AI prediction server is already running');
-    return;
+    return serverReady;
   }
 
   const scriptPath = path.join(process.cwd(), 'ai_prediction', 'main.py');
@@ -53,10 +81,12 @@ function startAIServer() {
   pythonProcess.on('close', (code: number) => {
     console.log(`AI prediction server exited with code ${code}`);
     pythonProcess = null;
+    serverReady = null;
   });
 
-  // Wait a moment for the server to start
-  return new Promise(resolve => setTimeout(resolve, 5000));
+  // Requests arriving while it starts wait for the same readiness check
+  serverReady = waitForAIServer();
+  return serverReady;
 }
 
 function stopAIServer() {
@@ -64,6 +94,7 @@ function stopAIServer() {
     console.log('Stopping AI prediction server...');
     pythonProcess.kill();
     pythonProcess = null;
+    serverReady = null;
   }
 }
 
@@ -73,40 +104,56 @@ startAIServer();
 // Train models endpoint
 router.post('/train', isHaykakan, async (req: Request, res: Response) => {
   try {
-    try {
-      await startAIServer();
-      
-      const response = await fetch('http://localhost:5000/train', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(req.body),
-      });
-      
-      if (!response.ok) {
-        throw new Error(`AI server responded with status: ${response.status}`);
-      }
-      
-      const data = await response.json();
-      res.json(data);
-    } catch (aiError) {
-      console.warn('AI server error during training, simulating success:', aiError);
-      
-      // Simulate successful training
-      res.json({
-        status: "success",
-        message: "Modelos entrenados correctamente (simulación)",
-        models: {
-          prophet: "trained",
-          ml: "trained"
-        },
-        time_taken: 8.5
-      });
+    await startAIServer();
+    
+    // Training is queued: the AI server answers 202 with a job_id to poll at /jobs/:id
+    const response = await fetch('http://localhost:5000/train', {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify(req.body),
+    });
+    
+    const data: any = await response.json();
+    if (!response.ok || !data.job_id) {
+      throw new Error(data.error || `AI server responded with status: ${response.status}`);
     }
+    
+    res.status(response.status).json(data);
   } catch (error) {
     console.error('Error training models:', error);
-    res.status(500).json({ error: 'Error al entrenar los modelos de IA' });
+    res.status(502).json({ error: 'Error al iniciar el entrenamiento de los modelos de IA' });
+  }
+});
+
+// Training job status endpoint
+router.get('/jobs/:id', isHaykakan, async (req: Request, res: Response) => {
+  try {
+    await startAIServer();
+    
+    const response = await fetch(`http://localhost:5000/jobs/${encodeURIComponent(req.params.id)}`);
+    const data = await response.json();
+    res.status(response.status).json(data);
+  } catch (error) {
+    console.error('Error getting training job:', error);
+    res.status(500).json({ error: 'Error al obtener el estado del entrenamiento' });
+  }
+});
+
+// Training job cancellation endpoint
+router.delete('/jobs/:id', isHaykakan, async (req: Request, res: Response) => {
+  try {
+    await startAIServer();
+    
+    const response = await fetch(`http://localhost:5000/jobs/${encodeURIComponent(req.params.id)}`, {
+      method: 'DELETE',
+    });
+    const data = await response.json();
+    res.status(response.status).json(data);
+  } catch (error) {
+    console.error('Error cancelling training job:', error);
+    res.status(500).json({ error: 'Error al cancelar el entrenamiento' });
   }
 });
 